@@ -5,15 +5,25 @@
 @time: 4/25/25 15:15
 """
 # agents/base.py
-import os
-import requests
-from typing import Dict, List, Any, Optional
+import asyncio
+import copy
+import time
+from typing import Callable, Dict, List, Any, Optional, Tuple
 from mcp.protocol import MCPMessage
+from mcp.store import MessageStore, MessageView
+from mcp.tracing import span
+from agents.cache import ResponseCache
+from agents.context import ContextWindow, message_tokens
+from agents.policy import CallPolicy, ProviderError, get_default_policy, hard_timeout, unwrap_raw_response
+from agents.usage import call_metrics
 
 
 class BaseAgent:
     """Base class for all agents in the system"""
 
+    # Human readable provider name used in log and error messages
+    provider_name = "Base"
+
     def __init__(
             self,
             agent_id: str,
@@ -22,7 +32,12 @@ class BaseAgent:
             api_key: str,
             model: str,
             api_url: str,
-            system_prompt: Optional[str] = None
+            system_prompt: Optional[str] = None,
+            temperature: float = 0.7,
+            max_tokens: int = 2048,
+            cache: Optional[ResponseCache] = None,
+            context_window: Optional[ContextWindow] = None,
+            call_policy: Optional[CallPolicy] = None
     ):
         self.agent_id = agent_id
         self.name = name
@@ -30,8 +45,22 @@ class BaseAgent:
         self.api_key = api_key
         self.model = model
         self.api_url = api_url
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.cache = cache
+        self.context_window = context_window
+        # Retries, timeouts, rate limiting and circuit breaking of API calls
+        self.call_policy = call_policy or get_default_policy()
         self.system_prompt = system_prompt or f"You are {name}, an AI assistant with the role of {role}."
-        self.messages: List[MCPMessage] = []
+        # Agents get a private store until an Orchestrator attaches a shared one
+        self.messages: MessageView = MessageStore().view()
+        # API-format view of self.messages, extended as messages are added so
+        # each message is serialized once instead of on every call
+        self._api_messages: List[Dict[str, Any]] = []
+        self._api_positions: Dict[int, int] = {}
+        # Running token total of self.messages[:_counted_messages], kept for the context window
+        self._history_tokens = 0
+        self._counted_messages = 0
 
         # Initialize with system message
         self._add_system_message()
@@ -44,11 +73,48 @@ class BaseAgent:
             agent_id=self.agent_id,
             metadata={"type": "system_instruction"}
         )
-        self.messages.append(system_msg)
+        self.add_message(system_msg)
+
+    def attach_store(self, store: MessageStore):
+        """Move this agent's context into a shared message store"""
+        if self.messages.store is not store:
+            self.messages = store.view(self.messages)
+
+    def restore_messages(self, messages: MessageView):
+        """Replace this agent's context, e.g. with one loaded from a checkpoint"""
+        self.messages = messages
+        self._api_messages = []
+        self._api_positions = {}
+        self._history_tokens = 0
+        self._counted_messages = 0
+        self._sync_api_messages()
+
+    def fork(self) -> "BaseAgent":
+        """Copy of this agent with a private copy of its context, e.g. for a call whose result may be discarded.
+
+        The copy shares clients, cache and call policy; messages added to it
+        reach neither this agent nor the orchestrator's message store.
+        """
+        twin = copy.copy(self)
+        twin.messages = MessageStore().view(self.messages)
+        twin._api_messages = list(self._api_messages)
+        twin._api_positions = dict(self._api_positions)
+        if self.context_window is not None:
+            twin.context_window = copy.copy(self.context_window)
+        return twin
 
     def add_message(self, message: MCPMessage):
         """Add a message to this agent's context"""
         self.messages.append(message)
+        self._sync_api_messages()
+
+    def _sync_api_messages(self):
+        """Serialize messages appended since the last sync into the API view"""
+        if len(self.messages) == len(self._api_messages):
+            return
+        for msg in self.messages[len(self._api_messages):]:
+            self._api_positions[id(msg)] = len(self._api_messages)
+            self._api_messages.append(self._serialize_message(msg))
 
     def create_message(self, content: str, role: str = "assistant", references: List[str] = None) -> MCPMessage:
         """Create a new message from this agent"""
@@ -61,10 +127,275 @@ class BaseAgent:
         )
         return msg
 
+    def context_messages(self) -> List[MCPMessage]:
+        """Messages to send to the model, fitted to its context window if one is set"""
+        if self.context_window is None:
+            return self.messages
+        for msg in self.messages[self._counted_messages:]:
+            self._history_tokens += message_tokens(msg)
+        self._counted_messages = len(self.messages)
+        return self.context_window.fit(
+            self.messages, self.model, reserve_tokens=self.max_tokens, total_tokens=self._history_tokens
+        )
+
+    def _serialize_message(self, message: MCPMessage) -> Dict[str, Any]:
+        """Convert one message to the provider's format - override for specific APIs"""
+        return {
+            "role": message.role,
+            "content": message.content
+        }
+
     def format_messages_for_api(self) -> List[Dict[str, Any]]:
-        """Format messages for API call - override in subclasses for specific APIs"""
+        """Format messages for API call.
+
+        Returns the cached API view, which must be treated as read-only. Only
+        messages the context window truncated or summarized are serialized
+        here; everything else was serialized once when it was added.
+        """
+        # Pick up messages appended to self.messages directly
+        self._sync_api_messages()
+        return self._format_fitted(self.context_messages())
+
+    def _format_fitted(self, messages: List[MCPMessage]) -> List[Dict[str, Any]]:
+        """API view of messages fitted from self.messages, reusing the serialized ones"""
+        if messages is self.messages:
+            return self._api_messages
+
+        formatted_messages = []
+        for msg in messages:
+            index = self._api_positions.get(id(msg))
+            if index is None:
+                formatted_messages.append(self._serialize_message(msg))
+            else:
+                formatted_messages.append(self._api_messages[index])
+        return formatted_messages
+
+    def _create_completion(self, messages: List[Dict[str, Any]], stream: bool = False,
+                           timeout: Optional[float] = None) -> Any:
+        """Call the provider's chat completion endpoint - override in subclasses.
+
+        With stream=True the parsed result must be an iterator of completion
+        chunks. Subclasses may return the SDK's raw response (with_raw_response)
+        so rate-limit headers reach the call policy.
+        """
         raise NotImplementedError("Subclasses must implement this method")
 
-    def generate_response(self, prompt: Optional[str] = None) -> MCPMessage:
-        """Generate a response using the model API - override in subclasses"""
-        raise NotImplementedError("Subclasses must implement this method")
\ No newline at end of file
+    async def _acreate_completion(self, messages: List[Dict[str, Any]], stream: bool = False,
+                                  timeout: Optional[float] = None) -> Any:
+        """Async variant of _create_completion - override in subclasses"""
+        raise NotImplementedError("Subclasses must implement this method")
+
+    @staticmethod
+    def _chunk_text(chunk: Any) -> str:
+        """Extract the content delta from a streamed completion chunk"""
+        if not chunk.choices:
+            return ""
+        return chunk.choices[0].delta.content or ""
+
+    @staticmethod
+    def _chunk_usage(chunk: Any) -> Any:
+        """Token usage carried by a streamed chunk (usually only the last one), if any"""
+        return getattr(chunk, "usage", None)
+
+    def _cache_key(self, formatted_messages: List[Dict[str, Any]]) -> Optional[str]:
+        """Cache key for a request, or None when caching is disabled"""
+        if self.cache is None:
+            return None
+        return ResponseCache.make_key(
+            formatted_messages, self.model, self.temperature, self.max_tokens, self.provider_name
+        )
+
+    def _cached_response(self, cache_key: Optional[str],
+                         on_chunk: Optional[Callable[[str], None]]) -> Optional[MCPMessage]:
+        """Answer from the cache without touching the network, if possible"""
+        if cache_key is None:
+            return None
+        content = self.cache.get(cache_key)
+        if content is None:
+            return None
+        if on_chunk is not None:
+            on_chunk(content)
+        return self._record_response(content, call_metrics(
+            self.model, self.provider_name, [], content, latency=0.0, cache_hit=True
+        ))
+
+    def _add_prompt(self, prompt: Optional[str]):
+        """If a new prompt is provided, add it as a user message"""
+        if prompt:
+            user_msg = MCPMessage(
+                role="user",
+                content=prompt,
+                agent_id="human",
+                metadata={"type": "query"}
+            )
+            self.add_message(user_msg)
+
+    def _record_response(self, content: str, metrics: Optional[Dict[str, Any]] = None) -> MCPMessage:
+        """Wrap model output in an MCP message and add it to the context"""
+        # Find message IDs to reference
+        references = []
+        if self.messages and self.messages[-1].role == "user":
+            references.append(self.messages[-1].message_id)
+
+        response_msg = self.create_message(content=content, references=references)
+        if metrics is not None:
+            response_msg.metadata["metrics"] = metrics
+        self.add_message(response_msg)
+        return response_msg
+
+    def _partial_stream_error(self, error: Exception) -> ProviderError:
+        """A stream that broke after chunks were delivered can't be retried without repeating them"""
+        return ProviderError(
+            f"{self.provider_name} stream for {self.agent_id} broke off: {error}",
+            agent_id=self.agent_id, provider=self.provider_name, model=self.model, cause=error
+        )
+
+    def _call_metrics(self, formatted_messages: List[Dict[str, Any]], content: str, usage: Any,
+                      started: float, ttft: Optional[float] = None) -> Dict[str, Any]:
+        """Latency, time to first token, tokens and cost of a successful attempt"""
+        return call_metrics(self.model, self.provider_name, formatted_messages, content, usage,
+                            latency=time.perf_counter() - started, ttft=ttft)
+
+    def _complete(self, formatted_messages: List[Dict[str, Any]], on_chunk: Optional[Callable[[str], None]],
+                  timeout: Optional[float]):
+        """One API attempt: return ((content, call metrics), response headers)"""
+        started = time.perf_counter()
+        raw = self._create_completion(formatted_messages, stream=on_chunk is not None, timeout=timeout)
+        response, headers = unwrap_raw_response(raw)
+        if on_chunk is None:
+            content = response.choices[0].message.content
+            return (content, self._call_metrics(formatted_messages, content, getattr(response, "usage", None), started)), headers
+        parts = []
+        usage = ttft = None
+        try:
+            for chunk in response:
+                usage = self._chunk_usage(chunk) or usage
+                text = self._chunk_text(chunk)
+                if text:
+                    if ttft is None:
+                        ttft = time.perf_counter() - started
+                    parts.append(text)
+                    on_chunk(text)
+        except Exception as e:
+            if parts:
+                raise self._partial_stream_error(e) from e
+            raise
+        content = "".join(parts)
+        return (content, self._call_metrics(formatted_messages, content, usage, started, ttft)), headers
+
+    async def _acomplete(self, formatted_messages: List[Dict[str, Any]], on_chunk: Optional[Callable[[str], None]],
+                         timeout: Optional[float]):
+        """Async variant of _complete; a stream is timed out per chunk rather than as a whole"""
+        started = time.perf_counter()
+        raw = self._acreate_completion(formatted_messages, stream=on_chunk is not None, timeout=timeout)
+        if on_chunk is not None:
+            raw = asyncio.wait_for(raw, hard_timeout(timeout))
+        response, headers = unwrap_raw_response(await raw)
+        if on_chunk is None:
+            content = response.choices[0].message.content
+            return (content, self._call_metrics(formatted_messages, content, getattr(response, "usage", None), started)), headers
+        parts = []
+        usage = ttft = None
+        chunks = response.__aiter__()
+        try:
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), hard_timeout(timeout))
+                except StopAsyncIteration:
+                    break
+                usage = self._chunk_usage(chunk) or usage
+                text = self._chunk_text(chunk)
+                if text:
+                    if ttft is None:
+                        ttft = time.perf_counter() - started
+                    parts.append(text)
+                    on_chunk(text)
+        except Exception as e:
+            if parts:
+                raise self._partial_stream_error(e) from e
+            raise
+        content = "".join(parts)
+        return (content, self._call_metrics(formatted_messages, content, usage, started, ttft)), headers
+
+    def _call_model(self, formatted_messages: List[Dict[str, Any]],
+                    on_chunk: Optional[Callable[[str], None]]) -> Tuple[str, Dict[str, Any]]:
+        """Call the model through the call policy; (content, call metrics)"""
+        started = time.perf_counter()
+        content, metrics = self.call_policy.call(
+            self, lambda timeout: self._complete(formatted_messages, on_chunk, timeout)
+        )
+        # Total time including retries and backoff; the attempt's own time is in request_latency
+        metrics["request_latency"] = metrics["latency"]
+        metrics["latency"] = time.perf_counter() - started
+        return content, metrics
+
+    async def _acall_model(self, formatted_messages: List[Dict[str, Any]],
+                           on_chunk: Optional[Callable[[str], None]]) -> Tuple[str, Dict[str, Any]]:
+        """Async variant of _call_model"""
+        started = time.perf_counter()
+        content, metrics = await self.call_policy.acall(
+            self, lambda timeout: self._acomplete(formatted_messages, on_chunk, timeout), stream=on_chunk is not None
+        )
+        metrics["request_latency"] = metrics["latency"]
+        metrics["latency"] = time.perf_counter() - started
+        return content, metrics
+
+    def generate_response(
+            self,
+            prompt: Optional[str] = None,
+            on_chunk: Optional[Callable[[str], None]] = None
+    ) -> MCPMessage:
+        """Generate a response using the model API.
+
+        If on_chunk is given the completion is streamed and on_chunk is called
+        with each content chunk as it arrives; the full MCPMessage is still
+        built and returned once the stream ends.
+
+        Raises an AgentCallError subclass if the call policy gives up; nothing
+        is added to the context in that case.
+        """
+        with span("agent.generate_response", agent_id=self.agent_id, model=self.model) as trace:
+            self._add_prompt(prompt)
+
+            # Format messages for API
+            formatted_messages = self.format_messages_for_api()
+
+            # Cache hits skip the API call entirely
+            cache_key = self._cache_key(formatted_messages)
+            cached = self._cached_response(cache_key, on_chunk)
+            if cached is not None:
+                trace.set(message_id=cached.message_id, cache_hit=True)
+                return cached
+
+            content, metrics = self._call_model(formatted_messages, on_chunk)
+            if cache_key is not None:
+                self.cache.set(cache_key, content)
+            response = self._record_response(content, metrics)
+            trace.set(message_id=response.message_id)
+            return response
+
+    async def agenerate_response(
+            self,
+            prompt: Optional[str] = None,
+            on_chunk: Optional[Callable[[str], None]] = None
+    ) -> MCPMessage:
+        """Generate a response without blocking the event loop"""
+        with span("agent.generate_response", agent_id=self.agent_id, model=self.model) as trace:
+            self._add_prompt(prompt)
+
+            # Format messages for API
+            formatted_messages = self.format_messages_for_api()
+
+            # Cache hits skip the API call entirely
+            cache_key = self._cache_key(formatted_messages)
+            cached = self._cached_response(cache_key, on_chunk)
+            if cached is not None:
+                trace.set(message_id=cached.message_id, cache_hit=True)
+                return cached
+
+            content, metrics = await self._acall_model(formatted_messages, on_chunk)
+            if cache_key is not None:
+                self.cache.set(cache_key, content)
+            response = self._record_response(content, metrics)
+            trace.set(message_id=response.message_id)
+            return response
@@ -0,0 +1,146 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: cache.py
+@time: 10/17/26 09:10
+"""
+# agents/cache.py
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Any, Optional, Tuple
+
+
+class ResponseCache:
+    """Content-addressed cache of model responses.
+
+    Entries are keyed on a hash of everything that decides a completion
+    (formatted messages, model and sampling params). Lookups go through an
+    in-memory LRU first and fall back to an SQLite file so cached responses
+    survive restarts. Entries expire after ttl seconds, and the on-disk store
+    is trimmed to max_entries by least recent access.
+    """
+
+    # How many writes happen between two size-based evictions of the disk store
+    EVICT_EVERY = 64
+
+    def __init__(
+            self,
+            path: str = ".mcp_cache.sqlite",
+            max_entries: int = 10000,
+            memory_entries: int = 256,
+            ttl: Optional[float] = 7 * 24 * 3600
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+
+        self._memory: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, content TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(messages: List[Dict[str, Any]], model: str, temperature: float, max_tokens: int,
+                 provider: str = "") -> str:
+        """Hash the request parameters that fully decide a completion"""
+        payload = json.dumps(
+            [provider, model, temperature, max_tokens, messages],
+            sort_keys=True, ensure_ascii=False, separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl is not None and now - created > self.ttl
+
+    def _remember(self, key: str, content: str, created: float):
+        """Put an entry at the front of the in-memory LRU"""
+        self._memory[key] = (content, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached content for key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and not self._expired(entry[1], now):
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+            row = self._conn.execute(
+                "SELECT content, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or self._expired(row[1], now):
+                if row is not None:
+                    self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                    self._conn.commit()
+                self._memory.pop(key, None)
+                self.misses += 1
+                return None
+
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self._remember(key, row[0], row[1])
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, content: Optional[str]):
+        """Store content under key; a response without content (tool call, refusal) isn't cached"""
+        if content is None:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, content, created, accessed) VALUES (?, ?, ?, ?)",
+                (key, content, now, now)
+            )
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                self._evict()
+            self._conn.commit()
+            self._remember(key, content, now)
+
+    def _evict(self):
+        """Drop expired entries and trim the store to max_entries"""
+        if self.ttl is not None:
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+        self._conn.execute(
+            "DELETE FROM responses WHERE key IN ("
+            "SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current sizes"""
+        with self._lock:
+            stored = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+            "stored_entries": stored
+        }
+
+    def close(self):
+        """Apply pending eviction and close the SQLite connection"""
+        with self._lock:
+            self._evict()
+            self._conn.commit()
+            self._conn.close()
@@ -0,0 +1,126 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: clients.py
+@time: 10/17/26 14:30
+"""
+# agents/clients.py
+import importlib
+import importlib.util
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+# SDK module of each provider; both expose OpenAI-style clients
+PROVIDER_MODULES = {
+    "openai": ("openai", "OpenAI", "AsyncOpenAI"),
+    "groq": ("groq", "Groq", "AsyncGroq"),
+}
+
+
+class PoolConfig:
+    """Settings of the HTTP connection pool shared by all clients of a provider"""
+
+    def __init__(
+            self,
+            max_connections: int = 100,
+            max_keepalive_connections: int = 20,
+            keepalive_expiry: float = 30.0,
+            http2: bool = True
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        # Only used when the optional h2 package is installed
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+
+
+class ClientRegistry:
+    """Process-wide cache of provider SDK clients.
+
+    Clients are keyed by provider, base URL and API key, so agents with the
+    same settings share one client. All clients of a provider (sync and async
+    separately) also share one HTTP client, so connections and TLS sessions
+    to the same host are pooled and kept alive across agents and runs.
+    Async clients belong to the event loop they are first used on.
+    """
+
+    def __init__(self, pool: Optional[PoolConfig] = None):
+        self.pool = pool or PoolConfig()
+        self._clients: Dict[Tuple[str, Optional[str], str, bool], Any] = {}
+        self._http_clients: Dict[Tuple[str, bool], Any] = {}
+        self._lock = threading.Lock()
+
+    def get(self, provider: str, api_key: str, base_url: Optional[str] = None, use_async: bool = False) -> Any:
+        """Borrow the client for these settings, creating it on first use"""
+        key = (provider, base_url, api_key, use_async)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self._build(provider, api_key, base_url, use_async)
+                self._clients[key] = client
+            return client
+
+    def _sdk(self, provider: str):
+        if provider not in PROVIDER_MODULES:
+            raise ValueError(f"Unsupported provider: {provider}")
+        return importlib.import_module(PROVIDER_MODULES[provider][0])
+
+    def _http_client(self, provider: str, use_async: bool) -> Any:
+        """Shared HTTP client (and connection pool) for a provider"""
+        key = (provider, use_async)
+        http_client = self._http_clients.get(key)
+        if http_client is None:
+            sdk = self._sdk(provider)
+            # Build Limits from the httpx flavour the SDK itself uses
+            limits = type(sdk.DEFAULT_CONNECTION_LIMITS)(
+                max_connections=self.pool.max_connections,
+                max_keepalive_connections=self.pool.max_keepalive_connections,
+                keepalive_expiry=self.pool.keepalive_expiry
+            )
+            client_cls = sdk.DefaultAsyncHttpxClient if use_async else sdk.DefaultHttpxClient
+            http_client = client_cls(limits=limits, http2=self.pool.http2)
+            self._http_clients[key] = http_client
+        return http_client
+
+    def _build(self, provider: str, api_key: str, base_url: Optional[str], use_async: bool) -> Any:
+        sdk = self._sdk(provider)
+        _, sync_name, async_name = PROVIDER_MODULES[provider]
+        client_cls = getattr(sdk, async_name if use_async else sync_name)
+
+        # Retries are left to the agents' call policy (agents/policy.py)
+        client_args = {"api_key": api_key, "http_client": self._http_client(provider, use_async), "max_retries": 0}
+        if base_url:
+            client_args["base_url"] = base_url
+        return client_cls(**client_args)
+
+    def stats(self) -> Dict[str, int]:
+        """Number of SDK clients and shared HTTP clients created so far"""
+        return {"clients": len(self._clients), "http_clients": len(self._http_clients)}
+
+    def close(self):
+        """Close the shared sync HTTP clients (async ones close with their event loop)"""
+        with self._lock:
+            for (provider, use_async), http_client in self._http_clients.items():
+                if not use_async:
+                    http_client.close()
+            self._clients.clear()
+            self._http_clients.clear()
+
+
+_default_registry: Optional[ClientRegistry] = None
+
+
+def get_registry() -> ClientRegistry:
+    """The process-wide registry agents borrow clients from by default"""
+    global _default_registry
+    if _default_registry is None:
+        _default_registry = ClientRegistry()
+    return _default_registry
+
+
+def configure_pool(pool: PoolConfig):
+    """Set the default registry's pool settings; call before any agent is created"""
+    global _default_registry
+    if _default_registry is not None and _default_registry.stats()["http_clients"]:
+        raise RuntimeError("configure_pool must be called before clients are created")
+    _default_registry = ClientRegistry(pool)
@@ -0,0 +1,295 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: context.py
+@time: 10/17/26 10:05
+"""
+# agents/context.py
+from typing import Callable, Dict, FrozenSet, List, Optional, Set, Tuple
+from mcp.protocol import MCPMessage
+
+try:
+    import tiktoken
+except ImportError:  # optional dependency, fall back to a character estimate
+    tiktoken = None
+
+# Context window sizes (in tokens) of the models we use
+MODEL_CONTEXT_WINDOWS: Dict[str, int] = {
+    "llama3-8b-8192": 8192,
+    "llama3-70b-8192": 8192,
+    "mixtral-8x7b-32768": 32768,
+    "gpt-4": 8192,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Tokens the chat format adds around every message, and to prime the reply
+MESSAGE_OVERHEAD_TOKENS = 4
+REPLY_OVERHEAD_TOKENS = 3
+
+TRUNCATION_MARKER = "\n[... truncated ...]"
+
+STRATEGIES = ("drop", "truncate", "summarize")
+
+_encoder = None
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with tiktoken when installed, otherwise estimate ~4 chars/token"""
+    global _encoder
+    if tiktoken is None:
+        return len(text) // 4 + 1
+    if _encoder is None:
+        _encoder = tiktoken.get_encoding("cl100k_base")
+    return len(_encoder.encode(text, disallowed_special=()))
+
+
+def message_tokens(message: MCPMessage) -> int:
+    """Token count of a message, cached on the message itself"""
+    if message.token_count is None:
+        message.token_count = count_tokens(message.content) + MESSAGE_OVERHEAD_TOKENS
+    return message.token_count
+
+
+def truncate_text(text: str, max_tokens: int) -> str:
+    """Keep the beginning of text so that it fits in roughly max_tokens"""
+    if max_tokens <= 0:
+        return TRUNCATION_MARKER.strip()
+    if tiktoken is not None:
+        count_tokens("")  # make sure the encoder is loaded
+        tokens = _encoder.encode(text, disallowed_special=())
+        if len(tokens) <= max_tokens:
+            return text
+        return _encoder.decode(tokens[:max_tokens]) + TRUNCATION_MARKER
+    max_chars = max_tokens * 4
+    if len(text) <= max_chars:
+        return text
+    return text[:max_chars] + TRUNCATION_MARKER
+
+
+def extractive_summary(messages: List[MCPMessage], previous: Optional[str] = None,
+                       chars_per_message: int = 300) -> str:
+    """Cheap summary without a model call: the opening of every message"""
+    lines = []
+    if previous:
+        lines.append(previous)
+    for msg in messages:
+        text = " ".join(msg.content.split())
+        if len(text) > chars_per_message:
+            text = text[:chars_per_message].rsplit(" ", 1)[0] + " ..."
+        lines.append(f"- [{msg.agent_id}/{msg.role}] {text}")
+    return "\n".join(lines)
+
+
+class ContextWindow:
+    """Keeps the messages sent to a model within its context window.
+
+    fit() never modifies the agent's history; it returns the list of messages
+    to send. Leading system messages, the most recent keep_recent messages and
+    every message those recent messages reference are always kept. Older
+    messages are removed oldest first according to the strategy:
+
+    - "drop": remove them
+    - "truncate": shorten them to truncate_tokens first, then drop if needed
+    - "summarize": replace them with a single rolling summary message
+
+    Reductions stick: messages removed or shortened by one call stay so in
+    the next, and when more must go the prompt is cut down to low_watermark
+    of the budget. The start of the prompt then changes only every few turns
+    instead of on every call, so providers can keep serving it from their
+    prompt-prefix cache.
+
+    Summaries are cached and extended incrementally as more messages fall out
+    of the window, so summarizer runs once per evicted message rather than once
+    per call. summarizer(messages, previous_summary) defaults to an extractive
+    summary.
+    """
+
+    def __init__(
+            self,
+            strategy: str = "truncate",
+            max_context_tokens: Optional[int] = None,
+            keep_recent: int = 4,
+            truncate_tokens: int = 256,
+            summary_tokens: int = 512,
+            summarizer: Optional[Callable[[List[MCPMessage], Optional[str]], str]] = None,
+            low_watermark: float = 0.8
+    ):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown context strategy: {strategy}")
+        if not 0 < low_watermark <= 1:
+            raise ValueError("low_watermark must be in (0, 1]")
+        self.strategy = strategy
+        self.max_context_tokens = max_context_tokens
+        self.keep_recent = keep_recent
+        self.truncate_tokens = truncate_tokens
+        self.summary_tokens = summary_tokens
+        self.summarizer = summarizer or extractive_summary
+        self.low_watermark = low_watermark
+
+        # Messages evicted or truncated by the last fit(), repeated by the next one
+        self._evicted_ids: FrozenSet[str] = frozenset()
+        self._truncated_ids: FrozenSet[str] = frozenset()
+
+        # Rolling summary state: ids already folded into the summary, and its text
+        self._summarized_ids: Tuple[str, ...] = ()
+        self._summary: Optional[str] = None
+        self._summary_message: Optional[MCPMessage] = None
+
+    def budget(self, model: str, reserve_tokens: int) -> int:
+        """Prompt tokens available for a model after reserving room for the reply"""
+        window = self.max_context_tokens or MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+        return window - reserve_tokens - REPLY_OVERHEAD_TOKENS
+
+    def fit(self, messages: List[MCPMessage], model: str, reserve_tokens: int = 0,
+            total_tokens: Optional[int] = None) -> List[MCPMessage]:
+        """Return the messages to send so that the prompt fits the model's budget.
+
+        The messages list itself is returned when everything fits. Callers that
+        keep a running token total can pass it to skip recounting the history.
+        """
+        budget = self.budget(model, reserve_tokens)
+        total = total_tokens if total_tokens is not None else sum(message_tokens(msg) for msg in messages)
+        if total <= budget:
+            return messages
+
+        pinned = self._pinned_indexes(messages)
+        removable = [i for i in range(len(messages)) if i not in pinned]
+
+        kept: Dict[int, MCPMessage] = dict(enumerate(messages))
+        evicted_indexes: List[int] = []
+        summary_tokens = 0
+
+        def truncate(i: int):
+            nonlocal total
+            shortened = self._truncated(messages[i], self.truncate_tokens)
+            total -= message_tokens(messages[i]) - message_tokens(shortened)
+            kept[i] = shortened
+
+        def evict(i: int):
+            nonlocal total, summary_tokens
+            total -= message_tokens(kept.pop(i))
+            evicted_indexes.append(i)
+            if self.strategy == "summarize":
+                summary_tokens = self.summary_tokens + MESSAGE_OVERHEAD_TOKENS
+
+        # Repeat the previous call's reductions first, so the start of the prompt stays
+        # byte-identical and the provider can serve it from its prompt-prefix cache
+        for i in removable:
+            if messages[i].message_id in self._evicted_ids:
+                evict(i)
+            elif self.strategy == "truncate" and messages[i].message_id in self._truncated_ids:
+                truncate(i)
+
+        # Only when that no longer fits, reduce further, oldest first, down to low_watermark of
+        # the budget so that the next calls fit without touching the prefix again
+        if total + summary_tokens > budget:
+            target = budget * self.low_watermark
+            if self.strategy == "truncate":
+                for i in removable:
+                    if total <= target:
+                        break
+                    if kept.get(i) is messages[i]:
+                        truncate(i)
+            for i in removable:
+                if total + summary_tokens <= target:
+                    break
+                if i in kept:
+                    evict(i)
+
+        evicted_indexes.sort()
+        evicted = [messages[i] for i in evicted_indexes]
+        self._evicted_ids = frozenset(msg.message_id for msg in evicted)
+        self._truncated_ids = frozenset(kept[i].message_id for i in kept if kept[i] is not messages[i])
+
+        result = [kept[i] for i in sorted(kept)]
+        if evicted and self.strategy == "summarize":
+            summary_msg = self._summarize(evicted)
+            total += message_tokens(summary_msg)
+            # The summary goes right after the leading system messages
+            insert_at = 0
+            while insert_at < len(result) and result[insert_at].role == "system":
+                insert_at += 1
+            result.insert(insert_at, summary_msg)
+
+        if total > budget:
+            result = self._shrink_pinned(result, total - budget)
+        return result
+
+    def _pinned_indexes(self, messages: List[MCPMessage]) -> Set[int]:
+        """Indexes that must survive: system prompt, recent messages and their references"""
+        pinned: Set[int] = set()
+        i = 0
+        while i < len(messages) and messages[i].role == "system":
+            pinned.add(i)
+            i += 1
+
+        recent_start = max(i, len(messages) - self.keep_recent)
+        pinned.update(range(recent_start, len(messages)))
+
+        referenced = set()
+        for msg in messages[recent_start:]:
+            referenced.update(msg.references)
+        if referenced:
+            for index, msg in enumerate(messages):
+                if msg.message_id in referenced:
+                    pinned.add(index)
+        return pinned
+
+    def _summarize(self, evicted: List[MCPMessage]) -> MCPMessage:
+        """Fold newly evicted messages into the rolling summary"""
+        ids = tuple(msg.message_id for msg in evicted)
+        if ids == self._summarized_ids and self._summary_message is not None:
+            return self._summary_message
+
+        if self._summary is not None and ids[:len(self._summarized_ids)] == self._summarized_ids:
+            # Only summarize what fell out of the window since last time
+            new_messages = evicted[len(self._summarized_ids):]
+            summary = self.summarizer(new_messages, self._summary)
+        else:
+            summary = self.summarizer(evicted, None)
+        summary = truncate_text(summary, self.summary_tokens)
+
+        self._summarized_ids = ids
+        self._summary = summary
+        self._summary_message = MCPMessage(
+            role="system",
+            content=f"Summary of earlier conversation:\n{summary}",
+            agent_id="context_manager",
+            references=list(ids),
+            metadata={"type": "context_summary"}
+        )
+        return self._summary_message
+
+    def _shrink_pinned(self, messages: List[MCPMessage], excess: int) -> List[MCPMessage]:
+        """Last resort: truncate the longest non-system messages except the newest one"""
+        result = list(messages)
+        candidates = sorted(
+            (i for i in range(len(result) - 1) if result[i].role != "system"),
+            key=lambda i: message_tokens(result[i]),
+            reverse=True
+        )
+        for i in candidates:
+            if excess <= 0:
+                break
+            current = message_tokens(result[i])
+            shortened = self._truncated(result[i], max(current - excess, self.truncate_tokens) - MESSAGE_OVERHEAD_TOKENS)
+            excess -= current - message_tokens(shortened)
+            result[i] = shortened
+        return result
+
+    @staticmethod
+    def _truncated(message: MCPMessage, max_tokens: int) -> MCPMessage:
+        """Copy of message with its content cut to max_tokens (ids and references kept)"""
+        content = truncate_text(message.content, max_tokens)
+        if content == message.content:
+            return message
+        return MCPMessage(
+            role=message.role,
+            content=content,
+            agent_id=message.agent_id,
+            message_id=message.message_id,
+            references=message.references,
+            metadata=message.metadata
+        )
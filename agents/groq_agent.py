@@ -7,14 +7,19 @@
 # agents/groq_agent.py
 import os
 from typing import Dict, List, Any, Optional
-from groq import Groq
-from mcp.protocol import MCPMessage
+from groq import Groq, AsyncGroq
 from agents.base import BaseAgent
+from agents.cache import ResponseCache
+from agents.context import ContextWindow
+from agents.policy import CallPolicy
+from agents.clients import ClientRegistry, get_registry
 
 
 class GroqAgent(BaseAgent):
     """Agent implementation for Groq models (Llama 3, etc.)"""
 
+    provider_name = "Groq"
+
     def __init__(
             self,
             agent_id: str,
@@ -22,7 +27,13 @@ class GroqAgent(BaseAgent):
             role: str,
             api_key: str,
             model: str,
-            system_prompt: Optional[str] = None
+            system_prompt: Optional[str] = None,
+            temperature: float = 0.7,
+            max_tokens: int = 2048,
+            cache: Optional[ResponseCache] = None,
+            context_window: Optional[ContextWindow] = None,
+            call_policy: Optional[CallPolicy] = None,
+            client_registry: Optional[ClientRegistry] = None
     ):
         super().__init__(
             agent_id=agent_id,
@@ -31,65 +42,52 @@ class GroqAgent(BaseAgent):
             api_key=api_key,
             model=model,
             api_url=None,  # Not needed for Groq client
-            system_prompt=system_prompt
+            system_prompt=system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            cache=cache,
+            context_window=context_window,
+            call_policy=call_policy
         )
-        # Initialize Groq client
-        self.client = Groq(api_key=api_key)
-
-    def format_messages_for_api(self) -> List[Dict[str, Any]]:
-        """Format messages for Groq API"""
-        formatted_messages = []
-
-        for msg in self.messages:
-            formatted_messages.append({
-                "role": msg.role,
-                "content": msg.content
-            })
-
-        return formatted_messages
-
-    def generate_response(self, prompt: Optional[str] = None) -> MCPMessage:
-        """Generate a response using Groq API"""
-        # If a new prompt is provided, add it as a user message
-        if prompt:
-            user_msg = MCPMessage(
-                role="user",
-                content=prompt,
-                agent_id="human",
-                metadata={"type": "query"}
-            )
-            self.add_message(user_msg)
+        # Pooled Groq clients are borrowed from here, shared by agents with the same key
+        self.client_registry = client_registry or get_registry()
 
-        # Format messages for API
-        formatted_messages = self.format_messages_for_api()
+    @property
+    def client(self) -> Groq:
+        """Pooled sync Groq client, created on first use; async workflows never build one"""
+        return self.client_registry.get("groq", self.api_key)
 
-        try:
-            # Call Groq API
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=formatted_messages,
-                temperature=0.7,
-                max_tokens=2048
-            )
+    @property
+    def async_client(self) -> AsyncGroq:
+        """Pooled async Groq client, created on first use"""
+        return self.client_registry.get("groq", self.api_key, use_async=True)
 
-            # Extract response content
-            content = response.choices[0].message.content
+    @staticmethod
+    def _chunk_usage(chunk: Any) -> Any:
+        """Groq reports token usage of a stream in the last chunk's x_groq field"""
+        x_groq = getattr(chunk, "x_groq", None)
+        return getattr(x_groq, "usage", None) or getattr(chunk, "usage", None)
 
-            # Create MCP message from response
-            # Find message IDs to reference
-            references = []
-            if self.messages and self.messages[-1].role == "user":
-                references.append(self.messages[-1].message_id)
-
-            response_msg = self.create_message(content=content, references=references)
-            self.add_message(response_msg)
-
-            return response_msg
+    def _create_completion(self, messages: List[Dict[str, Any]], stream: bool = False,
+                           timeout: Optional[float] = None) -> Any:
+        """Call Groq API; the raw response carries the rate-limit headers"""
+        return self.client.chat.completions.with_raw_response.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            stream=stream,
+            timeout=timeout
+        )
 
-        except Exception as e:
-            error_msg = f"Error in Groq API call: {str(e)}"
-            print(error_msg)
-            # Return error as message
-            error_response = self.create_message(content=error_msg)
-            self.add_message(error_response)
-            return error_response
\ No newline at end of file
+    async def _acreate_completion(self, messages: List[Dict[str, Any]], stream: bool = False,
+                                  timeout: Optional[float] = None) -> Any:
+        """Call Groq API with the async client"""
+        return await self.async_client.chat.completions.with_raw_response.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            stream=stream,
+            timeout=timeout
+        )
@@ -0,0 +1,198 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: mock_agent.py
+@time: 10/17/26 18:40
+"""
+# agents/mock_agent.py
+import asyncio
+import math
+import random
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+from agents.base import BaseAgent
+from agents.cache import ResponseCache
+from agents.context import ContextWindow, count_tokens
+from agents.policy import CallPolicy
+from mcp.transcript import read_transcript
+
+LATENCY_DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+
+
+class MockAPIError(Exception):
+    """Injected API failure; status_code drives the call policy's retry decision like an SDK error"""
+
+    def __init__(self, status_code: int):
+        super().__init__(f"Injected mock API error (HTTP {status_code})")
+        self.status_code = status_code
+
+
+class MockAgent(BaseAgent):
+    """Offline agent that answers without a network or API key.
+
+    Responses come from responses: a list cycled in order, a callable taking
+    the API-formatted messages, or by default a short echo of the last user
+    message. Each call waits a first-token latency drawn from
+    latency_distribution (median latency, spread jitter), plus the completion
+    tokens divided by tokens_per_second if set; streamed calls spread that
+    time over the chunks. With error_rate each attempt fails with
+    MockAPIError(error_status) at that probability. Everything random is drawn
+    from one seeded generator, so runs repeat exactly. Calls go through the
+    normal BaseAgent path: call policy, cache, metrics and tracing.
+    """
+
+    provider_name = "Mock"
+
+    def __init__(
+            self,
+            agent_id: str,
+            name: str,
+            role: str,
+            model: str = "mock",
+            system_prompt: Optional[str] = None,
+            responses: Union[Sequence[str], Callable[[List[Dict[str, Any]]], str], None] = None,
+            latency: float = 0.0,
+            jitter: float = 0.0,
+            latency_distribution: str = "fixed",
+            tokens_per_second: Optional[float] = None,
+            error_rate: float = 0.0,
+            error_status: int = 503,
+            seed: Optional[int] = 0,
+            temperature: float = 0.7,
+            max_tokens: int = 2048,
+            cache: Optional[ResponseCache] = None,
+            context_window: Optional[ContextWindow] = None,
+            call_policy: Optional[CallPolicy] = None
+    ):
+        if latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {latency_distribution!r}; "
+                             f"choose from {', '.join(LATENCY_DISTRIBUTIONS)}")
+        super().__init__(
+            agent_id=agent_id,
+            name=name,
+            role=role,
+            api_key="mock",
+            model=model,
+            api_url=None,
+            system_prompt=system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            cache=cache,
+            context_window=context_window,
+            call_policy=call_policy
+        )
+        self.responses = responses
+        self.latency = latency
+        self.jitter = jitter
+        self.latency_distribution = latency_distribution
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+
+    @classmethod
+    def from_transcript(cls, path: str, agent: str, **kwargs) -> "MockAgent":
+        """Mock that replays, in order, the responses agent (id or display name) gave in a transcript"""
+        replies = [msg.content for msg in read_transcript(path)
+                   if msg.role == "assistant"
+                   and (msg.agent_id == agent or msg.get_metadata("agent") == agent)]
+        if not replies:
+            raise ValueError(f"No responses from {agent} in {path}")
+        return cls(responses=replies, **kwargs)
+
+    def _reply(self, messages: List[Dict[str, Any]]) -> str:
+        if callable(self.responses):
+            return self.responses(messages)
+        if self.responses:
+            return self.responses[(self.calls - 1) % len(self.responses)]
+        last_user = next((m["content"] for m in reversed(messages) if m["role"] == "user"), "")
+        return f"{self.name} mock response {self.calls} to: {last_user[:80]}"
+
+    def _first_token_latency(self) -> float:
+        if self.latency_distribution == "uniform":
+            value = self.random.uniform(self.latency - self.jitter, self.latency + self.jitter)
+        elif self.latency_distribution == "normal":
+            value = self.random.gauss(self.latency, self.jitter)
+        elif self.latency_distribution == "lognormal":
+            # latency is the median, jitter the sigma of the underlying normal
+            value = self.random.lognormvariate(math.log(self.latency), self.jitter) if self.latency > 0 else 0.0
+        else:
+            value = self.latency
+        return max(0.0, value)
+
+    def _plan(self, messages: List[Dict[str, Any]], timeout: Optional[float], stream: bool = False):
+        """Draw one attempt: ((content, usage, generation seconds) or the error to raise, first-token delay)"""
+        self.calls += 1
+        delay = self._first_token_latency()
+        if self.error_rate and self.random.random() < self.error_rate:
+            self.errors += 1
+            return MockAPIError(self.error_status), delay
+        content = self._reply(messages)
+        usage = SimpleNamespace(
+            prompt_tokens=sum(count_tokens(m["content"]) for m in messages),
+            completion_tokens=count_tokens(content)
+        )
+        usage.total_tokens = usage.prompt_tokens + usage.completion_tokens
+        generation = usage.completion_tokens / self.tokens_per_second if self.tokens_per_second else 0.0
+        # Like the SDKs' read timeout, a stream's timeout bounds the wait for each chunk, not the whole answer
+        waited = max(delay, generation / (len(content.split(" ")) + 1)) if stream else delay + generation
+        if timeout is not None and waited > timeout:
+            return TimeoutError(f"Mock call took longer than the {timeout}s timeout"), timeout
+        return (content, usage, generation), delay
+
+    @staticmethod
+    def _response(content: str, usage: Any) -> Any:
+        message = SimpleNamespace(role="assistant", content=content)
+        return SimpleNamespace(choices=[SimpleNamespace(index=0, message=message, finish_reason="stop")],
+                               usage=usage)
+
+    @staticmethod
+    def _chunks(content: str, usage: Any) -> List[Any]:
+        """Word-sized content chunks, then a usage-only chunk as OpenAI sends with include_usage"""
+        words = content.split(" ")
+        texts = [word + " " for word in words[:-1]] + [words[-1]]
+        chunks = [SimpleNamespace(choices=[SimpleNamespace(index=0, delta=SimpleNamespace(content=text))],
+                                  usage=None) for text in texts]
+        chunks.append(SimpleNamespace(choices=[], usage=usage))
+        return chunks
+
+    def _create_completion(self, messages: List[Dict[str, Any]], stream: bool = False,
+                           timeout: Optional[float] = None) -> Any:
+        outcome, delay = self._plan(messages, timeout, stream)
+        time.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        content, usage, generation = outcome
+        if not stream:
+            time.sleep(generation)
+            return self._response(content, usage)
+
+        chunks = self._chunks(content, usage)
+
+        def stream_chunks():
+            for chunk in chunks:
+                yield chunk
+                time.sleep(generation / len(chunks))
+        return stream_chunks()
+
+    async def _acreate_completion(self, messages: List[Dict[str, Any]], stream: bool = False,
+                                  timeout: Optional[float] = None) -> Any:
+        outcome, delay = self._plan(messages, timeout, stream)
+        await asyncio.sleep(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        content, usage, generation = outcome
+        if not stream:
+            await asyncio.sleep(generation)
+            return self._response(content, usage)
+
+        chunks = self._chunks(content, usage)
+
+        async def stream_chunks():
+            for chunk in chunks:
+                yield chunk
+                await asyncio.sleep(generation / len(chunks))
+        return stream_chunks()
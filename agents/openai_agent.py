@@ -7,14 +7,19 @@
 # agents/openai_agent.py
 import os
 from typing import Dict, List, Any, Optional
-from openai import OpenAI
-from mcp.protocol import MCPMessage
+from openai import OpenAI, AsyncOpenAI
 from agents.base import BaseAgent
+from agents.cache import ResponseCache
+from agents.context import ContextWindow
+from agents.policy import CallPolicy
+from agents.clients import ClientRegistry, get_registry
 
 
 class OpenAIAgent(BaseAgent):
     """Agent implementation for OpenAI models, optionally using LiteLLM proxy"""
 
+    provider_name = "OpenAI"
+
     def __init__(
             self,
             agent_id: str,
@@ -23,7 +28,13 @@ class OpenAIAgent(BaseAgent):
             api_key: str,
             model: str,
             base_url: Optional[str] = None,
-            system_prompt: Optional[str] = None
+            system_prompt: Optional[str] = None,
+            temperature: float = 0.7,
+            max_tokens: int = 2048,
+            cache: Optional[ResponseCache] = None,
+            context_window: Optional[ContextWindow] = None,
+            call_policy: Optional[CallPolicy] = None,
+            client_registry: Optional[ClientRegistry] = None
     ):
         super().__init__(
             agent_id=agent_id,
@@ -32,74 +43,58 @@ class OpenAIAgent(BaseAgent):
             api_key=api_key,
             model=model,
             api_url=base_url,  # Store base_url in api_url for consistency
-            system_prompt=system_prompt
+            system_prompt=system_prompt,
+            temperature=temperature,
+            max_tokens=max_tokens,
+            cache=cache,
+            context_window=context_window,
+            call_policy=call_policy
+        )
+
+        # Pooled OpenAI clients are borrowed from here; agents with the same key and
+        # base URL (LiteLLM proxy or default OpenAI URL) share them and their connections
+        self.client_registry = client_registry or get_registry()
+
+    @property
+    def client(self) -> OpenAI:
+        """Pooled sync OpenAI client, created on first use; async workflows never build one"""
+        return self.client_registry.get("openai", self.api_key, self.api_url)
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """Pooled async OpenAI client, created on first use"""
+        return self.client_registry.get("openai", self.api_key, self.api_url, use_async=True)
+
+    @staticmethod
+    def _stream_options(stream: bool) -> Dict[str, Any]:
+        """Ask for token usage in the final chunk of a stream"""
+        return {"stream_options": {"include_usage": True}} if stream else {}
+
+    def _create_completion(self, messages: List[Dict[str, Any]], stream: bool = False,
+                           timeout: Optional[float] = None) -> Any:
+        """Call OpenAI API; the raw response carries the rate-limit headers"""
+        return self.client.chat.completions.with_raw_response.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            stream=stream,
+            timeout=timeout,
+            **self._stream_options(stream)
         )
 
-        # Use LiteLLM base URL if provided, otherwise use default OpenAI URL
-        client_args = {"api_key": api_key}
-        if base_url:
-            client_args["base_url"] = base_url
-
-        # Initialize OpenAI client
-        self.client = OpenAI(**client_args)
-
-    def format_messages_for_api(self) -> List[Dict[str, Any]]:
-        """Format messages for OpenAI API"""
-        formatted_messages = []
-
-        for msg in self.messages:
-            formatted_messages.append({
-                "role": msg.role,
-                "content": msg.content
-            })
-
-        return formatted_messages
-
-    def generate_response(self, prompt: Optional[str] = None) -> MCPMessage:
-        """Generate a response using OpenAI API"""
-        # If a new prompt is provided, add it as a user message
-        if prompt:
-            user_msg = MCPMessage(
-                role="user",
-                content=prompt,
-                agent_id="human",
-                metadata={"type": "query"}
-            )
-            self.add_message(user_msg)
-
-        # Format messages for API
-        formatted_messages = self.format_messages_for_api()
-
-        try:
-            # Call OpenAI API
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=formatted_messages,
-                temperature=0.7,
-                max_tokens=2048
-            )
-
-            # Extract response content
-            content = response.choices[0].message.content
-
-            # Create MCP message from response
-            # Find message IDs to reference
-            references = []
-            if self.messages and self.messages[-1].role == "user":
-                references.append(self.messages[-1].message_id)
-
-            response_msg = self.create_message(content=content, references=references)
-            self.add_message(response_msg)
-
-            return response_msg
-
-        except Exception as e:
-            error_msg = f"Error in OpenAI API call: {str(e)}"
-            print(error_msg)
-            # Return error as message
-            error_response = self.create_message(content=error_msg)
-            self.add_message(error_response)
-            return error_response
+    async def _acreate_completion(self, messages: List[Dict[str, Any]], stream: bool = False,
+                                  timeout: Optional[float] = None) -> Any:
+        """Call OpenAI API with the async client"""
+        return await self.async_client.chat.completions.with_raw_response.create(
+            model=self.model,
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            stream=stream,
+            timeout=timeout,
+            **self._stream_options(stream)
+        )
 
 
 if __name__ == "__main__":
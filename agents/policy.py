@@ -0,0 +1,363 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: policy.py
+@time: 10/17/26 15:40
+"""
+# agents/policy.py
+import asyncio
+import random
+import re
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Mapping, Optional, Tuple
+from mcp.tracing import span
+
+
+class AgentCallError(Exception):
+    """A model call that failed for good, after the call policy gave up on it"""
+
+    def __init__(self, message: str, agent_id: str = "", provider: str = "", model: str = "",
+                 retryable: bool = False, attempts: int = 1, cause: Optional[BaseException] = None):
+        super().__init__(message)
+        self.agent_id = agent_id
+        self.provider = provider
+        self.model = model
+        self.retryable = retryable
+        self.attempts = attempts
+        self.cause = cause
+
+
+class RateLimitError(AgentCallError):
+    """The provider kept answering 429 Too Many Requests"""
+
+
+class CallTimeoutError(AgentCallError):
+    """The call did not finish within its timeout"""
+
+
+class CircuitOpenError(AgentCallError):
+    """Calls to this provider/model are failing; not attempted until the breaker resets"""
+
+
+class ProviderError(AgentCallError):
+    """Any other API or connection error"""
+
+
+def classify_error(error: BaseException) -> Tuple[type, bool]:
+    """Map an SDK/HTTP exception to (AgentCallError subclass, retryable)"""
+    if isinstance(error, AgentCallError):
+        return type(error), error.retryable
+    name = type(error).__name__
+    status = getattr(error, "status_code", None)
+    if status == 429 or name == "RateLimitError":
+        return RateLimitError, True
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)) or "Timeout" in name:
+        return CallTimeoutError, True
+    if name in ("APIConnectionError", "ConnectError", "RemoteProtocolError", "ReadError"):
+        return ProviderError, True
+    if status is not None:
+        # 408/409 and 5xx are worth another try, other 4xx are our fault
+        return ProviderError, status in (408, 409) or status >= 500
+    return ProviderError, False
+
+
+_DURATION_PART = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """Seconds from a rate-limit reset header such as "1s", "6m0s", "250ms" or "2.5" """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    parts = _DURATION_PART.findall(value)
+    if not parts:
+        return None
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+
+class TokenBucket:
+    """Token-bucket rate limiter for one provider/model, fed by rate-limit headers.
+
+    With rate=None there is no static limit; the bucket then only blocks when
+    the provider's headers say the request quota is used up, until it resets.
+    """
+
+    def __init__(self, rate: Optional[float] = None, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or (rate if rate else 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """Take a token; return how long the caller must wait before using it"""
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._blocked_until - now)
+            if self.rate:
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                self._tokens -= 1
+                if self._tokens < 0:
+                    wait = max(wait, -self._tokens / self.rate)
+            return wait
+
+    def acquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+    async def aacquire(self):
+        wait = self._reserve()
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+    def block_for(self, seconds: float):
+        """Hold all callers back for seconds (e.g. after a 429 with Retry-After)"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+
+    def update_from_headers(self, headers: Mapping[str, str]):
+        """Apply x-ratelimit-* / retry-after response headers"""
+        retry_after = parse_reset(headers.get("retry-after"))
+        if retry_after:
+            self.block_for(retry_after)
+        remaining = headers.get("x-ratelimit-remaining-requests")
+        if remaining is not None and remaining.strip() in ("0", "0.0"):
+            reset = parse_reset(headers.get("x-ratelimit-reset-requests"))
+            if reset:
+                self.block_for(reset)
+
+
+class CircuitBreaker:
+    """Opens after failure_threshold consecutive failures and fails fast for reset_timeout seconds.
+
+    After that one trial call is let through (half-open); its outcome closes
+    or re-opens the breaker. A trial that ends any other way (a non-retryable
+    error, a cancellation) says nothing about the provider, so release_trial
+    lets the next call try instead.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def admit(self) -> Optional[bool]:
+        """None if the call must fail fast, else whether it is the half-open trial"""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return False
+            if state == "half_open" and not self._trial_running:
+                self._trial_running = True
+                return True
+            return None
+
+    def allow(self) -> bool:
+        return self.admit() is not None
+
+    def release_trial(self):
+        """End a half-open trial without an outcome; a no-op once one was recorded"""
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial_running = False
+            if self.failures >= self.failure_threshold or self._opened_at is not None:
+                self._opened_at = time.monotonic()
+
+
+def _response_headers(error: BaseException) -> Mapping[str, str]:
+    response = getattr(error, "response", None)
+    return getattr(response, "headers", None) or {}
+
+
+class CallPolicy:
+    """Retries, backoff, timeouts, rate limiting and circuit breaking for model calls.
+
+    Rate limiters and circuit breakers are kept per (provider, model) and
+    shared by every agent using this policy. Failed attempts are retried with
+    exponential backoff and full jitter when the error is transient; once the
+    policy gives up, an AgentCallError subclass is raised.
+    """
+
+    def __init__(
+            self,
+            max_retries: int = 3,
+            base_delay: float = 0.5,
+            max_delay: float = 20.0,
+            timeout: Optional[float] = 60.0,
+            requests_per_second: Optional[float] = None,
+            failure_threshold: int = 5,
+            reset_timeout: float = 30.0
+    ):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self.requests_per_second = requests_per_second
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._limiters: Dict[Tuple[str, str], TokenBucket] = {}
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, provider: str, model: str) -> TokenBucket:
+        with self._lock:
+            key = (provider, model)
+            if key not in self._limiters:
+                self._limiters[key] = TokenBucket(self.requests_per_second)
+            return self._limiters[key]
+
+    def breaker(self, provider: str, model: str) -> CircuitBreaker:
+        with self._lock:
+            key = (provider, model)
+            if key not in self._breakers:
+                self._breakers[key] = CircuitBreaker(self.failure_threshold, self.reset_timeout)
+            return self._breakers[key]
+
+    def backoff(self, attempt: int) -> float:
+        """Full-jitter exponential backoff before retry number attempt (1-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def _fail(self, agent, error: BaseException, attempts: int) -> AgentCallError:
+        error_cls, retryable = classify_error(error)
+        if isinstance(error, AgentCallError):
+            error.attempts = attempts
+            return error
+        return error_cls(
+            f"{agent.provider_name} call for {agent.agent_id} failed after {attempts} attempt(s): {error}",
+            agent_id=agent.agent_id, provider=agent.provider_name, model=agent.model,
+            retryable=retryable, attempts=attempts, cause=error
+        )
+
+    def _circuit_open(self, agent) -> CircuitOpenError:
+        return CircuitOpenError(
+            f"Circuit open for {agent.provider_name}/{agent.model}; not calling the API",
+            agent_id=agent.agent_id, provider=agent.provider_name, model=agent.model
+        )
+
+    def _after_error(self, limiter: TokenBucket, breaker: CircuitBreaker, error: BaseException) -> bool:
+        """Bookkeeping for a failed attempt; returns whether it may be retried"""
+        _, retryable = classify_error(error)
+        limiter.update_from_headers(_response_headers(error))
+        if retryable:
+            breaker.record_failure()
+        return retryable
+
+    def call(self, agent, fn: Callable[[Optional[float]], Any]) -> Any:
+        """Run fn(timeout) under the policy; fn must return (result, response headers)"""
+        limiter = self.limiter(agent.provider_name, agent.model)
+        breaker = self.breaker(agent.provider_name, agent.model)
+        attempt = 0
+        while True:
+            attempt += 1
+            trial = breaker.admit()
+            if trial is None:
+                raise self._circuit_open(agent)
+            try:
+                limiter.acquire()
+                with span("agent.api_call", agent_id=agent.agent_id, attempt=attempt):
+                    result, headers = fn(self.timeout)
+            except Exception as e:
+                if not self._after_error(limiter, breaker, e) or attempt > self.max_retries:
+                    raise self._fail(agent, e, attempt) from e
+            else:
+                limiter.update_from_headers(headers)
+                breaker.record_success()
+                return result
+            finally:
+                # However the attempt ended (even by KeyboardInterrupt), don't hold the trial forever
+                if trial:
+                    breaker.release_trial()
+            time.sleep(self.backoff(attempt))
+
+    async def acall(self, agent, fn: Callable[[Optional[float]], Awaitable[Any]], stream: bool = False) -> Any:
+        """Async variant of call; the timeout is also enforced with asyncio.wait_for.
+
+        A stream may run longer than the timeout as long as chunks keep
+        arriving, so with stream=True fn must bound each wait itself (see
+        hard_timeout) and the call as a whole is not bounded.
+        """
+        limiter = self.limiter(agent.provider_name, agent.model)
+        breaker = self.breaker(agent.provider_name, agent.model)
+        attempt = 0
+        while True:
+            attempt += 1
+            trial = breaker.admit()
+            if trial is None:
+                raise self._circuit_open(agent)
+            try:
+                await limiter.aacquire()
+                with span("agent.api_call", agent_id=agent.agent_id, attempt=attempt):
+                    attempt_call = fn(self.timeout)
+                    if not stream:
+                        attempt_call = asyncio.wait_for(attempt_call, hard_timeout(self.timeout))
+                    result, headers = await attempt_call
+            except Exception as e:
+                if not self._after_error(limiter, breaker, e) or attempt > self.max_retries:
+                    raise self._fail(agent, e, attempt) from e
+            else:
+                limiter.update_from_headers(headers)
+                breaker.record_success()
+                return result
+            finally:
+                # However the attempt ended (even by cancellation), don't hold the trial forever
+                if trial:
+                    breaker.release_trial()
+            await asyncio.sleep(self.backoff(attempt))
+
+
+def hard_timeout(timeout: Optional[float]) -> Optional[float]:
+    """asyncio.wait_for limit for an SDK call given timeout; leaves the SDK a little room to raise first"""
+    return timeout * 1.5 if timeout else None
+
+
+def unwrap_raw_response(response: Any) -> Tuple[Any, Mapping[str, str]]:
+    """Split an SDK with_raw_response result into (parsed result, headers)"""
+    if hasattr(response, "parse") and hasattr(response, "headers"):
+        return response.parse(), response.headers
+    return response, {}
+
+
+_default_policy: Optional[CallPolicy] = None
+
+
+def get_default_policy() -> CallPolicy:
+    """The policy agents use unless given one explicitly"""
+    global _default_policy
+    if _default_policy is None:
+        _default_policy = CallPolicy()
+    return _default_policy
+
+
+def configure_policy(policy: CallPolicy):
+    """Replace the default policy; call before agents are created"""
+    global _default_policy
+    _default_policy = policy
@@ -0,0 +1,51 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: registry.py
+@time: 10/17/26 23:45
+"""
+# agents/registry.py
+import importlib
+from typing import Dict, Optional, Type
+
+
+class ProviderSpec:
+    """How to build agents of one provider; its module (and SDK) is only imported by load"""
+
+    def __init__(self, name: str, module: str, class_name: str, default_model: str, api_key_env: str,
+                 base_url_env: Optional[str] = None):
+        self.name = name
+        self.module = module
+        self.class_name = class_name
+        self.default_model = default_model
+        # Environment variables with the API key and, for OpenAI-compatible proxies, the base URL
+        self.api_key_env = api_key_env
+        self.base_url_env = base_url_env
+        self._agent_class = None
+
+    def load(self) -> Type:
+        """The provider's agent class, importing its module on first use"""
+        if self._agent_class is None:
+            self._agent_class = getattr(importlib.import_module(self.module), self.class_name)
+        return self._agent_class
+
+
+# Built-in providers. Importing an agent module imports its SDK (and the SDK's
+# httpx/pydantic stack), so only the providers a run uses should be loaded.
+PROVIDERS: Dict[str, ProviderSpec] = {
+    "groq": ProviderSpec("groq", "agents.groq_agent", "GroqAgent", "llama3-70b-8192", "GROQ_API_KEY"),
+    "openai": ProviderSpec("openai", "agents.openai_agent", "OpenAIAgent", "gpt-4o", "OPENAI_API_KEY",
+                           base_url_env="LITELLM_BASE_URL"),
+}
+
+
+def register_provider(spec: ProviderSpec):
+    """Add or replace a provider, e.g. one whose agent class lives outside this package"""
+    PROVIDERS[spec.name] = spec
+
+
+def get_provider(name: str) -> ProviderSpec:
+    spec = PROVIDERS.get(name.lower())
+    if spec is None:
+        raise ValueError(f"Unsupported agent type: {name}")
+    return spec
@@ -0,0 +1,148 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: replay_agent.py
+@time: 10/17/26 19:30
+"""
+# agents/replay_agent.py
+from typing import Any, Dict, List, Optional
+from mcp.protocol import MCPMessage
+from mcp.transcript import read_transcript
+from agents.base import BaseAgent
+from agents.context import ContextWindow
+from agents.mock_agent import MockAgent
+from agents.policy import CallPolicy, ProviderError
+
+
+class ReplaySource:
+    """A recorded transcript to replay, with the responses of each agent in order.
+
+    With live_after set to a message id, only responses recorded up to and
+    including that message are replayed; every later step goes to the live
+    model. Both transcript formats work: JSONL transcripts identify agents by
+    id, save_transcript JSON files by display name.
+    """
+
+    def __init__(self, path: str, live_after: Optional[str] = None):
+        self.path = path
+        self.messages: List[MCPMessage] = list(read_transcript(path))
+        self.by_id: Dict[str, MCPMessage] = {msg.message_id: msg for msg in self.messages}
+        self.live_after = live_after
+        cutoff = len(self.messages)
+        if live_after is not None:
+            positions = {msg.message_id: index for index, msg in enumerate(self.messages)}
+            if live_after not in positions:
+                raise ValueError(f"Message {live_after} is not in {path}")
+            cutoff = positions[live_after] + 1
+        self._replayable = self.messages[:cutoff]
+
+    def responses_for(self, agent_id: str, name: Optional[str] = None) -> List[MCPMessage]:
+        """Recorded responses of one agent that are to be replayed, in order"""
+        return [msg for msg in self._replayable
+                if msg.role == "assistant" and (msg.agent_id == agent_id
+                                                or (name is not None and msg.agent_id == name)
+                                                or msg.get_metadata("agent") in (agent_id, name))]
+
+    def prompt_of(self, response: MCPMessage) -> Optional[str]:
+        """Content of the prompt a recorded response answered, if it referenced one"""
+        for reference in response.references:
+            prompt = self.by_id.get(reference)
+            if prompt is not None and prompt.role == "user":
+                return prompt.content
+        return None
+
+
+class ReplayAgent(MockAgent):
+    """Agent answering with its recorded responses from a ReplaySource, at zero latency.
+
+    Each replayed call compares the prompt the agent is answering with the
+    one recorded for that response and records any mismatch in divergences
+    (and in the message's metadata["replay"]), since a changed prompt means
+    the rest of the replay no longer reproduces the run. Once the recorded
+    responses run out, calls go to live if given and fail otherwise.
+    """
+
+    def __init__(
+            self,
+            source: ReplaySource,
+            agent_id: str,
+            name: str,
+            role: str,
+            model: str = "replay",
+            system_prompt: Optional[str] = None,
+            live: Optional[BaseAgent] = None,
+            context_window: Optional[ContextWindow] = None,
+            call_policy: Optional[CallPolicy] = None
+    ):
+        # No response cache: a cache hit would skip a recorded response and shift the rest
+        super().__init__(
+            agent_id=agent_id,
+            name=name,
+            role=role,
+            model=model,
+            system_prompt=system_prompt,
+            context_window=context_window,
+            call_policy=call_policy
+        )
+        self.source = source
+        self.recorded = source.responses_for(agent_id, name)
+        self.live = live
+        self.divergences: List[Dict[str, Any]] = []
+        self.live_calls = 0
+        self._replaying: Optional[MCPMessage] = None
+        self._diverged = False
+
+    @property
+    def replayed(self) -> int:
+        return min(self.calls, len(self.recorded))
+
+    def _go_live(self) -> bool:
+        """Whether this call goes to the live agent; switches metrics over to its provider and model"""
+        if self.calls < len(self.recorded):
+            return False
+        if self.live is None:
+            raise ProviderError(
+                f"{self.source.path} has no more recorded responses for {self.agent_id}",
+                agent_id=self.agent_id, provider=self.provider_name, model=self.model
+            )
+        self.provider_name, self.model = self.live.provider_name, self.live.model
+        self.live_calls += 1
+        return True
+
+    def _reply(self, messages: List[Dict[str, Any]]) -> str:
+        recorded = self.recorded[self.calls - 1]
+        expected = self.source.prompt_of(recorded)
+        actual = messages[-1]["content"] if messages and messages[-1]["role"] == "user" else None
+        self._replaying, self._diverged = recorded, expected != actual
+        if self._diverged:
+            self.divergences.append({
+                "agent_id": self.agent_id,
+                "recorded_id": recorded.message_id,
+                "expected_prompt": expected,
+                "actual_prompt": actual
+            })
+        return recorded.content
+
+    def _record_response(self, content: str, metrics: Optional[Dict[str, Any]] = None) -> MCPMessage:
+        response = super()._record_response(content, metrics)
+        if self._replaying is not None:
+            response.metadata["replay"] = {"recorded_id": self._replaying.message_id, "diverged": self._diverged}
+            self._replaying = None
+        else:
+            response.metadata["replay"] = {"live": True}
+        return response
+
+    def _chunk_usage(self, chunk: Any) -> Any:
+        return self.live._chunk_usage(chunk) if self.live_calls else super()._chunk_usage(chunk)
+
+    def _create_completion(self, messages: List[Dict[str, Any]], stream: bool = False,
+                           timeout: Optional[float] = None) -> Any:
+        if self._go_live():
+            return self.live._create_completion(messages, stream=stream, timeout=timeout)
+        return super()._create_completion(messages, stream=stream, timeout=timeout)
+
+    async def _acreate_completion(self, messages: List[Dict[str, Any]], stream: bool = False,
+                                  timeout: Optional[float] = None) -> Any:
+        if self._go_live():
+            return await self.live._acreate_completion(messages, stream=stream, timeout=timeout)
+        return await super()._acreate_completion(messages, stream=stream, timeout=timeout)
@@ -0,0 +1,212 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: routing.py
+@time: 10/17/26 23:05
+"""
+# agents/routing.py
+import copy
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from agents.base import BaseAgent
+from agents.context import ContextWindow
+from agents.policy import AgentCallError
+from agents.usage import call_metrics
+
+# Kinds of call a routing policy distinguishes, see RoutingPolicy.step
+STEPS = ("first", "followup", "final")
+
+# Openings of replies that decline instead of answering
+REFUSAL_PATTERN = re.compile(
+    r"^\W*(?:i'?m sorry|i am sorry|i apologi[sz]e|i can(?:'|no)t|i am unable|i'm unable|as an ai)\b",
+    re.IGNORECASE
+)
+_WORD = re.compile(r"\w+")
+
+
+class QualityCheck:
+    """Cheap checks on a reply from a small model; a failure escalates the call to the next route"""
+
+    def __init__(self, min_words: int = 40, min_distinct_ratio: float = 0.3):
+        self.min_words = min_words
+        # Distinct words over all words: small models that loop repeat themselves
+        self.min_distinct_ratio = min_distinct_ratio
+
+    def __call__(self, content: str) -> Optional[str]:
+        """Why content fails, or None if it passes"""
+        words = _WORD.findall(content.lower())
+        if len(words) < self.min_words:
+            return f"only {len(words)} words"
+        if REFUSAL_PATTERN.search(content):
+            return "refusal"
+        if len(set(words)) / len(words) < self.min_distinct_ratio:
+            return "repetitive"
+        return None
+
+
+class RoutingPolicy:
+    """Which route each kind of call starts on, and the check that decides escalation.
+
+    Routes are ordered cheapest first. start maps a step (see STEPS) to the
+    index of the route its calls start on; negative indexes count from the
+    largest model, so the default sends the final synthesis straight to it.
+    """
+
+    def __init__(self, start: Optional[Dict[str, int]] = None,
+                 check: Optional[Callable[[str], Optional[str]]] = None):
+        self.start = {"first": 0, "followup": 0, "final": -1}
+        self.start.update(start or {})
+        unknown = set(self.start) - set(STEPS)
+        if unknown:
+            raise ValueError(f"Unknown routing steps {sorted(unknown)}; choose from {', '.join(STEPS)}")
+        self.check = check or QualityCheck()
+
+    @staticmethod
+    def step(agent: BaseAgent) -> str:
+        """Kind of the call agent is about to make, from the message it answers and its own history"""
+        last = agent.messages[-1] if agent.messages else None
+        if last is not None and last.get_metadata("final"):
+            return "final"
+        if any(message.role == "assistant" and message.agent_id == agent.agent_id for message in agent.messages):
+            return "followup"
+        return "first"
+
+    def start_index(self, step: str, routes: int) -> int:
+        index = self.start.get(step, 0)
+        return min(max(index + routes if index < 0 else index, 0), routes - 1)
+
+
+class RoutedAgent(BaseAgent):
+    """Agent whose calls go to an ordered cascade of models instead of one.
+
+    routes are ordinary agents (any provider), cheapest first; only their
+    model calls, call policies and caches are used, the conversation lives
+    here, fitted to each route's own context window. Each call starts on the
+    route its step calls for and moves to the next one while the policy's
+    check rejects the reply or the route's call fails; the last route's
+    reply is always kept, and its errors propagate. Replies that may still
+    be rejected aren't streamed: on_chunk gets them in one piece once
+    accepted. The metrics of the kept reply name its route and step, and
+    list the rejected and failed attempts under "escalations"
+    (MetricsCollector counts them as calls of their own).
+    """
+
+    provider_name = "Routed"
+
+    def __init__(self, agent_id: str, name: str, role: str, routes: Sequence[BaseAgent],
+                 policy: Optional[RoutingPolicy] = None, system_prompt: Optional[str] = None, **kwargs):
+        if not routes:
+            raise ValueError("RoutedAgent needs at least one route")
+        self.routes = list(routes)
+        self.policy = policy or RoutingPolicy()
+        # The largest model: the trace and the agent's own context window are sized for it
+        super().__init__(agent_id=agent_id, name=name, role=role, api_key="", model=self.routes[-1].model,
+                         api_url=None, system_prompt=system_prompt, **kwargs)
+        # Copies of the context window for routes with a different budget, see _route_messages
+        self._route_windows: Dict[int, ContextWindow] = {}
+
+    @staticmethod
+    def route_name(route: BaseAgent) -> str:
+        return f"{route.provider_name}:{route.model}"
+
+    def _cache_key(self, formatted_messages: List[Dict[str, Any]]) -> Optional[str]:
+        # Each route caches under its own model, see _cached_attempt
+        return None
+
+    def _route_messages(self, index: int, formatted_messages: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """formatted_messages, refitted to route index's model and reply budget if those differ from the agent's"""
+        route = self.routes[index]
+        if self.context_window is None or (route.model == self.model and route.max_tokens == self.max_tokens):
+            return formatted_messages
+        # Each route keeps its own window, so its reductions stay stable from call to call
+        window = self._route_windows.get(index)
+        if window is None:
+            window = self._route_windows[index] = copy.copy(self.context_window)
+        return self._format_fitted(window.fit(self.messages, route.model, reserve_tokens=route.max_tokens,
+                                              total_tokens=self._history_tokens))
+
+    def _failed_attempt(self, index: int, error: AgentCallError, started: float) -> Dict[str, Any]:
+        """Metrics of a non-last route's call that failed for good"""
+        route = self.routes[index]
+        metrics = call_metrics(route.model, route.provider_name, [], "", latency=time.perf_counter() - started)
+        metrics["error"] = f"{type(error).__name__}: {error}"
+        return metrics
+
+    @staticmethod
+    def _cached_attempt(route: BaseAgent, formatted_messages: List[Dict[str, Any]]
+                        ) -> Tuple[Optional[str], Optional[str], Optional[Dict[str, Any]]]:
+        """(cache key, cached content, metrics of the cache hit) of a route"""
+        cache_key = route._cache_key(formatted_messages)
+        content = route.cache.get(cache_key) if cache_key is not None else None
+        if content is None:
+            return cache_key, None, None
+        return cache_key, content, call_metrics(route.model, route.provider_name, [], content, latency=0.0,
+                                                cache_hit=True)
+
+    def _settle(self, index: int, step: str, cache_key: Optional[str], content: Optional[str],
+                metrics: Dict[str, Any], escalations: List[Dict[str, Any]]) -> bool:
+        """Label an attempt (content None if it failed); True to keep it, False after recording it as an escalation"""
+        route = self.routes[index]
+        metrics.update(route=self.route_name(route), step=step)
+        if content is None:
+            reason = "error"
+        else:
+            reason = None if index == len(self.routes) - 1 else self.policy.check(content)
+        if reason is not None:
+            escalations.append({**metrics, "escalation_reason": reason})
+            return False
+        if cache_key is not None and not metrics.get("cache_hit"):
+            route.cache.set(cache_key, content)
+        if escalations:
+            metrics["escalations"] = escalations
+        return True
+
+    def _call_model(self, formatted_messages: List[Dict[str, Any]],
+                    on_chunk: Optional[Callable[[str], None]]) -> Tuple[str, Dict[str, Any]]:
+        step = self.policy.step(self)
+        escalations: List[Dict[str, Any]] = []
+        for index in range(self.policy.start_index(step, len(self.routes)), len(self.routes)):
+            route = self.routes[index]
+            last = index == len(self.routes) - 1
+            messages = self._route_messages(index, formatted_messages)
+            cache_key, content, metrics = self._cached_attempt(route, messages)
+            if content is None:
+                started = time.perf_counter()
+                try:
+                    content, metrics = route._call_model(messages, on_chunk if last else None)
+                except AgentCallError as e:
+                    if last:
+                        raise
+                    metrics = self._failed_attempt(index, e, started)
+            elif last and on_chunk is not None:
+                on_chunk(content)
+            if self._settle(index, step, cache_key, content, metrics, escalations):
+                if not last and on_chunk is not None:
+                    on_chunk(content)
+                return content, metrics
+
+    async def _acall_model(self, formatted_messages: List[Dict[str, Any]],
+                           on_chunk: Optional[Callable[[str], None]]) -> Tuple[str, Dict[str, Any]]:
+        step = self.policy.step(self)
+        escalations: List[Dict[str, Any]] = []
+        for index in range(self.policy.start_index(step, len(self.routes)), len(self.routes)):
+            route = self.routes[index]
+            last = index == len(self.routes) - 1
+            messages = self._route_messages(index, formatted_messages)
+            cache_key, content, metrics = self._cached_attempt(route, messages)
+            if content is None:
+                started = time.perf_counter()
+                try:
+                    content, metrics = await route._acall_model(messages, on_chunk if last else None)
+                except AgentCallError as e:
+                    if last:
+                        raise
+                    metrics = self._failed_attempt(index, e, started)
+            elif last and on_chunk is not None:
+                on_chunk(content)
+            if self._settle(index, step, cache_key, content, metrics, escalations):
+                if not last and on_chunk is not None:
+                    on_chunk(content)
+                return content, metrics
+
@@ -0,0 +1,89 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: usage.py
+@time: 10/17/26 17:20
+"""
+# agents/usage.py
+from typing import Any, Dict, List, Optional, Tuple
+from agents.context import count_tokens
+
+# USD per million (prompt, completion) tokens; estimates, check the providers' price lists
+MODEL_PRICES: Dict[str, Tuple[float, float]] = {
+    "llama3-8b-8192": (0.05, 0.08),
+    "llama3-70b-8192": (0.59, 0.79),
+    "mixtral-8x7b-32768": (0.24, 0.24),
+    "gpt-4": (30.0, 60.0),
+    "gpt-4o": (2.50, 10.0),
+    "gpt-4o-mini": (0.15, 0.60),
+    # Offline agents (agents/mock_agent.py, agents/replay_agent.py)
+    "mock": (0.0, 0.0),
+    "replay": (0.0, 0.0),
+}
+
+
+# USD per million prompt tokens served from the provider's prompt cache, for models that discount them
+CACHED_PROMPT_PRICES: Dict[str, float] = {
+    "gpt-4o": 1.25,
+    "gpt-4o-mini": 0.075,
+}
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int, cached_tokens: int = 0) -> Optional[float]:
+    """Estimated USD cost of a call, or None for models without a known price"""
+    prices = MODEL_PRICES.get(model)
+    if prices is None:
+        return None
+    cached_price = CACHED_PROMPT_PRICES.get(model, prices[0])
+    return ((prompt_tokens - cached_tokens) * prices[0] + cached_tokens * cached_price
+            + completion_tokens * prices[1]) / 1_000_000
+
+
+def cached_prompt_tokens(usage: Any) -> int:
+    """Prompt tokens the provider served from its prompt cache (usage.prompt_tokens_details.cached_tokens)"""
+    details = getattr(usage, "prompt_tokens_details", None)
+    return getattr(details, "cached_tokens", None) or 0
+
+
+def call_metrics(
+        model: str,
+        provider: str,
+        messages: List[Dict[str, Any]],
+        content: str,
+        usage: Any = None,
+        latency: Optional[float] = None,
+        ttft: Optional[float] = None,
+        cache_hit: bool = False
+) -> Dict[str, Any]:
+    """Metrics of one model call for MCPMessage.metadata["metrics"].
+
+    Token counts come from the response's usage when the provider reports it
+    and are estimated from the text otherwise (tokens_estimated). Cache hits
+    cost nothing and use no tokens. cached_tokens counts the prompt tokens
+    the provider read from its prompt-prefix cache, which are billed at a
+    discount.
+    """
+    cached_tokens = 0
+    if cache_hit:
+        prompt_tokens = completion_tokens = 0
+        estimated = False
+    elif usage is not None:
+        prompt_tokens, completion_tokens = usage.prompt_tokens, usage.completion_tokens
+        cached_tokens = cached_prompt_tokens(usage)
+        estimated = False
+    else:
+        prompt_tokens = sum(count_tokens(message["content"]) for message in messages)
+        completion_tokens = count_tokens(content)
+        estimated = True
+    return {
+        "model": model,
+        "provider": provider,
+        "latency": latency,
+        "ttft": ttft,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cached_tokens": cached_tokens,
+        "tokens_estimated": estimated,
+        "cost": estimate_cost(model, prompt_tokens, completion_tokens, cached_tokens),
+        "cache_hit": cache_hit
+    }
@@ -0,0 +1,245 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: batch.py
+@time: 10/17/26 19:55
+"""
+# batch.py
+import asyncio
+import csv
+import glob
+import json
+import math
+import os
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+from mcp.transcript import TranscriptWriter, read_records
+from agents.base import BaseAgent
+from convergence import ConvergencePolicy
+from metrics import MetricsCollector
+from orchestrator import Orchestrator
+
+
+def load_jobs(path: str) -> List[Dict[str, str]]:
+    """Read batch queries as [{"id", "query"}] from a CSV file or a JSONL file.
+
+    CSV files need a "query" column and may have an "id" column. JSONL lines
+    are objects with "query" and optionally "id", or plain JSON strings.
+    Queries without an id are numbered by their position, starting at 1.
+    """
+    jobs = []
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        if path.endswith(".csv"):
+            rows = csv.DictReader(f)
+            if "query" not in (rows.fieldnames or []):
+                raise ValueError(f"{path} needs a 'query' column")
+            entries = list(rows)
+        else:
+            entries = [json.loads(line) for line in f if line.strip()]
+
+    for number, entry in enumerate(entries, start=1):
+        if isinstance(entry, str):
+            entry = {"query": entry}
+        if not entry.get("query"):
+            raise ValueError(f"Entry {number} of {path} has no query")
+        jobs.append({"id": str(entry.get("id") or number), "query": entry["query"]})
+
+    seen: Set[str] = set()
+    for job in jobs:
+        if job["id"] in seen:
+            raise ValueError(f"Duplicate id {job['id']} in {path}")
+        seen.add(job["id"])
+    return jobs
+
+
+class ResultShards:
+    """Batch results as JSONL shards named <prefix>-00000.jsonl, <prefix>-00001.jsonl, ...
+
+    Each shard holds up to shard_size result records. A new run never appends
+    to an existing shard (its last line may be cut off by a crash); it starts
+    the next one, so earlier results stay readable for completed_ids.
+    """
+
+    def __init__(self, prefix: str, shard_size: int = 1000, fsync_every: Optional[int] = None):
+        self.prefix = prefix
+        self.shard_size = shard_size
+        self.fsync_every = fsync_every
+        self._next_index = len(self.paths())
+        self._writer: Optional[TranscriptWriter] = None
+        self._written = 0
+
+    def paths(self) -> List[str]:
+        return sorted(glob.glob(glob.escape(self.prefix) + "-[0-9][0-9][0-9][0-9][0-9].jsonl"))
+
+    def completed_ids(self) -> Set[str]:
+        """Ids of queries that already finished successfully in earlier runs"""
+        return {record["id"] for path in self.paths() for record in read_records(path)
+                if record.get("type") == "result" and record.get("status") == "ok"}
+
+    def write(self, record: Dict[str, Any]):
+        if self._writer is None or self._written >= self.shard_size:
+            self.close()
+            path = f"{self.prefix}-{self._next_index:05d}.jsonl"
+            self._writer = TranscriptWriter(path, fsync_every=self.fsync_every)
+            self._next_index += 1
+            self._written = 0
+        self._writer.write_record(record)
+        self._written += 1
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class BatchReport:
+    """Progress and aggregate throughput, latency and call metrics of a batch"""
+
+    def __init__(self, total: int, skipped: int = 0):
+        self.total = total
+        self.skipped = skipped
+        self.succeeded = 0
+        self.failed = 0
+        self.latencies: List[float] = []
+        self.metrics = MetricsCollector()
+        self.started = time.perf_counter()
+
+    @property
+    def done(self) -> int:
+        return self.succeeded + self.failed
+
+    def add(self, orchestrator: Optional[Orchestrator], elapsed: float, ok: bool):
+        if ok:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+        self.latencies.append(elapsed)
+        if orchestrator is not None:
+            self.metrics.merge(orchestrator.metrics)
+
+    def progress_line(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        rate = self.done / elapsed if elapsed > 0 else 0.0
+        remaining = self.total - self.skipped - self.done
+        eta = f"{remaining / rate / 60:.1f} min" if rate > 0 else "?"
+        width = len(str(self.total))
+        return (f"[{self.done + self.skipped:>{width}}/{self.total}] {self.succeeded} ok, {self.failed} failed, "
+                f"{self.skipped} skipped | {rate:.2f} queries/s | ETA {eta}")
+
+    def summary(self) -> str:
+        elapsed = time.perf_counter() - self.started
+        lines = [f"Batch finished in {elapsed:.1f}s: {self.succeeded} ok, {self.failed} failed, "
+                 f"{self.skipped} skipped (already done)"]
+        if self.latencies:
+            latencies = sorted(self.latencies)
+
+            def percentile(p: float) -> float:
+                return latencies[math.ceil(len(latencies) * p) - 1]
+            lines.append(f"Throughput: {self.done / elapsed:.2f} queries/s")
+            lines.append(f"Query latency: mean {sum(latencies) / len(latencies):.2f}s, p50 {percentile(0.5):.2f}s, "
+                         f"p95 {percentile(0.95):.2f}s, max {latencies[-1]:.2f}s")
+        if self.metrics.records:
+            lines += ["", "Call metrics:", self.metrics.format_table()]
+        return "\n".join(lines)
+
+
+def _file_name(job_id: str) -> str:
+    return re.sub(r"[^\w.-]", "_", job_id)
+
+
+def final_synthesis(orchestrator: Orchestrator) -> Optional[str]:
+    """Last response of the synthesizer (the last agent)"""
+    synthesizer_id = list(orchestrator.agents)[-1]
+    for msg in reversed(orchestrator.conversation_history):
+        if msg.agent_id == synthesizer_id and msg.role == "assistant":
+            return msg.content
+    return None
+
+
+async def run_batch_jobs(
+        jobs: List[Dict[str, str]],
+        agent_factory: Callable[[], List[BaseAgent]],
+        results: ResultShards,
+        max_turns: int = 3,
+        max_concurrency: int = 4,
+        transcript_dir: Optional[str] = None,
+        convergence_factory: Optional[Callable[[], Optional[ConvergencePolicy]]] = None,
+        progress_every: float = 5.0
+) -> BatchReport:
+    """Research every job not yet completed in results, max_concurrency at a time.
+
+    Workers pull jobs from a queue, so memory stays flat however many jobs
+    there are: each job gets fresh agents, and its orchestrator is dropped as
+    soon as its result record is written. Result records hold the messages
+    themselves, or with transcript_dir the path of a per-query JSONL
+    transcript. A query that fails is recorded with its error and retried by
+    the next run; completed ones are skipped.
+    """
+    completed = results.completed_ids()
+    pending = [job for job in jobs if job["id"] not in completed]
+    report = BatchReport(len(jobs), skipped=len(jobs) - len(pending))
+    if transcript_dir:
+        os.makedirs(transcript_dir, exist_ok=True)
+
+    queue: asyncio.Queue = asyncio.Queue()
+    for job in pending:
+        queue.put_nowait(job)
+    last_progress = time.perf_counter()
+
+    async def run_job(job: Dict[str, str]):
+        nonlocal last_progress
+        transcript_path = os.path.join(transcript_dir, f"{_file_name(job['id'])}.jsonl") if transcript_dir else None
+        orchestrator = None
+        error = None
+        started = time.perf_counter()
+        try:
+            # Rerunning a failed query starts its transcript over
+            if transcript_path is not None and os.path.exists(transcript_path):
+                os.remove(transcript_path)
+            transcript = TranscriptWriter(transcript_path) if transcript_path else None
+            orchestrator = Orchestrator(agent_factory(), verbose=False, transcript=transcript,
+                                        convergence=convergence_factory() if convergence_factory else None)
+            try:
+                await orchestrator.arun_workflow(job["query"], max_turns=max_turns)
+            finally:
+                if transcript is not None:
+                    orchestrator.write_metrics_summary()
+                    transcript.close()
+            error = orchestrator.last_error
+        except Exception as e:  # one broken query must not stop the batch
+            error = e
+        elapsed = time.perf_counter() - started
+
+        record = {"type": "result", "id": job["id"], "query": job["query"],
+                  "status": "failed" if error else "ok", "error": str(error) if error else None,
+                  "elapsed": round(elapsed, 3)}
+        if orchestrator is not None:
+            record["synthesis"] = final_synthesis(orchestrator)
+            record["metrics"] = orchestrator.metrics.totals()
+            if transcript_path is not None:
+                record["transcript"] = transcript_path
+            else:
+                record["messages"] = [msg.to_dict() for msg in orchestrator.conversation_history]
+        results.write(record)
+        report.add(orchestrator, elapsed, error is None)
+
+        if time.perf_counter() - last_progress >= progress_every:
+            last_progress = time.perf_counter()
+            print(report.progress_line(), flush=True)
+
+    async def worker():
+        while True:
+            try:
+                job = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await run_job(job)
+
+    print(f"{len(pending)} queries to run, {report.skipped} already done")
+    try:
+        await asyncio.gather(*(worker() for _ in range(max(1, min(max_concurrency, len(pending))))))
+    finally:
+        results.close()
+    print(report.progress_line())
+    return report
@@ -0,0 +1,55 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: bench_client_pool.py
+@time: 10/17/26 15:05
+"""
+# benchmarks/bench_client_pool.py
+# Connections and latency of many short calls: one client per agent vs. the shared registry.
+# Run from the repository root: python -m benchmarks.bench_client_pool
+import argparse
+import statistics
+import time
+from agents.clients import ClientRegistry
+from agents.openai_agent import OpenAIAgent
+from benchmarks.stub_server import StubServer
+
+
+def run(server: StubServer, calls: int, shared: bool):
+    """Create a fresh agent per call, as run.py does per pipeline; return (connections, latencies)"""
+    server.reset_counters()
+    registry = ClientRegistry() if shared else None
+    latencies = []
+    for i in range(calls):
+        agent = OpenAIAgent(
+            agent_id=f"agent_{i}",
+            name="Bench",
+            role="benchmark",
+            api_key="stub-key",
+            model="stub-model",
+            base_url=server.base_url,
+            # Without sharing, every agent gets a registry (and so a client) of its own
+            client_registry=registry or ClientRegistry()
+        )
+        started = time.perf_counter()
+        agent.generate_response("ping")
+        latencies.append(time.perf_counter() - started)
+    return server.connections, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark shared client pooling")
+    parser.add_argument("--calls", type=int, default=200)
+    args = parser.parse_args()
+
+    with StubServer() as server:
+        print(f"{args.calls} calls against {server.base_url}")
+        print(f"{'mode':>12} {'connections':>12} {'mean ms':>9} {'p95 ms':>8}")
+        for name, shared in (("per-agent", False), ("shared", True)):
+            connections, latencies = run(server, args.calls, shared)
+            p95 = sorted(latencies)[int(len(latencies) * 0.95) - 1]
+            print(f"{name:>12} {connections:>12} {statistics.mean(latencies) * 1e3:>9.2f} {p95 * 1e3:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
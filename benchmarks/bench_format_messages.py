@@ -0,0 +1,58 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: bench_format_messages.py
+@time: 10/17/26 10:50
+"""
+# benchmarks/bench_format_messages.py
+# Per-call cost of BaseAgent.format_messages_for_api as history grows.
+# Run from the repository root: python -m benchmarks.bench_format_messages
+import argparse
+import timeit
+from typing import Any, Dict, List
+from mcp.protocol import MCPMessage
+from agents.base import BaseAgent
+
+
+class BenchAgent(BaseAgent):
+    """Agent with no backend, only used to exercise message formatting"""
+
+    def __init__(self):
+        super().__init__(agent_id="bench", name="Bench", role="benchmark", api_key="", model="bench", api_url=None)
+
+
+def legacy_format(agent: BaseAgent) -> List[Dict[str, Any]]:
+    """What format_messages_for_api used to do: rebuild every dict on every call"""
+    formatted_messages = []
+    for msg in agent.messages:
+        formatted_messages.append({
+            "role": msg.role,
+            "content": msg.content
+        })
+    return formatted_messages
+
+
+def grow(agent: BaseAgent, size: int):
+    """Add messages until the agent's history has size entries"""
+    while len(agent.messages) < size:
+        role = "assistant" if len(agent.messages) % 2 else "user"
+        agent.add_message(MCPMessage(role=role, content="lorem ipsum " * 50, agent_id="bench"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark format_messages_for_api")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 5000, 10000])
+    parser.add_argument("--calls", type=int, default=200, help="Calls timed per history size")
+    args = parser.parse_args()
+
+    agent = BenchAgent()
+    print(f"{'history':>8} {'incremental (us/call)':>22} {'full rebuild (us/call)':>23}")
+    for size in args.sizes:
+        grow(agent, size)
+        incremental = timeit.timeit(agent.format_messages_for_api, number=args.calls) / args.calls
+        rebuild = timeit.timeit(lambda: legacy_format(agent), number=args.calls) / args.calls
+        print(f"{size:>8} {incremental * 1e6:>22.2f} {rebuild * 1e6:>23.2f}")
+
+
+if __name__ == "__main__":
+    main()
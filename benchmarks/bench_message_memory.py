@@ -0,0 +1,88 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: bench_message_memory.py
+@time: 10/17/26 11:30
+"""
+# benchmarks/bench_message_memory.py
+# Memory and construction cost of MCPMessage against the original dict-based class.
+# Run from the repository root: python -m benchmarks.bench_message_memory --count 1000000
+import argparse
+import gc
+import time
+import tracemalloc
+import uuid
+from typing import Dict, List, Any, Optional
+from mcp.protocol import MCPMessage
+
+
+class LegacyMCPMessage:
+    """MCPMessage as it was before __slots__ (per-instance __dict__, fresh list/dict defaults)"""
+
+    def __init__(
+            self,
+            role: str,
+            content: str,
+            agent_id: str,
+            message_id: Optional[str] = None,
+            references: Optional[List[str]] = None,
+            metadata: Optional[Dict[str, Any]] = None
+    ):
+        self.role = role
+        self.content = content
+        self.agent_id = agent_id
+        self.message_id = message_id or f"msg_{uuid.uuid4().hex[:10]}"
+        self.references = references or []
+        self.metadata = metadata or {}
+        self.timestamp = time.time()
+
+
+def build(cls, count: int, content: str) -> list:
+    """Build count messages of the given class"""
+    return [cls(role="assistant", content=content, agent_id="researcher_1") for _ in range(count)]
+
+
+def measure(cls, count: int, content: str):
+    """Return (bytes allocated per message, seconds to build count messages)"""
+    gc.collect()
+    started = time.perf_counter()
+    messages = build(cls, count, content)
+    elapsed = time.perf_counter() - started
+    del messages
+
+    # Timed separately: tracemalloc slows allocation down considerably
+    gc.collect()
+    tracemalloc.start()
+    messages = build(cls, count, content)
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del messages
+    return allocated / count, elapsed
+
+
+def check_round_trip():
+    """to_dict/from_dict must reproduce a message exactly"""
+    original = MCPMessage(role="assistant", content="text", agent_id="a", references=["msg_1"],
+                          metadata={"agent_role": "critic"})
+    plain = MCPMessage(role="user", content="hi", agent_id="human")
+    for msg in (original, plain):
+        assert MCPMessage.from_dict(msg.to_dict()).to_dict() == msg.to_dict()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark MCPMessage memory use")
+    parser.add_argument("--count", type=int, default=1_000_000, help="Messages built per variant")
+    args = parser.parse_args()
+
+    check_round_trip()
+    # Content is shared so the numbers show per-message overhead, not text size
+    content = "lorem ipsum " * 20
+    print(f"Building {args.count:,} messages per variant")
+    print(f"{'variant':>10} {'bytes/msg':>10} {'total MB':>10} {'build s':>9}")
+    for name, cls in (("legacy", LegacyMCPMessage), ("slotted", MCPMessage)):
+        per_message, elapsed = measure(cls, args.count, content)
+        print(f"{name:>10} {per_message:>10.1f} {per_message * args.count / 2 ** 20:>10.1f} {elapsed:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: bench_orchestrator.py
+@time: 10/17/26 19:05
+"""
+# benchmarks/bench_orchestrator.py
+# Orchestrator overhead, throughput under concurrency, memory per session and transcript replay speed,
+# offline with MockAgent.
+# Run from the repository root: python -m benchmarks.bench_orchestrator [--section overhead|throughput|memory|replay]
+import argparse
+import asyncio
+import contextlib
+import gc
+import io
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import List
+from agents.base import BaseAgent
+from agents.mock_agent import MockAgent
+from agents.replay_agent import ReplayAgent, ReplaySource
+from mcp.transcript import TranscriptWriter
+from metrics import MetricsCollector
+from orchestrator import Orchestrator, run_workflows_concurrently, RESEARCHER_PROMPT, SYNTHESIZER_PROMPT
+
+TRANSCRIPT = "mcp_transcript_example.json"
+QUERY = "Research the impact of quantum computing on encryption standards"
+
+
+def make_agents(latency: float = 0.0, jitter: float = 0.0, seed: int = 0) -> List[BaseAgent]:
+    """Researcher and synthesizer replaying the example transcript, so message sizes are realistic"""
+    options = dict(latency=latency, jitter=jitter, latency_distribution="lognormal" if jitter else "fixed")
+    return [
+        MockAgent.from_transcript(TRANSCRIPT, "ResearchBot", agent_id="researcher_1", name="ResearchBot",
+                                  role="information_gatherer", model="gpt-4o", system_prompt=RESEARCHER_PROMPT,
+                                  seed=seed, **options),
+        MockAgent.from_transcript(TRANSCRIPT, "SynthBot", agent_id="synthesizer_1", name="SynthBot",
+                                  role="critic_summarizer", model="gpt-4o", system_prompt=SYNTHESIZER_PROMPT,
+                                  seed=seed + 1, **options),
+    ]
+
+
+def bench_overhead(turn_counts: List[int], repeat: int):
+    """Wall-clock of whole workflows against zero-latency agents: everything measured is our own code"""
+    print("\nOrchestrator overhead (zero-latency mock agents)")
+    print(f"{'turns':>6} {'messages':>9} {'ms/run':>9} {'us/message':>11}")
+    for turns in turn_counts:
+        timings = []
+        for _ in range(repeat):
+            orchestrator = Orchestrator(make_agents(), verbose=False)
+            started = time.perf_counter()
+            orchestrator.run_workflow(QUERY, max_turns=turns)
+            timings.append(time.perf_counter() - started)
+        messages = len(orchestrator.conversation_history)
+        elapsed = statistics.median(timings)
+        print(f"{turns:>6} {messages:>9} {elapsed * 1e3:>9.2f} {elapsed / messages * 1e6:>11.1f}")
+
+
+def bench_throughput(concurrencies: List[int], queries: int, turns: int, latency: float, jitter: float):
+    """Workflows per second with run_workflows_concurrently against mock agents of a set latency"""
+    print(f"\nThroughput: {queries} workflows of {turns} turns, mock latency {latency * 1e3:.0f} ms "
+          f"(lognormal sigma {jitter})")
+    print(f"{'concurrency':>12} {'wall s':>8} {'workflows/s':>12} {'calls/s':>9} {'p95 call ms':>12} "
+          f"{'efficiency':>11}")
+    for concurrency in concurrencies:
+        seeds = iter(range(0, 2 * queries, 2))
+        started = time.perf_counter()
+        # Silence the per-workflow progress lines
+        with contextlib.redirect_stdout(io.StringIO()):
+            orchestrators = asyncio.run(run_workflows_concurrently(
+                [QUERY] * queries,
+                agent_factory=lambda: make_agents(latency, jitter, seed=next(seeds)),
+                max_turns=turns,
+                max_concurrency=concurrency
+            ))
+        elapsed = time.perf_counter() - started
+        metrics = MetricsCollector()
+        for orchestrator in orchestrators:
+            metrics.merge(orchestrator.metrics)
+        totals = metrics.totals()
+        # Perfect scaling: the summed call time spread evenly over `concurrency` workers
+        ideal = totals["latency_total"] / min(concurrency, queries)
+        print(f"{concurrency:>12} {elapsed:>8.2f} {queries / elapsed:>12.1f} {totals['calls'] / elapsed:>9.1f} "
+              f"{totals['latency_p95'] * 1e3:>12.1f} {ideal / elapsed:>10.0%}")
+
+
+def bench_memory(turn_counts: List[int]):
+    """Memory held by one finished session (orchestrator, agents and history) as turns grow"""
+    print("\nMemory per session")
+    print(f"{'turns':>6} {'messages':>9} {'retained KB':>12} {'peak KB':>9} {'bytes/message':>14}")
+    for turns in turn_counts:
+        gc.collect()
+        tracemalloc.start()
+        orchestrator = Orchestrator(make_agents(), verbose=False)
+        orchestrator.run_workflow(QUERY, max_turns=turns)
+        gc.collect()
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        messages = len(orchestrator.conversation_history)
+        print(f"{turns:>6} {messages:>9} {retained / 1024:>12.1f} {peak / 1024:>9.1f} "
+              f"{retained / messages:>14.0f}")
+        del orchestrator
+
+
+def bench_replay(turns: int, repeat: int):
+    """Record a session with mock agents, then time re-running it from the transcript with ReplayAgent"""
+    print(f"\nReplay of a {turns}-turn session")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "session.jsonl")
+        with TranscriptWriter(path) as transcript:
+            Orchestrator(make_agents(), verbose=False, transcript=transcript).run_workflow(QUERY, max_turns=turns)
+
+        started = time.perf_counter()
+        source = ReplaySource(path)
+        load = time.perf_counter() - started
+        timings = []
+        for _ in range(repeat):
+            agents = [ReplayAgent(source, "researcher_1", "ResearchBot", "information_gatherer",
+                                  system_prompt=RESEARCHER_PROMPT),
+                      ReplayAgent(source, "synthesizer_1", "SynthBot", "critic_summarizer",
+                                  system_prompt=SYNTHESIZER_PROMPT)]
+            started = time.perf_counter()
+            Orchestrator(agents, verbose=False).run_workflow(QUERY, max_turns=turns)
+            timings.append(time.perf_counter() - started)
+        divergences = sum(len(agent.divergences) for agent in agents)
+        replayed = sum(agent.replayed for agent in agents)
+    print(f"{replayed} responses, {divergences} divergences; transcript load {load * 1e3:.2f} ms, "
+          f"replay {statistics.median(timings) * 1e3:.2f} ms (median of {repeat})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the orchestrator offline with mock agents")
+    parser.add_argument("--section", choices=["overhead", "throughput", "memory", "replay"], action="append",
+                        help="Run only these sections (default: all)")
+    parser.add_argument("--turns", type=int, nargs="+", default=[1, 3, 10, 30],
+                        help="Turn counts for the overhead and memory sections")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per turn count in the overhead section")
+    parser.add_argument("--queries", type=int, default=64, help="Workflows in the throughput section")
+    parser.add_argument("--throughput-turns", type=int, default=2)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--latency", type=float, default=0.05, help="Median mock call latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.3, help="Sigma of the lognormal latency")
+    parser.add_argument("--replay-turns", type=int, default=50, help="Length of the replayed session")
+    args = parser.parse_args()
+
+    sections = args.section or ["overhead", "throughput", "memory", "replay"]
+    if "overhead" in sections:
+        bench_overhead(args.turns, args.repeat)
+    if "throughput" in sections:
+        bench_throughput(args.concurrency, args.queries, args.throughput_turns, args.latency, args.jitter)
+    if "memory" in sections:
+        bench_memory(args.turns)
+    if "replay" in sections:
+        bench_replay(args.replay_turns, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
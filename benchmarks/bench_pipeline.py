@@ -0,0 +1,98 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: bench_pipeline.py
+@time: 10/17/26 22:50
+"""
+# benchmarks/bench_pipeline.py
+# Wall-clock, calls and wasted work of the pipelined workflow (speculative research overlapping the
+# synthesis) against the sequential one, at several rates of correct speculation, offline with MockAgent.
+# Run from the repository root: python -m benchmarks.bench_pipeline
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import Any, Dict, List
+from agents.base import BaseAgent
+from agents.mock_agent import MockAgent
+from orchestrator import Orchestrator, RESEARCHER_PROMPT, SYNTHESIZER_PROMPT, SPECULATE_PROMPT
+
+QUERY = "Research the impact of quantum computing on encryption standards"
+TOPICS = ["lattice based signatures", "symmetric key lengths", "migration costs", "hybrid handshakes",
+          "harvest now attacks", "hardware security modules", "certificate lifetimes", "standards timelines"]
+
+
+def research_turn(messages: List[Dict[str, Any]]) -> int:
+    """Research replies the conversation holds so far"""
+    return sum(message["content"].startswith("Research notes") for message in messages)
+
+
+def make_agents(latency: float, jitter: float, accuracy: float, seed: int) -> List[BaseAgent]:
+    """Synthesizer raising one gap per turn, researcher guessing it with probability accuracy when speculating"""
+    guesses = random.Random(seed)
+
+    def research(messages: List[Dict[str, Any]]) -> str:
+        turn = research_turn(messages)
+        topic = TOPICS[turn % len(TOPICS)]
+        if messages[-1]["content"] == SPECULATE_PROMPT and guesses.random() >= accuracy:
+            topic = TOPICS[(turn + 3) % len(TOPICS)]  # a wrong guess at the next gap
+        return f"Research notes {turn + 1}: sources and findings on {topic}. " + "Evidence follows. " * 40
+
+    def synthesize(messages: List[Dict[str, Any]]) -> str:
+        turn = research_turn(messages)
+        return (f"Synthesis {turn}: the research is consistent. " + "Key point noted. " * 40 +
+                f"Open questions remain about {TOPICS[turn % len(TOPICS)]}.")
+
+    options = dict(latency=latency, jitter=jitter, latency_distribution="lognormal" if jitter else "fixed")
+    return [MockAgent("researcher_1", "ResearchBot", "information_gatherer", model="gpt-4o",
+                      system_prompt=RESEARCHER_PROMPT, responses=research, seed=seed, **options),
+            MockAgent("synthesizer_1", "SynthBot", "critic_summarizer", model="gpt-4o",
+                      system_prompt=SYNTHESIZER_PROMPT, responses=synthesize, seed=seed + 1, **options)]
+
+
+async def run(args: argparse.Namespace, accuracy: float, pipelined: bool, seed: int) -> Orchestrator:
+    orchestrator = Orchestrator(make_agents(args.latency, args.jitter, accuracy, seed), verbose=False)
+    if pipelined:
+        await orchestrator.arun_pipelined_workflow(QUERY, max_turns=args.turns)
+    else:
+        await orchestrator.arun_workflow(QUERY, max_turns=args.turns)
+    return orchestrator
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the pipelined workflow against the sequential one")
+    parser.add_argument("--turns", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.2, help="Median mock latency per call in seconds")
+    parser.add_argument("--jitter", type=float, default=0.3, help="Lognormal sigma of the mock latency")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{args.turns} turns, mock latency {args.latency * 1e3:.0f} ms (lognormal sigma {args.jitter}), "
+          f"median of {args.repeat} runs")
+    print(f"{'workflow':>24} {'wall s':>7} {'speedup':>8} {'calls':>6} {'hit rate':>9} {'saved s':>8} "
+          f"{'wasted calls':>13}")
+    baseline = None
+    for label, accuracy, pipelined in (("sequential", 0.0, False),
+                                       ("pipelined, 100% guesses", 1.0, True),
+                                       ("pipelined, 50% guesses", 0.5, True),
+                                       ("pipelined, 0% guesses", 0.0, True)):
+        timings, calls, hit_rates, saved, wasted = [], [], [], [], []
+        for seed in range(0, 2 * args.repeat, 2):
+            started = time.perf_counter()
+            orchestrator = asyncio.run(run(args, accuracy, pipelined, seed))
+            timings.append(time.perf_counter() - started)
+            summary = orchestrator.speculation.summary()
+            calls.append(len(orchestrator.metrics.records))
+            hit_rates.append(summary["hit_rate"] or 0.0)
+            saved.append(summary["time_saved"])
+            wasted.append(summary["misses"] + summary["cancelled"])
+        elapsed = statistics.median(timings)
+        baseline = baseline or elapsed
+        rate = f"{statistics.mean(hit_rates):.0%}" if pipelined else "-"
+        print(f"{label:>24} {elapsed:>7.2f} {baseline / elapsed:>7.2f}x {statistics.median(calls):>6.0f} "
+              f"{rate:>9} {statistics.median(saved):>8.2f} {statistics.median(wasted):>13.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: bench_prefix_cache.py
+@time: 10/17/26 20:25
+"""
+# benchmarks/bench_prefix_cache.py
+# Prompt-prefix cache hits, prompt latency and cost of a long run whose history outgrows the context window.
+# Run from the repository root: python -m benchmarks.bench_prefix_cache --turns 30
+import argparse
+import time
+from typing import Optional
+from agents.clients import ClientRegistry
+from agents.context import ContextWindow, STRATEGIES
+from agents.openai_agent import OpenAIAgent
+from benchmarks.stub_server import StubServer
+from orchestrator import Orchestrator, RESEARCHER_PROMPT, SYNTHESIZER_PROMPT
+
+QUERY = "Research the impact of quantum computing on encryption standards"
+
+
+def run(args: argparse.Namespace, low_watermark: Optional[float]):
+    """One workflow against a fresh prefix-caching stub; low_watermark None means no context window"""
+    # Numbered replies: identical ones would make evicted windows repeat earlier prompts byte for byte
+    with StubServer(reply="finding {n} " * (args.reply_words // 2), prefix_cache=True,
+                    prompt_token_delay=args.prompt_token_delay) as server:
+        registry = ClientRegistry()
+
+        def agent(agent_id: str, name: str, prompt: str) -> OpenAIAgent:
+            window = None if low_watermark is None else ContextWindow(
+                strategy=args.strategy, max_context_tokens=args.context_tokens, low_watermark=low_watermark
+            )
+            return OpenAIAgent(agent_id=agent_id, name=name, role="benchmark", api_key="stub-key",
+                               model="gpt-4o", base_url=server.base_url, system_prompt=prompt,
+                               max_tokens=512, context_window=window, client_registry=registry)
+
+        orchestrator = Orchestrator([agent("researcher_1", "ResearchBot", RESEARCHER_PROMPT),
+                                     agent("synthesizer_1", "SynthBot", SYNTHESIZER_PROMPT)], verbose=False)
+        started = time.perf_counter()
+        orchestrator.run_workflow(QUERY, max_turns=args.turns)
+        return orchestrator.metrics.totals(), time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark prompt-prefix caching across context strategies")
+    parser.add_argument("--turns", type=int, default=30)
+    parser.add_argument("--reply-words", type=int, default=150, help="Length of every stub reply")
+    parser.add_argument("--context-tokens", type=int, default=8000, help="Context window forced on the agents")
+    parser.add_argument("--strategy", choices=STRATEGIES, default="truncate")
+    parser.add_argument("--prompt-token-delay", type=float, default=20e-6,
+                        help="Simulated prefill seconds per uncached prompt token")
+    args = parser.parse_args()
+
+    print(f"{args.turns} turns, {args.reply_words}-word replies, {args.strategy} to {args.context_tokens} tokens")
+    print(f"{'layout':>28} {'prompt tok':>11} {'cached':>8} {'cost $':>8} {'wall s':>7}")
+    for label, low_watermark in (("full history (no window)", None),
+                                 ("evict per call", 1.0),
+                                 ("sticky eviction to 80%", 0.8)):
+        totals, elapsed = run(args, low_watermark)
+        share = totals["cached_tokens"] / totals["prompt_tokens"] if totals["prompt_tokens"] else 0.0
+        print(f"{label:>28} {totals['prompt_tokens']:>11} {share:>8.0%} {totals['cost']:>8.4f} {elapsed:>7.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: bench_routing.py
+@time: 10/17/26 23:30
+"""
+# benchmarks/bench_routing.py
+# Wall-clock and cost of workflows on one large model vs. a small-to-large cascade (agents/routing.py),
+# at several rates of small-model replies failing the quality checks, offline with MockAgent.
+# Run from the repository root: python -m benchmarks.bench_routing
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from typing import List, Optional
+from agents.base import BaseAgent
+from agents.mock_agent import MockAgent
+from agents.routing import RoutedAgent, RoutingPolicy
+from orchestrator import Orchestrator, RESEARCHER_PROMPT, SYNTHESIZER_PROMPT
+
+QUERY = "Research the impact of quantum computing on encryption standards"
+SMALL, LARGE = "llama3-8b-8192", "llama3-70b-8192"
+
+
+def make_route(model: str, args: argparse.Namespace, failure_rate: float, seed: int) -> MockAgent:
+    """Mock of a model; failure_rate of its replies are refusals, which fail the quality checks"""
+    draws = random.Random(seed)
+    words = " ".join(f"finding{index}" for index in range(args.reply_words))
+
+    def reply(messages) -> str:
+        return "I'm sorry, I can't help." if draws.random() < failure_rate else f"{model} reply: {words}"
+
+    small = model == SMALL
+    return MockAgent("route", model, "route", model=model, responses=reply, seed=seed,
+                     latency=args.small_latency if small else args.large_latency,
+                     tokens_per_second=args.small_tps if small else args.large_tps)
+
+
+def make_agents(args: argparse.Namespace, failure_rate: Optional[float], seed: int) -> List[BaseAgent]:
+    """Researcher and synthesizer on the large model alone (failure_rate None) or on the cascade"""
+    agents = []
+    for index, (agent_id, name, prompt) in enumerate((("researcher_1", "ResearchBot", RESEARCHER_PROMPT),
+                                                      ("synthesizer_1", "SynthBot", SYNTHESIZER_PROMPT))):
+        large = make_route(LARGE, args, 0.0, seed + 2 * index)
+        if failure_rate is None:
+            agents.append(MockAgent(agent_id, name, "benchmark", model=LARGE, system_prompt=prompt,
+                                    responses=large.responses, latency=args.large_latency,
+                                    tokens_per_second=args.large_tps))
+        else:
+            small = make_route(SMALL, args, failure_rate, seed + 2 * index + 1)
+            agents.append(RoutedAgent(agent_id, name, "benchmark", [small, large], policy=RoutingPolicy(),
+                                      system_prompt=prompt))
+    return agents
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark model cascades against a single large model")
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--reply-words", type=int, default=200)
+    parser.add_argument("--small-latency", type=float, default=0.05, help="Small model time to first token")
+    parser.add_argument("--small-tps", type=float, default=2000.0, help="Small model tokens per second")
+    parser.add_argument("--large-latency", type=float, default=0.2, help="Large model time to first token")
+    parser.add_argument("--large-tps", type=float, default=400.0, help="Large model tokens per second")
+    args = parser.parse_args()
+
+    print(f"{args.turns} turns, {args.reply_words}-word replies; {SMALL}: {args.small_latency * 1e3:.0f} ms + "
+          f"{args.small_tps:.0f} tok/s, {LARGE}: {args.large_latency * 1e3:.0f} ms + {args.large_tps:.0f} tok/s; "
+          f"final synthesis always on {LARGE}")
+    print(f"{'setup':>28} {'wall s':>7} {'speedup':>8} {'calls':>6} {'escalated':>10} {'cost $':>9}")
+    baseline = None
+    for label, failure_rate in ((f"{LARGE} only", None), ("cascade, 0% small failures", 0.0),
+                                ("cascade, 30% small failures", 0.3), ("cascade, 100% small failures", 1.0)):
+        timings, costs, calls, escalated = [], [], [], []
+        for seed in range(0, 4 * args.repeat, 4):
+            orchestrator = Orchestrator(make_agents(args, failure_rate, seed), verbose=False)
+            started = time.perf_counter()
+            asyncio.run(orchestrator.arun_workflow(QUERY, max_turns=args.turns))
+            timings.append(time.perf_counter() - started)
+            totals = orchestrator.metrics.totals()
+            costs.append(totals["cost"])
+            calls.append(totals["calls"])
+            escalated.append(sum(1 for record in orchestrator.metrics.records if record.get("escalated")))
+        elapsed = statistics.median(timings)
+        baseline = baseline or elapsed
+        print(f"{label:>28} {elapsed:>7.2f} {baseline / elapsed:>7.2f}x {statistics.median(calls):>6.0f} "
+              f"{statistics.median(escalated):>10.0f} {statistics.median(costs):>9.5f}")
+        if failure_rate == 0.3:
+            print("\n" + orchestrator.metrics.format_routes() + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: bench_server.py
+@time: 10/17/26 21:20
+"""
+# benchmarks/bench_server.py
+# Per-query latency of one-shot run.py processes vs. jobs sent to a warm ResearchServer, and per-tenant
+# latency under load, against a local stub server.
+# Run from the repository root: python -m benchmarks.bench_server
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+from agents.openai_agent import OpenAIAgent
+from benchmarks.stub_server import StubServer
+from orchestrator import RESEARCHER_PROMPT, SYNTHESIZER_PROMPT
+from server import ResearchServer
+
+QUERY = "Research the impact of quantum computing on encryption standards"
+
+
+def bench_cli(base_url: str, queries: int, turns: int) -> List[float]:
+    """Wall-clock of one run.py process per query, as the CLI is used today"""
+    env = dict(os.environ, OPENAI_API_KEY="stub-key", LITELLM_BASE_URL=base_url)
+    timings = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for index in range(queries):
+            started = time.perf_counter()
+            subprocess.run([sys.executable, "run.py", "--query", QUERY, "--researcher", "openai", "--synthesizer",
+                            "openai", "--turns", str(turns), "--output", os.path.join(tmp, f"{index}.json")],
+                           env=env, check=True, stdout=subprocess.DEVNULL)
+            timings.append(time.perf_counter() - started)
+    return timings
+
+
+async def submit(port: int, tenant: str, turns: int) -> Tuple[str, float]:
+    """POST a streamed job and read its events until done; (status, seconds)"""
+    started = time.perf_counter()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps({"query": QUERY, "turns": turns, "stream": True}).encode("utf-8")
+    writer.write(f"POST /jobs HTTP/1.1\r\nHost: bench\r\nX-Tenant: {tenant}\r\nContent-Length: {len(body)}\r\n\r\n"
+                 .encode("ascii") + body)
+    response = await reader.read()
+    writer.close()
+    if not response.startswith(b"HTTP/1.1 200"):
+        return response.split(b" ", 2)[1].decode("ascii"), time.perf_counter() - started
+    done = response.rsplit(b"event: done\ndata: ", 1)[1]
+    return json.loads(done)["status"], time.perf_counter() - started
+
+
+def percentiles(timings: List[float]) -> str:
+    ordered = sorted(timings)
+    return (f"p50 {statistics.median(ordered) * 1e3:>7.1f} ms, "
+            f"p95 {ordered[max(0, round(len(ordered) * 0.95) - 1)] * 1e3:>7.1f} ms")
+
+
+async def bench_service(base_url: str, args: argparse.Namespace):
+    def agents():
+        return [OpenAIAgent("researcher_1", "ResearchBot", "information_gatherer", "stub-key", "gpt-4o",
+                            base_url=base_url, system_prompt=RESEARCHER_PROMPT),
+                OpenAIAgent("synthesizer_1", "SynthBot", "critic_summarizer", "stub-key", "gpt-4o",
+                            base_url=base_url, system_prompt=SYNTHESIZER_PROMPT)]
+
+    server = ResearchServer(agents, max_concurrency=args.concurrency, tenant_concurrency=args.tenant_concurrency,
+                            tenant_queue=args.bulk_jobs, max_turns=args.turns)
+    _, port = await server.start("127.0.0.1", 0)
+
+    sequential = [(await submit(port, "solo", args.turns))[1] for _ in range(args.queries)]
+    print(f"{'warm server, one at a time':>30}: {percentiles(sequential)}")
+
+    # A bulk tenant floods the queue, then an interactive tenant sends a few queries
+    bulk = [asyncio.create_task(submit(port, "bulk", args.turns)) for _ in range(args.bulk_jobs)]
+    await asyncio.sleep(0.05)
+    interactive = await asyncio.gather(*(submit(port, "interactive", args.turns) for _ in range(args.queries)))
+    bulk_results = await asyncio.gather(*bulk)
+    stats = server.stats()
+    await server.close()
+
+    print(f"\nUnder load: {args.bulk_jobs} bulk + {args.queries} interactive jobs, concurrency {args.concurrency}, "
+          f"{args.tenant_concurrency} per tenant")
+    for tenant, results in (("bulk", bulk_results), ("interactive", interactive)):
+        statuses: Dict[str, int] = {}
+        for status, _ in results:
+            statuses[status] = statuses.get(status, 0) + 1
+        print(f"{tenant:>30}: {percentiles([elapsed for _, elapsed in results])}  {statuses}")
+    print(f"{'server queue wait':>30}: p50 {stats['latency']['queue_wait']['p50'] * 1e3:.1f} ms, "
+          f"p95 {stats['latency']['queue_wait']['p95'] * 1e3:.1f} ms; agent pool {stats['agent_pool']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the research service against one-shot CLI runs")
+    parser.add_argument("--queries", type=int, default=8, help="Queries timed one at a time, and interactive jobs")
+    parser.add_argument("--turns", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.02, help="Stub server latency per call in seconds")
+    parser.add_argument("--bulk-jobs", type=int, default=48)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--tenant-concurrency", type=int, default=6)
+    parser.add_argument("--skip-cli", action="store_true", help="Don't time one-shot run.py processes")
+    args = parser.parse_args()
+
+    with StubServer(delay=args.latency) as stub:
+        print(f"{args.turns}-turn research, stub latency {args.latency * 1e3:.0f} ms per call")
+        if not args.skip_cli:
+            cli = bench_cli(stub.base_url, args.queries, args.turns)
+            print(f"{'run.py process per query':>30}: {percentiles(cli)}")
+        asyncio.run(bench_service(stub.base_url, args))
+
+
+if __name__ == "__main__":
+    main()
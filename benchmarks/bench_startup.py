@@ -0,0 +1,100 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: bench_startup.py
+@time: 10/17/26 23:55
+"""
+# benchmarks/bench_startup.py
+# Import time of run.py (python -X importtime) and wall-clock of short run.py processes, checked against a
+# budget: exits with status 1 if importing run.py takes longer, or loads a provider SDK before it is chosen.
+# Run from the repository root: python -m benchmarks.bench_startup
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Tuple
+from agents.registry import PROVIDERS
+from benchmarks.stub_server import StubServer
+
+QUERY = "Research the impact of quantum computing on encryption standards"
+# Top-level packages of the provider SDKs; a provider's agent module imports its own
+SDK_PACKAGES = {"openai": "openai", "groq": "groq"}
+
+
+def import_times(command: List[str], env: Dict[str, str]) -> Tuple[Dict[str, Tuple[int, int]], float]:
+    """Run command under -X importtime; ({module: (self us, cumulative us)}, wall seconds)"""
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime"] + command, env=env, check=True,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - started
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules, elapsed
+
+
+def sdks_loaded(modules: Dict[str, Tuple[int, int]]) -> List[str]:
+    return sorted(provider for provider, package in SDK_PACKAGES.items() if package in modules)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark run.py startup against an import-time budget")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--budget-ms", type=float, default=150.0,
+                        help="Largest acceptable median time to import run.py, in milliseconds")
+    parser.add_argument("--top", type=int, default=12, help="Slowest imports to list")
+    args = parser.parse_args()
+
+    env = dict(os.environ, OPENAI_API_KEY="stub-key", GROQ_API_KEY="stub-key")
+    failures = []
+
+    # Warm up the file system cache and bytecode before timing
+    import_times(["-c", "import run"], env)
+    runs = [import_times(["-c", "import run"], env) for _ in range(args.repeat)]
+    import_ms = statistics.median(modules["run"][1] for modules, _ in runs) / 1e3
+    interpreter_ms = statistics.median(elapsed for _, elapsed in runs) * 1e3
+    modules = runs[-1][0]
+    print(f"import run: median {import_ms:.1f} ms (budget {args.budget_ms:.0f} ms), whole process "
+          f"{interpreter_ms:.0f} ms; provider SDKs loaded: {', '.join(sdks_loaded(modules)) or 'none'}")
+    print(f"\n{'slowest imports':<40} {'self ms':>8} {'cumulative ms':>14}")
+    for name, (self_us, cumulative_us) in sorted(modules.items(), key=lambda item: -item[1][1])[:args.top]:
+        print(f"{name[:40]:<40} {self_us / 1e3:>8.1f} {cumulative_us / 1e3:>14.1f}")
+    if import_ms > args.budget_ms:
+        failures.append(f"importing run.py took {import_ms:.1f} ms, over the {args.budget_ms:.0f} ms budget")
+    if sdks_loaded(modules):
+        failures.append(f"importing run.py loaded provider SDKs: {', '.join(sdks_loaded(modules))}")
+
+    # Whole short processes, as a batch job launches them; the run answers from a local stub
+    print(f"\n{'process':<40} {'wall ms':>8}  SDKs loaded")
+    with StubServer() as stub, tempfile.TemporaryDirectory() as tmp:
+        env["LITELLM_BASE_URL"] = stub.base_url
+        for label, command in (("run.py --help", ["run.py", "--help"]),
+                               ("run.py, 1 turn, openai",
+                                ["run.py", "--query", QUERY, "--researcher", "openai", "--synthesizer", "openai",
+                                 "--turns", "1", "--no-cache", "--output", os.path.join(tmp, "transcript.json")])):
+            timings, loaded = [], []
+            for _ in range(args.repeat):
+                modules, elapsed = import_times(command, env)
+                timings.append(elapsed)
+                loaded = sdks_loaded(modules)
+            print(f"{label:<40} {statistics.median(timings) * 1e3:>8.0f}  {', '.join(loaded) or 'none'}")
+            chosen = [provider for provider in PROVIDERS if provider in command]
+            extra = [provider for provider in loaded if provider not in chosen]
+            if extra:
+                failures.append(f"{label} loaded SDKs it doesn't use: {', '.join(extra)}")
+
+    for failure in failures:
+        print(f"\nFAIL: {failure}")
+    if failures:
+        sys.exit(1)
+    print("\nWithin budget")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: bench_transcript_index.py
+@time: 10/17/26 22:05
+"""
+# benchmarks/bench_transcript_index.py
+# Ingest rate of transcript files and similar-query lookup latency and recall of TranscriptIndex at 100k entries.
+# Run from the repository root: python -m benchmarks.bench_transcript_index --entries 100000
+import argparse
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from transcript_index import TranscriptIndex
+
+SYNTHESIS = "Quantum computers threaten RSA and ECC; lattice-based schemes are the leading replacement. " * 20
+
+
+def make_query(generator: random.Random, vocabulary: list) -> str:
+    return "Research " + " ".join(generator.choice(vocabulary) for _ in range(generator.randint(6, 12)))
+
+
+def near_duplicate(generator: random.Random, query: str) -> str:
+    """The query with one word appended, the way a user rephrases a past question"""
+    return f"{query} {generator.choice(['today', 'recently', 'in 2026', 'overview', 'briefly'])}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the transcript index")
+    parser.add_argument("--entries", type=int, default=100000, help="Indexed transcripts for the lookup benchmark")
+    parser.add_argument("--files", type=int, default=1000, help="Transcript files written for the ingest benchmark")
+    parser.add_argument("--lookups", type=int, default=500)
+    parser.add_argument("--threshold", type=float, default=0.7)
+    args = parser.parse_args()
+
+    generator = random.Random(0)
+    vocabulary = [f"term{index}" for index in range(5000)]
+    with tempfile.TemporaryDirectory() as tmp:
+        files_dir = os.path.join(tmp, "transcripts")
+        os.makedirs(files_dir)
+        for index in range(args.files):
+            with open(os.path.join(files_dir, f"{index}.json"), "w") as f:
+                json.dump([{"agent": "Human", "role": "user", "content": make_query(generator, vocabulary)},
+                           {"agent": "SynthBot", "role": "assistant", "content": SYNTHESIS}], f)
+        index = TranscriptIndex(os.path.join(tmp, "index.sqlite"))
+        started = time.perf_counter()
+        added, _ = index.add_paths([files_dir])
+        elapsed = time.perf_counter() - started
+        started = time.perf_counter()
+        index.add_paths([files_dir])
+        rescan = time.perf_counter() - started
+        print(f"Ingest: {added} files in {elapsed:.2f}s ({added / elapsed:.0f} files/s); "
+              f"rescan of unchanged files {rescan * 1e3:.0f} ms")
+
+        queries = [make_query(generator, vocabulary) for _ in range(args.entries - added)]
+        started = time.perf_counter()
+        for number, query in enumerate(queries):
+            index.add_entry(f"synthetic/{number}.json", query, SYNTHESIS)
+        index.commit()
+        print(f"Bulk entries: {len(queries)} in {time.perf_counter() - started:.1f}s; index holds {len(index)}, "
+              f"{os.path.getsize(index.path) / 2 ** 20:.0f} MiB")
+
+        for label, lookups in (("near-duplicate", [near_duplicate(generator, generator.choice(queries))
+                                                   for _ in range(args.lookups)]),
+                               ("novel", [make_query(generator, vocabulary) for _ in range(args.lookups)])):
+            timings, found = [], 0
+            for query in lookups:
+                started = time.perf_counter()
+                match = index.best_match(query, args.threshold)
+                timings.append(time.perf_counter() - started)
+                found += match is not None
+            timings.sort()
+            print(f"{label:>15} lookups: p50 {statistics.median(timings) * 1e3:.2f} ms, "
+                  f"p95 {timings[int(len(timings) * 0.95) - 1] * 1e3:.2f} ms, matched {found / len(lookups):.0%}")
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: stub_server.py
+@time: 10/17/26 14:55
+"""
+# benchmarks/stub_server.py
+# Minimal local OpenAI-compatible chat completions server for offline benchmarks.
+import hashlib
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Answers POST .../chat/completions with a fixed completion, streamed as SSE if requested"""
+
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is visible
+    # Headers and body go out in separate writes; without TCP_NODELAY, Nagle plus
+    # delayed ACKs would add ~40ms to every request on a reused connection
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        # One handler instance per TCP connection
+        with self.server.lock:
+            self.server.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.endswith("/chat/completions"):
+            self.send_error(404)
+            return
+
+        with self.server.lock:
+            self.server.requests += 1
+            failed = self.server.error_rate and self.server.random.random() < self.server.error_rate
+            reply = self.server.reply.replace("{n}", str(self.server.requests))
+            usage = self.server.usage(request.get("messages", []), reply)
+        delay = self.server.delay
+        if self.server.prompt_token_delay:
+            delay += (usage["prompt_tokens"] - usage["prompt_tokens_details"]["cached_tokens"]) \
+                * self.server.prompt_token_delay
+        if delay:
+            time.sleep(delay)
+
+        if failed:
+            self._send_json(503, {"error": {"message": "Injected stub error", "type": "server_error"}})
+        elif request.get("stream"):
+            self._stream(request, reply, usage)
+        else:
+            self._send_json(200, {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [{
+                    "index": 0,
+                    "message": {"role": "assistant", "content": reply},
+                    "finish_reason": "stop"
+                }],
+                "usage": usage
+            })
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _write_chunk(self, data: bytes):
+        """One HTTP/1.1 chunk; the stream has no Content-Length, and keep-alive needs the framing"""
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _stream(self, request: dict, reply: str, usage: dict):
+        """Send the reply word by word as server-sent events, like the OpenAI streaming API"""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+
+        def event(choices: list, usage: Optional[dict] = None):
+            chunk = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": request.get("model", "stub"), "choices": choices}
+            if usage is not None:
+                chunk["usage"] = usage
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+
+        words = reply.split(" ")
+        for index, word in enumerate(words):
+            if index and self.server.chunk_delay:
+                time.sleep(self.server.chunk_delay)
+            text = word if index == len(words) - 1 else word + " "
+            event([{"index": 0, "delta": {"content": text}, "finish_reason": None}])
+        event([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if (request.get("stream_options") or {}).get("include_usage"):
+            event([], usage)
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+
+class StubServer(ThreadingHTTPServer):
+    """Stub server running in a background thread; use as a context manager"""
+
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, delay: float = 0.0, reply: str = "stub reply",
+                 chunk_delay: float = 0.0, error_rate: float = 0.0, seed: Optional[int] = 0,
+                 prefix_cache: bool = False, min_cached_tokens: int = 1024, prompt_token_delay: float = 0.0):
+        super().__init__(("127.0.0.1", port), StubHandler)
+        self.delay = delay
+        # "{n}" in reply is replaced by the request number, to make every reply different
+        self.reply = reply
+        # Streamed replies are sent a word at a time, chunk_delay apart
+        self.chunk_delay = chunk_delay
+        # Share of requests answered with a 503, drawn from a seeded generator
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        # Simulated provider prompt caching: prompt tokens in a message prefix seen before (of at
+        # least min_cached_tokens) are reported as cached, and only uncached ones cost prompt_token_delay
+        self.prefix_cache = prefix_cache
+        self.min_cached_tokens = min_cached_tokens
+        self.prompt_token_delay = prompt_token_delay
+        self._prefixes = set()
+        self.connections = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    def usage(self, messages: list, reply: str) -> dict:
+        """Usage block for a request; fixed small counts unless prefix caching is simulated"""
+        if not self.prefix_cache:
+            return {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15,
+                    "prompt_tokens_details": {"cached_tokens": 0}}
+        prompt_tokens = cached_tokens = 0
+        digest = hashlib.sha256()
+        prefixes = []
+        for message in messages:
+            # Byte-exact, like a provider's cache: any change to a message invalidates everything after it
+            digest.update(json.dumps(message, sort_keys=True).encode("utf-8"))
+            prompt_tokens += len(message.get("content") or "") // 4 + 4
+            key = digest.hexdigest()
+            if key in self._prefixes and prompt_tokens >= self.min_cached_tokens:
+                cached_tokens = prompt_tokens
+            prefixes.append(key)
+        self._prefixes.update(prefixes)
+        completion_tokens = len(reply) // 4 + 1
+        return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "prompt_tokens_details": {"cached_tokens": cached_tokens}}
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def reset_counters(self):
+        with self.lock:
+            self.connections = 0
+            self.requests = 0
+
+    def __enter__(self) -> "StubServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,88 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: convergence.py
+@time: 10/17/26 16:55
+"""
+# convergence.py
+import re
+from typing import FrozenSet, Optional, Sequence
+from mcp.protocol import MCPMessage
+
+# Phrases a synthesizer uses when it sees nothing left to investigate
+NO_GAPS_PATTERNS = (
+    r"\bno (?:further|remaining|significant|major|additional|other|obvious) "
+    r"(?:gaps|open questions|areas (?:that need|needing|for|requiring) (?:further|more))",
+    r"\bnothing (?:further|more|else) (?:to|that needs to be) (?:add|investigate|research|explore)",
+    r"\b(?:all|the) (?:key |main |remaining )?(?:gaps|open questions) (?:have been|are) "
+    r"(?:addressed|covered|resolved|closed)",
+)
+
+_WORD = re.compile(r"\w+")
+
+
+def shingles(text: str, size: int = 3) -> FrozenSet[int]:
+    """Hashed word n-grams of text, lower-cased"""
+    words = _WORD.findall(text.lower())
+    if len(words) < size:
+        return frozenset([hash(tuple(words))]) if words else frozenset()
+    return frozenset(hash(tuple(words[i:i + size])) for i in range(len(words) - size + 1))
+
+
+def jaccard(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class ConvergencePolicy:
+    """Decides when successive synthesis turns stop adding anything new.
+
+    A turn has converged when the shingle (word n-gram) Jaccard similarity
+    of its synthesis to the previous one reaches similarity_threshold, or
+    when the synthesis says there are no further gaps. The scores are stored
+    in the message's metadata["convergence"] whether or not stop is set, so
+    thresholds can be tuned offline from transcripts.
+    """
+
+    def __init__(self, similarity_threshold: float = 0.6, shingle_size: int = 3, min_turns: int = 1,
+                 stop: bool = True, patterns: Sequence[str] = NO_GAPS_PATTERNS):
+        self.similarity_threshold = similarity_threshold
+        self.shingle_size = shingle_size
+        self.min_turns = min_turns
+        self.stop = stop
+        self._no_gaps = re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.IGNORECASE)
+        # Shingles of the last message compared, so each synthesis is shingled once
+        self._last_id: Optional[str] = None
+        self._last_shingles: FrozenSet[int] = frozenset()
+
+    def _shingles(self, message: MCPMessage) -> FrozenSet[int]:
+        if message.message_id == self._last_id:
+            return self._last_shingles
+        return shingles(message.content, self.shingle_size)
+
+    def check(self, response: MCPMessage, previous: Optional[MCPMessage], turn: int) -> bool:
+        """Score response against the previous synthesis; True if the loop should end after it"""
+        current = shingles(response.content, self.shingle_size)
+        similarity = jaccard(current, self._shingles(previous)) if previous is not None else None
+        self._last_id, self._last_shingles = response.message_id, current
+
+        signal = self._no_gaps.search(response.content) is not None
+        converged = turn + 1 >= self.min_turns and (
+            signal or (similarity is not None and similarity >= self.similarity_threshold)
+        )
+        response.metadata["convergence"] = {
+            "turn": turn + 1,
+            "similarity": None if similarity is None else round(similarity, 4),
+            "no_gaps_signal": signal,
+            "converged": converged,
+            "stopped": converged and self.stop
+        }
+        return converged and self.stop
+
+    @staticmethod
+    def stopped_after(message: Optional[MCPMessage]) -> bool:
+        """Whether the workflow already ended after message, e.g. before a checkpoint was resumed"""
+        if message is None:
+            return False
+        return bool(message.get_metadata("convergence", {}).get("stopped"))
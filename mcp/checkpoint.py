@@ -0,0 +1,143 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: checkpoint.py
+@time: 10/17/26 13:40
+"""
+# mcp/checkpoint.py
+import json
+import os
+from typing import Any, Dict, List, Optional
+from mcp.protocol import MCPMessage
+from mcp.store import MessageStore, MessageView
+
+CHECKPOINT_VERSION = 1
+
+# View name used for the orchestrator's conversation history
+HISTORY_VIEW = "__history__"
+
+
+class CheckpointState:
+    """Workflow state read back from a checkpoint file"""
+
+    def __init__(self, query: str, max_turns: int, agent_ids: List[str]):
+        self.query = query
+        self.max_turns = max_turns
+        self.agent_ids = agent_ids
+        # Number of completed workflow steps
+        self.step = 0
+        self.messages: List[MCPMessage] = []
+        # View name -> store slots, for each agent and HISTORY_VIEW
+        self.views: Dict[str, List[int]] = {HISTORY_VIEW: []}
+        # Byte length of the file up to the end of the last complete step
+        self.size = 0
+
+    def build_store(self):
+        """Rebuild the message store and its views: (store, {view name: MessageView})"""
+        store = MessageStore()
+        for message in self.messages:
+            store.add(message)
+        views = {name: MessageView.from_slots(store, slots) for name, slots in self.views.items()}
+        return store, views
+
+
+class WorkflowCheckpoint:
+    """Append-only checkpoint log of an orchestrator's workflow.
+
+    The file is JSONL: a header with the query and agent ids, then for each
+    completed step the messages that entered the shared store during that
+    step followed by a "step" record with the slots each view (agent contexts
+    and the conversation history) gained. Saving a step therefore costs only
+    what changed, and loading is a single streaming pass however long the
+    session is. Records after the last complete step belong to a step that was
+    interrupted and are discarded on load.
+    """
+
+    def __init__(self, path: str, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self._file = None
+        self._messages_written = 0
+        self._view_lengths: Dict[str, int] = {}
+
+    @staticmethod
+    def exists(path: str) -> bool:
+        return os.path.exists(path) and os.path.getsize(path) > 0
+
+    @staticmethod
+    def load(path: str) -> CheckpointState:
+        """Read the state as of the last completed step"""
+        state: Optional[CheckpointState] = None
+        pending: List[MCPMessage] = []
+        offset = 0
+        with open(path, "rb") as f:
+            for raw in f:
+                offset += len(raw)
+                if not raw.endswith(b"\n"):
+                    break  # interrupted write
+                record = json.loads(raw)
+                kind = record["type"]
+                if kind == "header":
+                    if record["version"] != CHECKPOINT_VERSION:
+                        raise ValueError(f"Unsupported checkpoint version: {record['version']}")
+                    state = CheckpointState(record["query"], record["max_turns"], record["agents"])
+                    state.size = offset
+                elif kind == "message":
+                    pending.append(MCPMessage.from_dict(record["message"]))
+                elif kind == "step":
+                    state.messages.extend(pending)
+                    pending = []
+                    for name, slots in record["views"].items():
+                        state.views.setdefault(name, []).extend(slots)
+                    state.step = record["step"]
+                    state.size = offset
+        if state is None:
+            raise ValueError(f"No checkpoint header in {path}")
+        return state
+
+    def resume(self, state: CheckpointState):
+        """Continue writing after the state's last complete step"""
+        self._file = open(self.path, "r+b")
+        self._file.truncate(state.size)
+        self._file.seek(state.size)
+        self._messages_written = len(state.messages)
+        self._view_lengths = {name: len(slots) for name, slots in state.views.items()}
+
+    def _write(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n")
+
+    def record(self, orchestrator, step: int, query: str, max_turns: int):
+        """Append everything that changed since the last recorded step"""
+        if self._file is None:
+            self._file = open(self.path, "wb")
+            self._write({
+                "type": "header",
+                "version": CHECKPOINT_VERSION,
+                "query": query,
+                "max_turns": max_turns,
+                "agents": list(orchestrator.agents)
+            })
+
+        store = orchestrator.store
+        for slot in range(self._messages_written, len(store)):
+            self._write({"type": "message", "message": store.at(slot).to_dict()})
+        self._messages_written = len(store)
+
+        views = {HISTORY_VIEW: orchestrator.conversation_history}
+        for agent_id, agent in orchestrator.agents.items():
+            views[agent_id] = agent.messages
+        deltas = {}
+        for name, view in views.items():
+            start = self._view_lengths.get(name, 0)
+            deltas[name] = view.slots[start:].tolist()
+            self._view_lengths[name] = len(view)
+        self._write({"type": "step", "step": step, "views": deltas})
+
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
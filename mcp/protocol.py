@@ -6,13 +6,32 @@
 """
 # mcp/protocol.py
 import time
-import uuid
-from typing import Dict, List, Any, Optional
+from random import getrandbits
+from typing import Dict, List, Any, Optional, Tuple
+
+# Shared immutable default for messages without references
+_NO_REFERENCES: Tuple[str, ...] = ()
+
+
+def new_message_id() -> str:
+    """Random message id in the msg_<16 hex chars> format.
+
+    64 random bits, so ids stay unique across the many thousands of messages
+    a store, transcript index or server process holds (40 bits gave even
+    odds of a collision around a million ids). Several times faster than
+    uuid.uuid4().hex[:16] since it skips building a UUID object. Ids are
+    opaque: transcripts with the older 10-character ids still load.
+    """
+    return f"msg_{getrandbits(64):016x}"
 
 
 class MCPMessage:
     """Implementation of a message following the Model Context Protocol"""
 
+    # No per-instance __dict__: sessions keep many thousands of these alive
+    __slots__ = ("role", "content", "agent_id", "message_id", "references", "_metadata", "timestamp",
+                 "token_count")
+
     def __init__(
             self,
             role: str,
@@ -20,15 +39,35 @@ class MCPMessage:
             agent_id: str,
             message_id: Optional[str] = None,
             references: Optional[List[str]] = None,
-            metadata: Optional[Dict[str, Any]] = None
+            metadata: Optional[Dict[str, Any]] = None,
+            timestamp: Optional[float] = None
     ):
         self.role = role
         self.content = content
         self.agent_id = agent_id
-        self.message_id = message_id or f"msg_{uuid.uuid4().hex[:10]}"
-        self.references = references or []
-        self.metadata = metadata or {}
-        self.timestamp = time.time()
+        self.message_id = message_id or new_message_id()
+        # References never change once a message is created, so keep them as a tuple
+        self.references: Tuple[str, ...] = tuple(references) if references else _NO_REFERENCES
+        # Metadata dict is only allocated when something is stored in it
+        self._metadata: Optional[Dict[str, Any]] = metadata or None
+        self.timestamp = time.time() if timestamp is None else timestamp
+        # Token count of content, filled in lazily by agents.context
+        self.token_count: Optional[int] = None
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        """Message metadata, created on first access"""
+        if self._metadata is None:
+            self._metadata = {}
+        return self._metadata
+
+    @metadata.setter
+    def metadata(self, value: Optional[Dict[str, Any]]):
+        self._metadata = value or None
+
+    def get_metadata(self, key: str, default: Any = None) -> Any:
+        """One metadata value, without allocating the dict of a message that has none"""
+        return self._metadata.get(key, default) if self._metadata else default
 
     def to_dict(self) -> Dict[str, Any]:
         """Convert message to MCP dictionary format"""
@@ -38,15 +77,15 @@ class MCPMessage:
             "mcp": {
                 "message_id": self.message_id,
                 "agent_id": self.agent_id,
-                "references": self.references,
-                "metadata": self.metadata,
+                "references": list(self.references),
+                "metadata": dict(self._metadata) if self._metadata else {},
                 "timestamp": self.timestamp
             }
         }
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'MCPMessage':
-        """Create message from dictionary"""
+        """Create message from dictionary (inverse of to_dict)"""
         mcp_data = data.get("mcp", {})
 
         return cls(
@@ -55,5 +94,6 @@ class MCPMessage:
             agent_id=mcp_data.get("agent_id", "unknown"),
             message_id=mcp_data.get("message_id"),
             references=mcp_data.get("references", []),
-            metadata=mcp_data.get("metadata", {})
-        )
\ No newline at end of file
+            metadata=mcp_data.get("metadata", {}),
+            timestamp=mcp_data.get("timestamp")
+        )
@@ -0,0 +1,156 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: store.py
+@time: 10/17/26 12:10
+"""
+# mcp/store.py
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Union
+from mcp.protocol import MCPMessage
+
+
+class MessageStore:
+    """Single owner of MCPMessage objects, indexed by id, author and reference edges.
+
+    Every message is kept once, in insertion order, at an integer slot. Agent
+    contexts and the orchestrator's history are MessageViews holding slots
+    into the store, so a message costs the same no matter how many agents see
+    it, and message ids and references resolve with a dict lookup instead of a
+    scan. Adding a message whose id is already stored is a no-op, unless it
+    is a different message under the same id, which raises ValueError.
+    """
+
+    def __init__(self):
+        self._messages: List[MCPMessage] = []
+        self._slots: Dict[str, int] = {}
+        self._by_agent: Dict[str, array] = {}
+        self._referenced_by: Dict[str, array] = {}
+
+    def add(self, message: MCPMessage) -> int:
+        """Store a message (once) and return its slot"""
+        slot = self._slots.get(message.message_id)
+        if slot is not None:
+            stored = self._messages[slot]
+            same = stored is message or (stored.role, stored.agent_id, stored.content) == (
+                message.role, message.agent_id, message.content)
+            if not same:
+                raise ValueError(f"Message id {message.message_id} is already stored for a different message")
+            return slot
+
+        slot = len(self._messages)
+        self._messages.append(message)
+        self._slots[message.message_id] = slot
+        self._by_agent.setdefault(message.agent_id, array("I")).append(slot)
+        for ref in message.references:
+            self._referenced_by.setdefault(ref, array("I")).append(slot)
+        return slot
+
+    def __len__(self) -> int:
+        return len(self._messages)
+
+    def __contains__(self, message_id: str) -> bool:
+        return message_id in self._slots
+
+    def __iter__(self) -> Iterator[MCPMessage]:
+        return iter(self._messages)
+
+    def at(self, slot: int) -> MCPMessage:
+        """Message stored at a slot"""
+        return self._messages[slot]
+
+    def slot_of(self, message_id: str) -> Optional[int]:
+        """Slot of a stored message id, or None"""
+        return self._slots.get(message_id)
+
+    def get(self, message_id: str) -> Optional[MCPMessage]:
+        """Look a message up by id"""
+        slot = self._slots.get(message_id)
+        return None if slot is None else self._messages[slot]
+
+    def by_agent(self, agent_id: str) -> List[MCPMessage]:
+        """All messages authored by agent_id, oldest first"""
+        return [self._messages[slot] for slot in self._by_agent.get(agent_id, ())]
+
+    def references(self, message: Union[MCPMessage, str]) -> List[MCPMessage]:
+        """Messages that a message references (unknown ids are skipped)"""
+        if isinstance(message, str):
+            message = self.get(message)
+            if message is None:
+                return []
+        return [self._messages[self._slots[ref]] for ref in message.references if ref in self._slots]
+
+    def referenced_by(self, message_id: str) -> List[MCPMessage]:
+        """Messages that reference message_id"""
+        return [self._messages[slot] for slot in self._referenced_by.get(message_id, ())]
+
+    def reference_chain(self, message_id: str) -> List[MCPMessage]:
+        """Every message reachable by following references from message_id, nearest first"""
+        chain = []
+        seen = {message_id}
+        frontier = [message_id]
+        while frontier:
+            next_frontier = []
+            for current in frontier:
+                for ref in self.references(current):
+                    if ref.message_id not in seen:
+                        seen.add(ref.message_id)
+                        chain.append(ref)
+                        next_frontier.append(ref.message_id)
+            frontier = next_frontier
+        return chain
+
+    def view(self, messages: Iterable[MCPMessage] = ()) -> "MessageView":
+        """New view into this store, optionally seeded with messages"""
+        return MessageView(self, messages)
+
+
+class MessageView:
+    """Ordered list-like view of messages held as slots into a MessageStore"""
+
+    __slots__ = ("store", "_slots")
+
+    def __init__(self, store: MessageStore, messages: Iterable[MCPMessage] = ()):
+        self.store = store
+        self._slots = array("I")
+        for message in messages:
+            self.append(message)
+
+    @classmethod
+    def from_slots(cls, store: MessageStore, slots: Iterable[int]) -> "MessageView":
+        """View over messages already in store, given their slots"""
+        view = cls(store)
+        view._slots.extend(slots)
+        return view
+
+    def append(self, message: MCPMessage):
+        """Add a message to the store (if new) and to the end of this view"""
+        self._slots.append(self.store.add(message))
+
+    def extend(self, messages: Iterable[MCPMessage]):
+        for message in messages:
+            self.append(message)
+
+    @property
+    def slots(self) -> array:
+        """Store slots of the messages in this view, in order"""
+        return self._slots
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.store.at(slot) for slot in self._slots[index]]
+        return self.store.at(self._slots[index])
+
+    def __iter__(self) -> Iterator[MCPMessage]:
+        at = self.store.at
+        for slot in self._slots:
+            yield at(slot)
+
+    def __bool__(self) -> bool:
+        return len(self._slots) > 0
+
+    def __repr__(self) -> str:
+        return f"MessageView({len(self._slots)} messages)"
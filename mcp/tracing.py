@@ -0,0 +1,145 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: tracing.py
+@time: 10/17/26 18:10
+"""
+# mcp/tracing.py
+import asyncio
+import contextvars
+import json
+import os
+import threading
+import time
+from itertools import count
+from typing import Any, Dict, List, Optional
+
+
+class Span:
+    """A timed operation; use as a context manager, nested spans become its children"""
+
+    __slots__ = ("tracer", "name", "attributes", "span_id", "parent_id", "lane", "start", "end", "_token")
+
+    def __init__(self, tracer: "Tracer", name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.span_id = next(tracer._ids)
+        parent = _current_span.get()
+        self.parent_id = parent.span_id if parent is not None else None
+        self.lane = tracer._lane()
+        self.start = self.end = 0.0
+        self._token = None
+
+    def set(self, **attributes):
+        """Add attributes known only once the operation is under way, e.g. a message id"""
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        self._token = _current_span.set(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.end = time.perf_counter()
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.attributes["error"] = f"{exc_type.__name__}: {exc}"
+        self.tracer._finish(self)
+        return False
+
+
+class _NoopSpan:
+    """Shared do-nothing span handed out while tracing is disabled"""
+
+    __slots__ = ()
+
+    def set(self, **attributes):
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("mcp_current_span", default=None)
+_tracer: Optional["Tracer"] = None
+
+
+class Tracer:
+    """Collects finished spans and exports them in the Chrome trace event format.
+
+    Spans nest through a context variable, so concurrent asyncio tasks and
+    threads each keep their own parent chain. Every task or thread gets its
+    own lane (tid) in the trace, so parallel branches show side by side in
+    chrome://tracing or Perfetto.
+    """
+
+    def __init__(self):
+        self.spans: List[Span] = []
+        self._ids = count(1)
+        self._lanes: Dict[Any, int] = {}
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter()
+
+    def _lane(self) -> int:
+        try:
+            owner = asyncio.current_task()
+        except RuntimeError:
+            owner = None
+        key = id(owner) if owner is not None else threading.get_ident()
+        with self._lock:
+            return self._lanes.setdefault(key, len(self._lanes) + 1)
+
+    def _finish(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def to_chrome_trace(self) -> Dict[str, Any]:
+        """Trace as a Chrome trace JSON object of complete ("X") events"""
+        events = []
+        for span in sorted(self.spans, key=lambda s: s.start):
+            args = {key: value if isinstance(value, (str, int, float, bool)) or value is None else str(value)
+                    for key, value in span.attributes.items()}
+            args["span_id"] = span.span_id
+            args["parent_id"] = span.parent_id
+            events.append({
+                "name": span.name,
+                "cat": span.name.split(".")[0],
+                "ph": "X",
+                "ts": round((span.start - self._origin) * 1e6, 1),
+                "dur": round((span.end - span.start) * 1e6, 1),
+                "pid": os.getpid(),
+                "tid": span.lane,
+                "args": args
+            })
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export(self, path: str):
+        """Write the trace to path; open it in chrome://tracing or ui.perfetto.dev"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_chrome_trace(), f)
+
+
+def enable_tracing() -> Tracer:
+    """Start recording spans process-wide and return the tracer"""
+    global _tracer
+    _tracer = Tracer()
+    return _tracer
+
+
+def disable_tracing() -> Optional[Tracer]:
+    """Stop recording; returns the tracer that was active, if any"""
+    global _tracer
+    tracer, _tracer = _tracer, None
+    return tracer
+
+
+def span(name: str, **attributes):
+    """Context manager timing the enclosed block as a span; a shared no-op while tracing is off"""
+    if _tracer is None:
+        return _NOOP_SPAN
+    return Span(_tracer, name, attributes)
@@ -0,0 +1,188 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: transcript.py
+@time: 10/17/26 13:00
+"""
+# mcp/transcript.py
+import gzip
+import io
+import json
+import os
+from typing import IO, Any, Dict, Iterator, Optional
+from mcp.protocol import MCPMessage
+from mcp.tracing import span
+
+try:
+    import zstandard
+except ImportError:  # optional dependency, only needed for .zst transcripts
+    zstandard = None
+
+JSONL_SUFFIXES = (".jsonl", ".jsonl.gz", ".jsonl.zst")
+
+
+def detect_compression(path: str) -> Optional[str]:
+    """Compression implied by a file name: "gzip", "zstd" or None"""
+    if path.endswith(".gz"):
+        return "gzip"
+    if path.endswith(".zst"):
+        return "zstd"
+    return None
+
+
+def _open_text(path: str, mode: str, compression: Optional[str]) -> IO[str]:
+    """Open a (possibly compressed) text file; mode is "r", "w" or "a" """
+    if compression is None:
+        return open(path, mode, encoding="utf-8")
+    if compression == "gzip":
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    if compression == "zstd":
+        if zstandard is None:
+            raise ImportError("zstd transcripts need the 'zstandard' package: pip install zstandard")
+        raw = open(path, mode + "b")
+        if mode == "r":
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True)
+        else:
+            stream = zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding="utf-8")
+    raise ValueError(f"Unsupported transcript compression: {compression}")
+
+
+class TranscriptWriter:
+    """Append-only JSONL transcript, one MCP message per line.
+
+    Each line is MCPMessage.to_dict() plus the display name of the author
+    under "agent"; other records (with a "type" key) may follow, e.g. the
+    run's metrics summary. Lines are flushed as soon as they are written so a crash
+    loses at most the message being written; with fsync_every set, the file is
+    also fsynced every that many messages (and on close). Compression is
+    taken from the file name (.gz, .zst) unless given explicitly. A new
+    writer replaces an existing file; with append it continues it instead,
+    e.g. for a run resumed from a checkpoint.
+    """
+
+    def __init__(self, path: str, compression: Optional[str] = None, fsync_every: Optional[int] = None,
+                 append: bool = False):
+        self.path = path
+        self.compression = compression or detect_compression(path)
+        self.fsync_every = fsync_every
+        self.count = 0
+        self._file = _open_text(path, "a" if append else "w", self.compression)
+
+    def write(self, message: MCPMessage, agent_name: Optional[str] = None):
+        """Append one message"""
+        with span("transcript.write", message_id=message.message_id):
+            record = message.to_dict()
+            if agent_name is not None:
+                record["agent"] = agent_name
+            self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+            self._file.flush()
+            self.count += 1
+            if self.fsync_every and self.count % self.fsync_every == 0:
+                self._fsync()
+
+    def write_record(self, record: Dict[str, Any]):
+        """Append a non-message record, such as a metrics summary; it needs a "type" key"""
+        self._file.write(json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n")
+        self._file.flush()
+
+    def _fsync(self):
+        """Force written lines to disk"""
+        if self.compression is None:
+            os.fsync(self._file.fileno())
+        else:
+            # Compressed streams wrap the real file object; fsync that one
+            raw = getattr(self._file, "fileobj", None) or getattr(self._file, "buffer", None)
+            fileno = getattr(raw, "fileno", None)
+            if fileno is not None:
+                try:
+                    os.fsync(fileno())
+                except (OSError, io.UnsupportedOperation):
+                    pass
+
+    def close(self):
+        """Flush, fsync if requested and close the file"""
+        if self._file.closed:
+            return
+        self._file.flush()
+        if self.fsync_every:
+            self._fsync()
+        self._file.close()
+
+    def __enter__(self) -> "TranscriptWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def _legacy_agent_id(name: str) -> str:
+    """Best-effort agent id for entries of save_transcript's JSON format"""
+    if name == "Human":
+        return "human"
+    if name == "Orchestrator":
+        return "orchestrator"
+    return name
+
+
+def read_transcript(path: str, compression: Optional[str] = None) -> Iterator[MCPMessage]:
+    """Stream the messages of a transcript back as MCPMessage objects.
+
+    JSONL transcripts (optionally compressed) are read line by line, so memory
+    stays flat however long the transcript is. A truncated last line or
+    compressed stream, as left by a crash mid-write, ends the transcript. Files in the save_transcript JSON array
+    format are supported too, but have to be loaded whole.
+    """
+    compression = compression or detect_compression(path)
+    with _open_text(path, "r", compression) as f:
+        first = f.read(1)
+        while first.isspace():
+            first = f.read(1)
+
+        if first == "[":
+            # save_transcript format: a single JSON array
+            for entry in json.loads(first + f.read()):
+                yield MCPMessage(
+                    role=entry["role"],
+                    content=entry["content"],
+                    agent_id=entry.get("agent_id") or _legacy_agent_id(entry.get("agent", "unknown")),
+                    message_id=entry.get("message_id"),
+                    references=entry.get("references", []),
+                    metadata=entry.get("metadata") or {"agent": entry.get("agent")},
+                    timestamp=entry.get("timestamp")
+                )
+            return
+
+        for record in _jsonl_records(f, first):
+            if "role" in record:  # skip non-message records (see write_record)
+                yield MCPMessage.from_dict(record)
+
+
+def read_records(path: str, compression: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Stream every record of a JSONL file (messages and other records alike) as dicts"""
+    compression = compression or detect_compression(path)
+    with _open_text(path, "r", compression) as f:
+        yield from _jsonl_records(f)
+
+
+def _jsonl_records(f: IO[str], first: str = "") -> Iterator[Dict[str, Any]]:
+    """Parse JSON lines; a truncated last line, as left by a crash mid-write, ends the file"""
+    line = first + _readline(f)
+    while line:
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                if not line.endswith("\n"):
+                    return  # incomplete last line from an interrupted write
+                raise
+        line = _readline(f)
+
+
+def _readline(f: IO[str]) -> str:
+    """Read a line, treating a compressed stream that was cut short as EOF"""
+    try:
+        return f.readline()
+    except EOFError:
+        # gzip stream without its end marker: the writer crashed or is still open
+        return ""
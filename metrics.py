@@ -0,0 +1,180 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: metrics.py
+@time: 10/17/26 17:45
+"""
+# metrics.py
+import math
+import os
+from typing import Any, Dict, Iterable, List, Optional
+from mcp.protocol import MCPMessage
+
+
+def prometheus_label(value: Any) -> str:
+    """Label value escaped for the Prometheus text format (backslash, double quote and newline)"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _aggregate(records: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """Totals and latency statistics over call records"""
+    records = list(records)
+    latencies = sorted(record["latency"] for record in records if record.get("latency") is not None)
+    ttfts = [record["ttft"] for record in records if record.get("ttft") is not None]
+    costs = [record["cost"] for record in records if record.get("cost") is not None]
+    return {
+        "calls": len(records),
+        "cache_hits": sum(1 for record in records if record.get("cache_hit")),
+        "prompt_tokens": sum(record.get("prompt_tokens") or 0 for record in records),
+        "completion_tokens": sum(record.get("completion_tokens") or 0 for record in records),
+        "cached_tokens": sum(record.get("cached_tokens") or 0 for record in records),
+        "latency_total": sum(latencies),
+        "latency_mean": sum(latencies) / len(latencies) if latencies else None,
+        "latency_p95": latencies[math.ceil(len(latencies) * 0.95) - 1] if latencies else None,
+        "latency_max": latencies[-1] if latencies else None,
+        "ttft_mean": sum(ttfts) / len(ttfts) if ttfts else None,
+        "ttft_count": len(ttfts),
+        "ttft_total": sum(ttfts),
+        "cost": sum(costs),
+        # Calls of models without a known price are left out of cost
+        "unpriced_calls": len(records) - len(costs),
+    }
+
+
+class MetricsCollector:
+    """Collects the metrics of generated messages and aggregates them per agent and per turn.
+
+    Agents put per-call metrics (latency, ttft, tokens, model, provider,
+    cost) in metadata["metrics"] of each message they generate; the
+    orchestrator hands every recorded message to observe.
+    """
+
+    def __init__(self):
+        self.records: List[Dict[str, Any]] = []
+
+    def observe(self, message: MCPMessage, agent_name: str, turn: Optional[int] = None):
+        """Record the call behind message, if it carries metrics"""
+        metrics = message.get_metadata("metrics")
+        if metrics is None:
+            return
+        if metrics.get("turn") is None and turn is not None:
+            metrics["turn"] = turn
+        # Replies a routed agent rejected and escalated (agents/routing.py) were calls too
+        for attempt in metrics.get("escalations") or ():
+            self.records.append({"agent": agent_name, "message_id": message.message_id, "turn": metrics.get("turn"),
+                                 "escalated": True, **attempt})
+        self.records.append({"agent": agent_name, "message_id": message.message_id,
+                             **{key: value for key, value in metrics.items() if key != "escalations"}})
+
+    def merge(self, other: "MetricsCollector"):
+        """Add another collector's records, e.g. to total a batch of workflows"""
+        self.records.extend(other.records)
+
+    def by_agent(self) -> Dict[str, Dict[str, Any]]:
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for record in self.records:
+            groups.setdefault(record["agent"], []).append(record)
+        return {agent: {"provider": records[0]["provider"], "model": records[0]["model"], **_aggregate(records)}
+                for agent, records in groups.items()}
+
+    def by_turn(self) -> Dict[int, Dict[str, Any]]:
+        groups: Dict[int, List[Dict[str, Any]]] = {}
+        for record in self.records:
+            if record.get("turn") is not None:
+                groups.setdefault(record["turn"], []).append(record)
+        return {turn: _aggregate(records) for turn, records in sorted(groups.items())}
+
+    def by_route(self) -> Dict[str, Dict[str, Any]]:
+        """Calls of routed agents per route, with how many of their replies were escalated"""
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for record in self.records:
+            if record.get("route") is not None:
+                groups.setdefault(record["route"], []).append(record)
+        return {route: {"escalated": sum(1 for record in records if record.get("escalated")),
+                        "steps": sorted({record["step"] for record in records if record.get("step")}),
+                        **_aggregate(records)}
+                for route, records in groups.items()}
+
+    def totals(self) -> Dict[str, Any]:
+        return _aggregate(self.records)
+
+    def summary(self) -> Dict[str, Any]:
+        """JSON-serializable summary, as written to JSONL transcripts"""
+        routes = self.by_route()
+        return {
+            "totals": self.totals(),
+            "agents": self.by_agent(),
+            "turns": {str(turn): stats for turn, stats in self.by_turn().items()},
+            **({"routes": routes} if routes else {})
+        }
+
+    def format_table(self) -> str:
+        """Plain-text summary table, one row per agent and per turn plus the total"""
+        header = (f"{'':<22} {'calls':>5} {'cached':>6} {'prompt tok':>10} {'cached tok':>10} {'compl tok':>10} "
+                  f"{'mean s':>7} {'p95 s':>7} {'ttft s':>7} {'cost $':>9}")
+
+        def row(label: str, stats: Dict[str, Any]) -> str:
+            def seconds(value):
+                return f"{value:>7.2f}" if value is not None else f"{'-':>7}"
+            return (f"{label[:22]:<22} {stats['calls']:>5} {stats['cache_hits']:>6} {stats['prompt_tokens']:>10} "
+                    f"{stats['cached_tokens']:>10} {stats['completion_tokens']:>10} {seconds(stats['latency_mean'])} "
+                    f"{seconds(stats['latency_p95'])} {seconds(stats['ttft_mean'])} {stats['cost']:>9.4f}")
+
+        lines = [header]
+        lines += [row(agent, stats) for agent, stats in self.by_agent().items()]
+        lines += [row(f"turn {turn}", stats) for turn, stats in self.by_turn().items()]
+        lines.append(row("total", self.totals()))
+        unpriced = self.totals()["unpriced_calls"]
+        if unpriced:
+            lines.append(f"({unpriced} call(s) to models without a known price are not in the cost)")
+        return "\n".join(lines)
+
+    def format_routes(self) -> str:
+        """Plain-text table of calls per route of routed agents, empty if there were none"""
+        routes = self.by_route()
+        if not routes:
+            return ""
+        lines = [f"{'route':<36} {'calls':>5} {'escalated':>9} {'mean s':>7} {'p95 s':>7} {'cost $':>9}  steps"]
+        for route, stats in routes.items():
+            mean = f"{stats['latency_mean']:>7.2f}" if stats["latency_mean"] is not None else f"{'-':>7}"
+            p95 = f"{stats['latency_p95']:>7.2f}" if stats["latency_p95"] is not None else f"{'-':>7}"
+            lines.append(f"{route[:36]:<36} {stats['calls']:>5} {stats['escalated']:>9} {mean} {p95} "
+                         f"{stats['cost']:>9.4f}  {', '.join(stats['steps'])}")
+        return "\n".join(lines)
+
+    def to_prometheus(self) -> str:
+        """Metrics per agent in the Prometheus text exposition format"""
+        series = [
+            ("mcp_agent_calls_total", "counter", "Model calls made", "calls"),
+            ("mcp_agent_cache_hits_total", "counter", "Calls answered from the response cache", "cache_hits"),
+            ("mcp_agent_prompt_tokens_total", "counter", "Prompt tokens sent", "prompt_tokens"),
+            ("mcp_agent_cached_prompt_tokens_total", "counter", "Prompt tokens read from the provider's prompt cache",
+             "cached_tokens"),
+            ("mcp_agent_completion_tokens_total", "counter", "Completion tokens received", "completion_tokens"),
+            ("mcp_agent_cost_usd_total", "counter", "Estimated cost in USD", "cost"),
+        ]
+        agents = self.by_agent()
+        lines = []
+
+        def labels(agent: str, stats: Dict[str, Any]) -> str:
+            return (f'agent="{prometheus_label(agent)}",provider="{prometheus_label(stats["provider"])}",'
+                    f'model="{prometheus_label(stats["model"])}"')
+
+        for name, kind, help_text, key in series:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            lines += [f"{name}{{{labels(agent, stats)}}} {stats[key]}" for agent, stats in agents.items()]
+        for name, help_text, total, count in (
+                ("mcp_agent_latency_seconds", "Model call latency", "latency_total", "calls"),
+                ("mcp_agent_ttft_seconds", "Time to first streamed token", "ttft_total", "ttft_count")):
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} summary"]
+            for agent, stats in agents.items():
+                lines.append(f"{name}_sum{{{labels(agent, stats)}}} {stats[total]}")
+                lines.append(f"{name}_count{{{labels(agent, stats)}}} {stats[count]}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str):
+        """Write to_prometheus() atomically, e.g. for node_exporter's textfile collector"""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        os.replace(tmp_path, path)
@@ -5,44 +5,191 @@
 @time: 4/25/25 15:12
 """
 # orchestrator.py
+import asyncio
 import json
 import time
-from typing import Dict, List, Any
+from typing import Callable, Dict, List, Any, Optional, Sequence, Tuple
 from mcp.protocol import MCPMessage
+from mcp.store import MessageStore, MessageView
+from mcp.transcript import TranscriptWriter
+from mcp.tracing import span
+from mcp.checkpoint import CheckpointState, WorkflowCheckpoint, HISTORY_VIEW
 from agents.base import BaseAgent
+from agents.policy import AgentCallError
+from convergence import ConvergencePolicy
+from speculation import SpeculationPolicy
+from metrics import MetricsCollector
+
+# System prompts of the default researcher and synthesizer agents
+RESEARCHER_PROMPT = """You are ResearchBot, an AI research assistant.
+Your role is to find and provide comprehensive information on given topics.
+Focus on gathering facts, citing sources when possible, and covering different perspectives.
+Organize information clearly and identify any gaps in knowledge.
+"""
+
+SYNTHESIZER_PROMPT = """You are SynthBot, an AI synthesis and critique specialist.
+Your role is to analyze information provided by a researcher, extract key insights,
+identify patterns, evaluate the quality of information, highlight limitations,
+and suggest areas for further investigation.
+Be critical but constructive, and always strive for objectivity.
+"""
+
+SYNTH_PROMPT = "Based on the research provided, please synthesize the key points and provide a critical analysis."
+FOLLOWUP_PROMPT = "Consider the synthesis and critique above. Please investigate further on any gaps or areas that need more explanation."
+SUB_QUERY_PROMPT = "As part of researching \"{query}\", investigate this sub-question:\n{sub_query}"
+SPECULATE_PROMPT = "Without waiting for a critique, continue investigating the most important gaps and open questions in your research so far."
+FANOUT_SYNTH_PROMPT = "Several researchers investigated parts of the question \"{query}\" in parallel. Based on all of their research provided, please synthesize the key points across the parts and provide a critical analysis."
 
 
 class Orchestrator:
     """Manages communication flow between agents"""
 
-    def __init__(self, agents: List[BaseAgent]):
+    def __init__(self, agents: List[BaseAgent], verbose: bool = True,
+                 transcript: Optional[TranscriptWriter] = None,
+                 checkpoint: Optional[WorkflowCheckpoint] = None,
+                 convergence: Optional[ConvergencePolicy] = None,
+                 on_message: Optional[Callable[[MCPMessage, str], None]] = None,
+                 seed: Optional[MCPMessage] = None,
+                 speculation: Optional[SpeculationPolicy] = None):
         self.agents = {agent.agent_id: agent for agent in agents}
-        self.conversation_history: List[MCPMessage] = []
+        # One store holds every message; the history and each agent's context are views into it
+        self.store = MessageStore()
+        for agent in agents:
+            agent.attach_store(self.store)
+        self.conversation_history: MessageView = self.store.view()
+        # Optional sink that gets every recorded message as it happens
+        self.transcript = transcript
+        # Optional callback with every recorded message and its agent's name, e.g. to stream progress
+        self.on_message = on_message
+        # Decides which speculative research the pipelined workflow keeps, and counts hits and time saved
+        self.speculation = speculation or SpeculationPolicy()
+        # Optional message (e.g. an earlier synthesis of a similar query) given to every agent after the query
+        self.seed = seed
+        # Optional log the workflow state is appended to after every step
+        self.checkpoint = checkpoint
+        # Optional policy that ends the turn loop once syntheses stop changing
+        self.convergence = convergence
+        # Number of completed workflow steps: 1 for the initial query, then one
+        # per agent response. A restored workflow skips the steps it already has.
+        self._step = 0
+        self.verbose = verbose
+        # Set while a workflow streams its output, see run_workflow
+        self._on_chunk: Optional[Callable[[BaseAgent, str], None]] = None
+        # Set when an agent call fails for good and the workflow stops early
+        self.last_error: Optional[AgentCallError] = None
+        # Latency, token and cost metrics of every generated message, and the turn being run
+        self.metrics = MetricsCollector()
+        self._turn: Optional[int] = None
+        self._max_turns: Optional[int] = None
+
+    def _log(self, text: str):
+        """Print progress output unless running quietly (e.g. in a batch)"""
+        if self.verbose:
+            print(text)
 
     def _record_message(self, message: MCPMessage):
         """Add message to conversation history"""
         self.conversation_history.append(message)
+        self.metrics.observe(message, self._agent_name(message), self._turn)
+        if self.transcript is not None:
+            self.transcript.write(message, self._agent_name(message))
+        if self.on_message is not None:
+            self.on_message(message, self._agent_name(message))
+
+    def _complete_step(self, step: int, initial_query: str, max_turns: int):
+        """Mark a workflow step done and checkpoint it"""
+        self._step = step
+        if self.checkpoint is not None:
+            self.checkpoint.record(self, step, initial_query, max_turns)
+
+    def _stop_on_error(self, error: AgentCallError):
+        """End the workflow after a failed agent call instead of passing the failure on as content"""
+        self.last_error = error
+        self._log(f"\nWorkflow stopped after step {self._step}: {type(error).__name__}: {error}")
+
+    def _previous_synthesis(self, synthesizer: BaseAgent) -> Optional[MCPMessage]:
+        """The synthesizer's latest response in the conversation history"""
+        return self._latest_response(synthesizer)
+
+    def _latest_response(self, agent: BaseAgent) -> Optional[MCPMessage]:
+        for message in reversed(self.conversation_history):
+            if message.agent_id == agent.agent_id and message.role == "assistant":
+                return message
+        return None
+
+    def _converged(self, synthesis_response: MCPMessage, synthesizer: BaseAgent, turn: int) -> bool:
+        """Score a new synthesis against the previous one; True if no further turns are needed"""
+        if self.convergence is None:
+            return False
+        stop = self.convergence.check(synthesis_response, self._previous_synthesis(synthesizer), turn)
+        if stop:
+            scores = synthesis_response.metadata["convergence"]
+            self._log(f"\n[Converged after turn {turn + 1}: similarity {scores['similarity']}, "
+                      f"no-gaps signal {scores['no_gaps_signal']}]")
+        return stop
+
+    def _stopped_early(self, synthesizer: BaseAgent) -> bool:
+        """Whether a restored workflow had already converged"""
+        return self.convergence is not None and ConvergencePolicy.stopped_after(self._previous_synthesis(synthesizer))
+
+    def restore(self, state: CheckpointState):
+        """Load conversation state from a checkpoint so the workflow resumes after its last step"""
+        if set(state.agent_ids) != set(self.agents):
+            raise ValueError(f"Checkpoint agents {state.agent_ids} don't match {list(self.agents)}")
+        self.store, views = state.build_store()
+        self.conversation_history = views[HISTORY_VIEW]
+        for agent_id, agent in self.agents.items():
+            agent.restore_messages(views[agent_id])
+        self._step = state.step
+        if self.checkpoint is not None:
+            self.checkpoint.resume(state)
+        self._log(f"Resuming workflow after step {state.step} ({len(self.store)} messages restored)")
+
+    def get_message(self, message_id: str) -> Optional[MCPMessage]:
+        """Look up any message seen in this workflow by id"""
+        return self.store.get(message_id)
+
+    def resolve_references(self, message: MCPMessage) -> List[MCPMessage]:
+        """Messages referenced by message"""
+        return self.store.references(message)
 
     def send_message(self, from_agent_id: str, to_agent_id: str, message: MCPMessage):
         """Send message from one agent to another"""
-        # Record the message
-        self._record_message(message)
+        with span("orchestrator.send_message", from_agent=from_agent_id, agent_id=to_agent_id,
+                  message_id=message.message_id):
+            # Record the message
+            self._record_message(message)
 
-        # Add message to receiving agent's context
-        to_agent = self.agents[to_agent_id]
-        to_agent.add_message(message)
+            # Add message to receiving agent's context
+            to_agent = self.agents[to_agent_id]
+            to_agent.add_message(message)
 
-    def run_workflow(self, initial_query: str, max_turns: int = 3) -> List[Dict[str, Any]]:
-        """Run the multi-agent workflow for a set number of turns"""
-        print(f"Starting workflow with query: {initial_query}")
+    def _chunk_handler(self, agent: BaseAgent) -> Optional[Callable[[str], None]]:
+        """Bind the workflow's chunk callback to the agent that is generating"""
+        if self._on_chunk is None:
+            return None
+        on_chunk = self._on_chunk
+        return lambda chunk: on_chunk(agent, chunk)
 
+    def _seed_agents(self, agents: Optional[Sequence[BaseAgent]] = None):
+        """Record the seed message and hand it to agents (default: all), right after the initial query"""
+        if self.seed is not None:
+            self._broadcast(self.seed, list(self.agents.values()) if agents is None else agents)
+            self._log(f"[Seeded with {self.seed.metadata.get('type', 'message')} "
+                      f"from {self.seed.metadata.get('source', 'the caller')}]")
+
+    def _workflow_roles(self):
+        """Return (researcher, synthesizer) for the two-agent workflow"""
         # Get agent IDs for convenience
         agent_ids = list(self.agents.keys())
-        researcher_id = agent_ids[0]
-        synthesizer_id = agent_ids[1]
+        return self.agents[agent_ids[0]], self.agents[agent_ids[1]]
+
+    def _start_workflow(self, initial_query: str):
+        """Hand the initial query to the researcher"""
+        self._log(f"Starting workflow with query: {initial_query}")
+        researcher, _ = self._workflow_roles()
 
         # Start with initial query to researcher
-        researcher = self.agents[researcher_id]
         user_msg = MCPMessage(
             role="user",
             content=initial_query,
@@ -51,93 +198,516 @@ class Orchestrator:
         researcher.add_message(user_msg)
         self._record_message(user_msg)
 
-        print(f"\n[Human → {researcher.name}]: {initial_query}")
+        self._log(f"\n[Human → {researcher.name}]: {initial_query}")
+        self._seed_agents()
+
+    def _instruction_metadata(self) -> Dict[str, Any]:
+        """Metadata of a synthesis instruction; the last scheduled turn's is marked final (see agents/routing.py)"""
+        if self._turn is not None and self._turn == self._max_turns:
+            return {"type": "instruction", "final": True}
+        return {"type": "instruction"}
+
+    def _after_research(self, research_response: MCPMessage):
+        """Send researcher's response to synthesizer along with its instruction"""
+        researcher, synthesizer = self._workflow_roles()
+        if self._on_chunk is None:
+            self._log(f"[{researcher.name}]: {research_response.content[:150]}...")
+        self.send_message(researcher.agent_id, synthesizer.agent_id, research_response)
+
+        # Create prompt for synthesizer
+        synth_msg = MCPMessage(
+            role="user",
+            content=SYNTH_PROMPT,
+            agent_id="orchestrator",
+            references=[research_response.message_id],
+            metadata=self._instruction_metadata()
+        )
+        synthesizer.add_message(synth_msg)
+        self._record_message(synth_msg)
+
+    def _after_synthesis(self, synthesis_response: MCPMessage, turn: int, max_turns: int):
+        """Send synthesizer's response back to researcher for next turn"""
+        researcher, synthesizer = self._workflow_roles()
+        if self._on_chunk is None:
+            self._log(f"[{synthesizer.name}]: {synthesis_response.content[:150]}...")
+        self.send_message(synthesizer.agent_id, researcher.agent_id, synthesis_response)
+
+        # Update query for researcher's next turn
+        if turn < max_turns - 1:
+            followup_msg = MCPMessage(
+                role="user",
+                content=FOLLOWUP_PROMPT,
+                agent_id="orchestrator",
+                references=[synthesis_response.message_id],
+                metadata={"type": "instruction"}
+            )
+            researcher.add_message(followup_msg)
+            self._record_message(followup_msg)
+
+    def run_workflow(
+            self,
+            initial_query: str,
+            max_turns: int = 3,
+            on_chunk: Optional[Callable[[BaseAgent, str], None]] = None
+    ) -> List[Dict[str, Any]]:
+        """Run the multi-agent workflow for a set number of turns.
+
+        If on_chunk is given, agent responses are streamed and on_chunk is
+        called with (agent, chunk) for every content chunk as it arrives.
+        """
+        with span("workflow", mode="sequential", query=initial_query, max_turns=max_turns):
+            self._on_chunk = on_chunk
+            self._max_turns = max_turns
+            if self._step < 1:
+                self._start_workflow(initial_query)
+                self._complete_step(1, initial_query, max_turns)
+            researcher, synthesizer = self._workflow_roles()
+
+            # Run the workflow for specified turns; a failed call ends it early and
+            # leaves the completed steps in place (and in the checkpoint) for a resume
+            try:
+                for turn in range(max_turns):
+                    research_step, synthesis_step = 2 * turn + 2, 2 * turn + 3
+                    if self._step >= synthesis_step:
+                        continue  # restored from a checkpoint
+                    if self._stopped_early(synthesizer):
+                        break
+                    with span("workflow.turn", turn=turn + 1):
+                        self._turn = turn + 1
+                        self._log(f"\n--- Turn {turn + 1} ---")
+
+                        # Researcher agent generates response
+                        if self._step < research_step:
+                            self._log(f"\n[{researcher.name} thinking...]")
+                            research_response = researcher.generate_response(on_chunk=self._chunk_handler(researcher))
+                            self._after_research(research_response)
+                            self._complete_step(research_step, initial_query, max_turns)
+
+                        # Synthesizer generates response
+                        self._log(f"\n[{synthesizer.name} thinking...]")
+                        synthesis_response = synthesizer.generate_response(on_chunk=self._chunk_handler(synthesizer))
+                        converged = self._converged(synthesis_response, synthesizer, turn)
+                        # A converged turn is the last one, so no follow-up instruction is sent
+                        self._after_synthesis(synthesis_response, turn, turn + 1 if converged else max_turns)
+                        self._complete_step(synthesis_step, initial_query, max_turns)
+                        if converged:
+                            break
+            except AgentCallError as e:
+                self._stop_on_error(e)
+
+            return self.format_history()
+
+    async def arun_workflow(
+            self,
+            initial_query: str,
+            max_turns: int = 3,
+            on_chunk: Optional[Callable[[BaseAgent, str], None]] = None
+    ) -> List[Dict[str, Any]]:
+        """Async version of run_workflow; agent calls don't block the event loop"""
+        with span("workflow", mode="sequential", query=initial_query, max_turns=max_turns):
+            self._on_chunk = on_chunk
+            self._max_turns = max_turns
+            if self._step < 1:
+                self._start_workflow(initial_query)
+                self._complete_step(1, initial_query, max_turns)
+            researcher, synthesizer = self._workflow_roles()
+
+            try:
+                for turn in range(max_turns):
+                    research_step, synthesis_step = 2 * turn + 2, 2 * turn + 3
+                    if self._step >= synthesis_step:
+                        continue
+                    if self._stopped_early(synthesizer):
+                        break
+                    with span("workflow.turn", turn=turn + 1):
+                        self._turn = turn + 1
+                        self._log(f"\n--- Turn {turn + 1} ---")
+
+                        if self._step < research_step:
+                            self._log(f"\n[{researcher.name} thinking...]")
+                            research_response = await researcher.agenerate_response(
+                                on_chunk=self._chunk_handler(researcher)
+                            )
+                            self._after_research(research_response)
+                            self._complete_step(research_step, initial_query, max_turns)
+
+                        self._log(f"\n[{synthesizer.name} thinking...]")
+                        synthesis_response = await synthesizer.agenerate_response(
+                            on_chunk=self._chunk_handler(synthesizer)
+                        )
+                        converged = self._converged(synthesis_response, synthesizer, turn)
+                        self._after_synthesis(synthesis_response, turn, turn + 1 if converged else max_turns)
+                        self._complete_step(synthesis_step, initial_query, max_turns)
+                        if converged:
+                            break
+            except AgentCallError as e:
+                self._stop_on_error(e)
+
+            return self.format_history()
+
+    def _speculate(self, researcher: BaseAgent, research: MCPMessage) -> Tuple[MCPMessage, asyncio.Task, float]:
+        """Start the researcher's next turn on a fork of its context; returns (prompt, task, start time)"""
+        prompt_msg = MCPMessage(
+            role="user",
+            content=SPECULATE_PROMPT,
+            agent_id="orchestrator",
+            references=[research.message_id],
+            metadata={"type": "speculative_instruction"}
+        )
+        fork = researcher.fork()
+        fork.add_message(prompt_msg)
+        self.speculation.launched += 1
+        self._log(f"[{researcher.name} speculatively researching the next turn]")
+        return prompt_msg, asyncio.ensure_future(fork.agenerate_response()), time.perf_counter()
+
+    async def _reconcile(self, speculation: Tuple[MCPMessage, asyncio.Task, float], synthesis: MCPMessage,
+                         converged: bool) -> Optional[MCPMessage]:
+        """Keep or discard speculative research once the synthesis is in; returns it if kept"""
+        _, task, started = speculation
+        synthesized = time.perf_counter()
+        if converged and not task.done():
+            # No further turn: stop paying for research nobody will read
+            task.cancel()
+            self.speculation.cancel()
+            return None
+        try:
+            response = await task
+        except AgentCallError as e:
+            self.speculation.cancel()
+            self._log(f"[Speculative research failed: {e}]")
+            return None
+        if converged:
+            self.speculation.cancel(response)
+            self._log("[Speculation not needed after convergence]")
+        else:
+            finished = started + response.metadata["metrics"]["latency"] if "metrics" in response.metadata \
+                else synthesized
+            if self.speculation.check(response, synthesis, max(0.0, min(finished, synthesized) - started)):
+                scores = response.metadata["speculation"]
+                self._log(f"[Speculation kept: covers {scores['coverage']:.0%} of the synthesis's gaps, "
+                          f"saved {scores['time_saved']:.2f}s]")
+                return response
+            self._log(f"[Speculation discarded: covers only {response.metadata['speculation']['coverage']:.0%} "
+                      f"of the synthesis's gaps]")
+        # Not part of the conversation, but it was paid for
+        self.metrics.observe(response, self._agent_name(response), (self._turn or 0) + 1)
+        return None
+
+    async def arun_pipelined_workflow(
+            self,
+            initial_query: str,
+            max_turns: int = 3,
+            on_chunk: Optional[Callable[[BaseAgent, str], None]] = None
+    ) -> List[Dict[str, Any]]:
+        """Like arun_workflow, but the researcher's next turn overlaps the synthesis of the current one.
+
+        While the synthesizer works on turn N, the researcher starts turn N+1
+        on a fork of its context, from the gaps it already sees
+        (SPECULATE_PROMPT). When the synthesis arrives, self.speculation
+        decides: kept research joins the conversation as turn N+1 (after the
+        speculative instruction it answers, so references stay correct) and
+        goes straight to the synthesizer; discarded research never reaches
+        the history or any agent, and the researcher answers the synthesis as
+        usual. Only the synthesizer streams to on_chunk while both run.
+        """
+        with span("workflow", mode="pipelined", query=initial_query, max_turns=max_turns):
+            self._on_chunk = on_chunk
+            self._max_turns = max_turns
+            if self._step < 1:
+                self._start_workflow(initial_query)
+                self._complete_step(1, initial_query, max_turns)
+            researcher, synthesizer = self._workflow_roles()
+
+            try:
+                for turn in range(max_turns):
+                    research_step, synthesis_step = 2 * turn + 2, 2 * turn + 3
+                    if self._step >= synthesis_step:
+                        continue
+                    if self._stopped_early(synthesizer):
+                        break
+                    with span("workflow.turn", turn=turn + 1):
+                        self._turn = turn + 1
+                        self._log(f"\n--- Turn {turn + 1} ---")
+
+                        if self._step < research_step:
+                            self._log(f"\n[{researcher.name} thinking...]")
+                            research_response = await researcher.agenerate_response(
+                                on_chunk=self._chunk_handler(researcher)
+                            )
+                            self._after_research(research_response)
+                            self._complete_step(research_step, initial_query, max_turns)
+
+                        self._log(f"\n[{synthesizer.name} thinking...]")
+                        synthesis_task = asyncio.ensure_future(synthesizer.agenerate_response(
+                            on_chunk=self._chunk_handler(synthesizer)
+                        ))
+                        speculation = None
+                        if turn + 1 < max_turns:
+                            speculation = self._speculate(researcher, self._latest_response(researcher))
+                        try:
+                            synthesis_response = await synthesis_task
+                        except BaseException:
+                            if speculation is not None:
+                                speculation[1].cancel()
+                            raise
+                        converged = self._converged(synthesis_response, synthesizer, turn)
+                        kept = await self._reconcile(speculation, synthesis_response, converged) \
+                            if speculation is not None else None
+                        # Kept research already answers the synthesis, so there is no follow-up instruction
+                        self._after_synthesis(synthesis_response, turn,
+                                              turn + 1 if converged or kept is not None else max_turns)
+                        self._complete_step(synthesis_step, initial_query, max_turns)
+                        if converged:
+                            break
+
+                        if kept is not None:
+                            self._broadcast(speculation[0], [researcher])
+                            researcher.add_message(kept)
+                            # Kept research opens the next turn
+                            self._turn = turn + 2
+                            kept.metadata["metrics"]["turn"] = turn + 2
+                            self._after_research(kept)
+                            self._complete_step(research_step + 2, initial_query, max_turns)
+            except AgentCallError as e:
+                self._stop_on_error(e)
+
+            return self.format_history()
+
+    def _fanout_roles(self):
+        """Return (researchers, synthesizer) for the fan-out workflow: the last agent synthesizes"""
+        agents = list(self.agents.values())
+        if len(agents) < 2:
+            raise ValueError("The fan-out workflow needs at least one researcher and a synthesizer")
+        return agents[:-1], agents[-1]
+
+    def _broadcast(self, message: MCPMessage, agents: Sequence[BaseAgent]):
+        """Record message once and add it to the context of every agent in agents"""
+        self._record_message(message)
+        for agent in agents:
+            agent.add_message(message)
+
+    def _start_fanout(self, initial_query: str, sub_queries: Sequence[str]):
+        """Record the query and hand each researcher its sub-question"""
+        self._log(f"Starting fan-out workflow with query: {initial_query}")
+        researchers, _ = self._fanout_roles()
+        user_msg = MCPMessage(role="user", content=initial_query, agent_id="human")
+        self._record_message(user_msg)
+
+        for researcher, sub_query in zip(researchers, sub_queries):
+            if sub_query == initial_query:
+                researcher.add_message(user_msg)
+                continue
+            sub_msg = MCPMessage(
+                role="user",
+                content=SUB_QUERY_PROMPT.format(query=initial_query, sub_query=sub_query),
+                agent_id="orchestrator",
+                references=[user_msg.message_id],
+                metadata={"type": "sub_query"}
+            )
+            self._broadcast(sub_msg, [researcher])
+            self._log(f"\n[Orchestrator → {researcher.name}]: {sub_query}")
+        # After the questions, as in _start_workflow
+        self._seed_agents()
 
-        # Run the workflow for specified turns
-        for turn in range(max_turns):
-            print(f"\n--- Turn {turn + 1} ---")
+    async def _research_branch(self, researcher: BaseAgent) -> MCPMessage:
+        """One fan-out branch: a researcher answering its sub-question"""
+        with span("workflow.branch", agent_id=researcher.agent_id):
+            started = time.perf_counter()
+            response = await researcher.agenerate_response()
+        self._log(f"[{researcher.name} done in {time.perf_counter() - started:.1f}s]: {response.content[:150]}...")
+        return response
 
-            # Researcher agent generates response
-            print(f"\n[{researcher.name} thinking...]")
-            research_response = researcher.generate_response()
-            print(f"[{researcher.name}]: {research_response.content[:150]}...")
+    async def _fan_out(self, researchers: Sequence[BaseAgent]) -> List[MCPMessage]:
+        """Run every research branch at once; wall-clock is that of the slowest branch"""
+        results = await asyncio.gather(
+            *(self._research_branch(researcher) for researcher in researchers), return_exceptions=True
+        )
+        # Let every branch finish before failing, so no call is left running
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+        return results
 
-            # Send researcher's response to synthesizer
-            synthesizer = self.agents[synthesizer_id]
-            self.send_message(researcher_id, synthesizer_id, research_response)
+    def _after_fanout(self, research_responses: Sequence[MCPMessage], initial_query: str):
+        """Fan in: pass all research to the synthesizer with an instruction referencing each result"""
+        _, synthesizer = self._fanout_roles()
+        for response in research_responses:
+            self.send_message(response.agent_id, synthesizer.agent_id, response)
 
-            # Create prompt for synthesizer
-            synth_prompt = f"Based on the research provided, please synthesize the key points and provide a critical analysis."
-            synth_msg = MCPMessage(
+        synth_msg = MCPMessage(
+            role="user",
+            content=FANOUT_SYNTH_PROMPT.format(query=initial_query),
+            agent_id="orchestrator",
+            references=[response.message_id for response in research_responses],
+            metadata=self._instruction_metadata()
+        )
+        synthesizer.add_message(synth_msg)
+        self._record_message(synth_msg)
+
+    def _after_fanout_synthesis(self, synthesis_response: MCPMessage, turn: int, max_turns: int):
+        """Send the synthesis back to every researcher for the next turn"""
+        researchers, synthesizer = self._fanout_roles()
+        if self._on_chunk is None:
+            self._log(f"[{synthesizer.name}]: {synthesis_response.content[:150]}...")
+        self._broadcast(synthesis_response, researchers)
+
+        if turn < max_turns - 1:
+            followup_msg = MCPMessage(
                 role="user",
-                content=synth_prompt,
+                content=FOLLOWUP_PROMPT,
                 agent_id="orchestrator",
-                references=[research_response.message_id],
+                references=[synthesis_response.message_id],
                 metadata={"type": "instruction"}
             )
-            synthesizer.add_message(synth_msg)
-            self._record_message(synth_msg)
-
-            # Synthesizer generates response
-            print(f"\n[{synthesizer.name} thinking...]")
-            synthesis_response = synthesizer.generate_response()
-            print(f"[{synthesizer.name}]: {synthesis_response.content[:150]}...")
-
-            # Send synthesizer's response back to researcher for next turn
-            self.send_message(synthesizer_id, researcher_id, synthesis_response)
-
-            # Update query for researcher's next turn
-            if turn < max_turns - 1:
-                followup_prompt = f"Consider the synthesis and critique above. Please investigate further on any gaps or areas that need more explanation."
-                followup_msg = MCPMessage(
-                    role="user",
-                    content=followup_prompt,
-                    agent_id="orchestrator",
-                    references=[synthesis_response.message_id],
-                    metadata={"type": "instruction"}
-                )
-                researcher.add_message(followup_msg)
-                self._record_message(followup_msg)
-
-        # Convert conversation history to simplified format for return
+            self._broadcast(followup_msg, researchers)
+
+    async def arun_fanout_workflow(
+            self,
+            initial_query: str,
+            sub_queries: Optional[Sequence[str]] = None,
+            max_turns: int = 1,
+            on_chunk: Optional[Callable[[BaseAgent, str], None]] = None
+    ) -> List[Dict[str, Any]]:
+        """Fan-out/fan-in workflow: researchers work in parallel, then one synthesis.
+
+        All agents but the last are researchers, each taking the sub-query at
+        the same position (or the full query when sub_queries is None); the
+        last agent synthesizes all of their results. Later turns send the
+        synthesis back to every researcher. Only the synthesis is streamed to
+        on_chunk, since parallel branches would interleave. Steps are numbered
+        as in run_workflow, so checkpoints resume the same way; a fan-out that
+        was interrupted is repeated as a whole.
+        """
+        with span("workflow", mode="fanout", query=initial_query, max_turns=max_turns):
+            researchers, synthesizer = self._fanout_roles()
+            sub_queries = list(sub_queries) if sub_queries else [initial_query] * len(researchers)
+            if len(sub_queries) != len(researchers):
+                raise ValueError(f"Got {len(sub_queries)} sub-queries for {len(researchers)} researchers")
+
+            self._on_chunk = on_chunk
+            self._max_turns = max_turns
+            if self._step < 1:
+                self._start_fanout(initial_query, sub_queries)
+                self._complete_step(1, initial_query, max_turns)
+
+            try:
+                for turn in range(max_turns):
+                    research_step, synthesis_step = 2 * turn + 2, 2 * turn + 3
+                    if self._step >= synthesis_step:
+                        continue
+                    if self._stopped_early(synthesizer):
+                        break
+                    with span("workflow.turn", turn=turn + 1):
+                        self._turn = turn + 1
+                        self._log(f"\n--- Turn {turn + 1} ---")
+
+                        if self._step < research_step:
+                            self._log(f"\n[{len(researchers)} researchers thinking in parallel...]")
+                            research_responses = await self._fan_out(researchers)
+                            self._after_fanout(research_responses, initial_query)
+                            self._complete_step(research_step, initial_query, max_turns)
+
+                        self._log(f"\n[{synthesizer.name} thinking...]")
+                        synthesis_response = await synthesizer.agenerate_response(
+                            on_chunk=self._chunk_handler(synthesizer)
+                        )
+                        converged = self._converged(synthesis_response, synthesizer, turn)
+                        self._after_fanout_synthesis(synthesis_response, turn, turn + 1 if converged else max_turns)
+                        self._complete_step(synthesis_step, initial_query, max_turns)
+                        if converged:
+                            break
+            except AgentCallError as e:
+                self._stop_on_error(e)
+
+            return self.format_history()
+
+    def _agent_name(self, msg: MCPMessage) -> str:
+        """Display name for the author of a message"""
+        if msg.agent_id in self.agents:
+            return self.agents[msg.agent_id].name
+        elif msg.agent_id == "orchestrator":
+            return "Orchestrator"
+        return "Human"
+
+    def format_history(self) -> List[Dict[str, Any]]:
+        """Convert conversation history to simplified format for return"""
         formatted_history = []
         for msg in self.conversation_history:
-            agent_name = "Human"
-            if msg.agent_id in self.agents:
-                agent_name = self.agents[msg.agent_id].name
-            elif msg.agent_id == "orchestrator":
-                agent_name = "Orchestrator"
-
             formatted_history.append({
-                "agent": agent_name,
+                "agent": self._agent_name(msg),
                 "role": msg.role,
                 "content": msg.content,
                 "message_id": msg.message_id,
-                "references": msg.references
+                "references": list(msg.references)
             })
 
         return formatted_history
 
+    def write_metrics_summary(self):
+        """Append the aggregated metrics to the streaming transcript, if there is one"""
+        if self.transcript is not None:
+            summary = self.metrics.summary()
+            if self.speculation.launched:
+                summary["speculation"] = self.speculation.summary()
+            self.transcript.write_record({"type": "metrics", **summary})
+
     def save_transcript(self, filename: str = "mcp_transcript.json"):
         """Save the conversation transcript to a file"""
         formatted_history = []
         for msg in self.conversation_history:
-            agent_name = "Human"
-            if msg.agent_id in self.agents:
-                agent_name = self.agents[msg.agent_id].name
-            elif msg.agent_id == "orchestrator":
-                agent_name = "Orchestrator"
-
             formatted_history.append({
-                "agent": agent_name,
+                "agent": self._agent_name(msg),
                 "role": msg.role,
                 "content": msg.content,
                 "message_id": msg.message_id,
-                "references": msg.references,
+                "references": list(msg.references),
                 "timestamp": msg.timestamp
             })
+            metrics = msg.get_metadata("metrics")
+            if metrics is not None:
+                formatted_history[-1]["metrics"] = metrics
 
         with open(filename, "w") as f:
             json.dump(formatted_history, f, indent=2)
 
-        print(f"Transcript saved to {filename}")
\ No newline at end of file
+        self._log(f"Transcript saved to {filename}")
+
+
+async def run_workflows_concurrently(
+        queries: Sequence[str],
+        agent_factory: Callable[[], List[BaseAgent]],
+        max_turns: int = 3,
+        max_concurrency: int = 4,
+        verbose: bool = False,
+        transcript_factory: Optional[Callable[[int], Optional[TranscriptWriter]]] = None,
+        convergence_factory: Optional[Callable[[], Optional[ConvergencePolicy]]] = None
+) -> List[Orchestrator]:
+    """Run independent researcher/synthesizer pipelines, at most max_concurrency at a time.
+
+    agent_factory must return fresh agents on every call since agents keep
+    per-conversation state. transcript_factory, if given, is called with the
+    query's index and may return a TranscriptWriter for that pipeline, which
+    is closed when it finishes. convergence_factory, if given, returns a
+    fresh ConvergencePolicy per pipeline. Orchestrators are returned in the
+    order of queries.
+    """
+    semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+    async def run_one(index: int, query: str) -> Orchestrator:
+        async with semaphore:
+            transcript = transcript_factory(index) if transcript_factory else None
+            convergence = convergence_factory() if convergence_factory else None
+            orchestrator = Orchestrator(agent_factory(), verbose=verbose, transcript=transcript,
+                                        convergence=convergence)
+            started = time.perf_counter()
+            try:
+                await orchestrator.arun_workflow(query, max_turns=max_turns)
+            finally:
+                if transcript is not None:
+                    orchestrator.write_metrics_summary()
+                    transcript.close()
+            status = "failed" if orchestrator.last_error else "finished"
+            print(f"[{index + 1}/{len(queries)}] {status} in {time.perf_counter() - started:.1f}s: {query[:60]}")
+            return orchestrator
+
+    return await asyncio.gather(*(run_one(i, q) for i, q in enumerate(queries)))
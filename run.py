@@ -7,78 +7,117 @@
 # run.py
 import os
 import argparse
+import asyncio
+import functools
+import json
+from typing import Dict, List, Optional, Sequence, Tuple
 from dotenv import load_dotenv
-from agents.openai_agent import OpenAIAgent
-from agents.groq_agent import GroqAgent
 from agents.base import BaseAgent
-from orchestrator import Orchestrator
+from agents.cache import ResponseCache
+from agents.context import ContextWindow, STRATEGIES
+from agents.clients import PoolConfig, configure_pool
+from agents.policy import CallPolicy, configure_policy
+from agents.registry import PROVIDERS, get_provider
+from agents.replay_agent import ReplayAgent, ReplaySource
+from agents.routing import QualityCheck, RoutedAgent, RoutingPolicy, STEPS
+from mcp.protocol import MCPMessage
+from mcp.transcript import TranscriptWriter, JSONL_SUFFIXES
+from mcp.checkpoint import CheckpointState, WorkflowCheckpoint
+from mcp.tracing import enable_tracing
+from orchestrator import Orchestrator, run_workflows_concurrently, RESEARCHER_PROMPT, SYNTHESIZER_PROMPT
+from convergence import ConvergencePolicy
+from speculation import SpeculationPolicy
+from metrics import MetricsCollector
+from batch import ResultShards, load_jobs, run_batch_jobs
+from server import ResearchServer
+from transcript_index import TranscriptIndex, seed_message
+from workflow import WorkflowGraph, WorkflowRunner, NodeCache, default_workflow, load_workflow
 
+DEFAULT_MODELS = {name: provider.default_model for name, provider in PROVIDERS.items()}
 
-def create_agent(agent_type: str, agent_id: str, name: str, role: str, model: str, system_prompt: str) -> BaseAgent:
-    """Create an agent based on the specified type"""
-    if agent_type.lower() == "openai":
-        api_key = os.environ.get("OPENAI_API_KEY")
-        base_url = os.environ.get("LITELLM_BASE_URL")
 
-        if not api_key:
-            raise ValueError("OPENAI_API_KEY environment variable is required")
+def create_agent(agent_type: str, agent_id: str, name: str, role: str, model: str, system_prompt: str,
+                 cache: Optional[ResponseCache] = None,
+                 context_window: Optional[ContextWindow] = None,
+                 replay: Optional[ReplaySource] = None,
+                 cascade: Sequence[str] = (),
+                 routing: Optional[RoutingPolicy] = None) -> BaseAgent:
+    """Create an agent based on the specified type, or one replaying its responses from a transcript.
 
-        return OpenAIAgent(
-            agent_id=agent_id,
-            name=name,
-            role=role,
-            api_key=api_key,
-            model=model,
-            base_url=base_url,
-            system_prompt=system_prompt
-        )
-    elif agent_type.lower() == "groq":
-        api_key = os.environ.get("GROQ_API_KEY")
-        if not api_key:
-            raise ValueError("GROQ_API_KEY environment variable is required")
-        return GroqAgent(
-            agent_id=agent_id,
-            name=name,
-            role=role,
-            api_key=api_key,
-            model=model,
-            system_prompt=system_prompt
-        )
-    else:
-        raise ValueError(f"Unsupported agent type: {agent_type}")
+    With cascade ("provider[:model]" specs, cheapest first) the agent routes
+    its calls over those models and falls back to model (see agents/routing.py).
+    """
+    if replay is not None:
+        # Only a replay that goes live after some message needs the real agent (and its API key)
+        live = create_agent(agent_type, agent_id, name, role, model, system_prompt) if replay.live_after else None
+        return ReplayAgent(replay, agent_id, name, role, system_prompt=system_prompt, live=live,
+                           context_window=context_window)
+    if cascade:
+        routes = [create_agent(provider, agent_id, name, role, route_model, system_prompt, cache=cache)
+                  for provider, route_model in map(parse_route, cascade)]
+        routes.append(create_agent(agent_type, agent_id, name, role, model, system_prompt, cache=cache))
+        return RoutedAgent(agent_id, name, role, routes, policy=routing, system_prompt=system_prompt,
+                           context_window=context_window)
+    # Only the chosen provider's module and SDK get imported
+    provider = get_provider(agent_type)
+    api_key = os.environ.get(provider.api_key_env)
+    if not api_key:
+        raise ValueError(f"{provider.api_key_env} environment variable is required")
+    options = {"base_url": os.environ.get(provider.base_url_env)} if provider.base_url_env else {}
+    return provider.load()(
+        agent_id=agent_id,
+        name=name,
+        role=role,
+        api_key=api_key,
+        model=model,
+        system_prompt=system_prompt,
+        cache=cache,
+        context_window=context_window,
+        **options
+    )
 
 
-def main():
-    """Main function to run the MCP multi-agent system"""
-    # Load environment variables
-    load_dotenv()
+def parse_route(spec: str) -> Tuple[str, str]:
+    """(provider, model) of a "provider[:model]" cascade spec"""
+    provider, _, model = spec.partition(":")
+    provider = provider.lower()
+    if provider not in DEFAULT_MODELS:
+        raise ValueError(f"Unsupported agent type: {provider}")
+    return provider, model or DEFAULT_MODELS[provider]
 
-    # Parse command line arguments
-    parser = argparse.ArgumentParser(description="Run MCP Multi-Agent System")
-    parser.add_argument("--query", type=str, required=True, help="Initial research query")
-    parser.add_argument("--turns", type=int, default=3, help="Number of conversation turns")
-    parser.add_argument("--output", type=str, default="mcp_transcript.json", help="Output file for transcript")
-    parser.add_argument("--researcher", type=str, default="groq", choices=["groq", "openai"],
-                        help="Researcher agent type")
-    parser.add_argument("--researcher-model", type=str, help="Model for researcher agent")
-    parser.add_argument("--synthesizer", type=str, default="groq", choices=["groq", "openai"],
-                        help="Synthesizer agent type")
-    parser.add_argument("--synthesizer-model", type=str, help="Model for synthesizer agent")
-    args = parser.parse_args()
 
-    # Set default models based on agent types if not specified
-    if args.researcher_model is None:
-        if args.researcher.lower() == "groq":
-            args.researcher_model = "llama3-70b-8192"
-        else:  # openai
-            args.researcher_model = "gpt-4o"
+def make_routing(args: argparse.Namespace) -> RoutingPolicy:
+    """Routing policy of cascaded agents from --route and --escalate-min-words"""
+    start = {}
+    for spec in args.route or ():
+        step, _, index = spec.partition("=")
+        start[step] = int(index)
+    return RoutingPolicy(start, QualityCheck(min_words=args.escalate_min_words))
 
-    if args.synthesizer_model is None:
-        if args.synthesizer.lower() == "groq":
-            args.synthesizer_model = "llama3-70b-8192"
-        else:  # openai
-            args.synthesizer_model = "gpt-4o"
 
+def make_context_window(args: argparse.Namespace) -> Optional[ContextWindow]:
+    """Context window manager for one agent, or None if disabled"""
+    if args.context_strategy == "none":
+        return None
+    return ContextWindow(strategy=args.context_strategy, max_context_tokens=args.context_tokens,
+                         low_watermark=args.context_low_watermark)
+
+
+@functools.lru_cache(maxsize=None)
+def load_replay(path: str, live_after: Optional[str] = None) -> ReplaySource:
+    """Transcript to replay, loaded once and shared by all agents"""
+    return ReplaySource(path, live_after)
+
+
+def make_replay(args: argparse.Namespace) -> Optional[ReplaySource]:
+    """The --replay transcript, or None when agents call the live models"""
+    if not args.replay:
+        return None
+    return load_replay(args.replay, args.replay_from)
+
+
+def build_agents(args: argparse.Namespace, cache: Optional[ResponseCache] = None) -> List[BaseAgent]:
+    """Create a fresh researcher/synthesizer pair for one research pipeline"""
     # Create researcher agent
     researcher = create_agent(
         agent_type=args.researcher,
@@ -86,34 +125,333 @@ def main():
         name="ResearchBot",
         role="information_gatherer",
         model=args.researcher_model,
-        system_prompt="""You are ResearchBot, an AI research assistant.
-Your role is to find and provide comprehensive information on given topics.
-Focus on gathering facts, citing sources when possible, and covering different perspectives.
-Organize information clearly and identify any gaps in knowledge.
-"""
+        system_prompt=RESEARCHER_PROMPT,
+        cache=cache,
+        context_window=make_context_window(args),
+        replay=make_replay(args),
+        cascade=args.researcher_cascade or (),
+        routing=make_routing(args)
     )
 
     # Create synthesizer agent
-    synthesizer = create_agent(
+    synthesizer = build_synthesizer(args, cache)
+
+    return [researcher, synthesizer]
+
+
+def build_synthesizer(args: argparse.Namespace, cache: Optional[ResponseCache] = None) -> BaseAgent:
+    """Create the synthesizer agent"""
+    return create_agent(
         agent_type=args.synthesizer,
         agent_id="synthesizer_1",
         name="SynthBot",
         role="critic_summarizer",
         model=args.synthesizer_model,
-        system_prompt="""You are SynthBot, an AI synthesis and critique specialist.
-Your role is to analyze information provided by a researcher, extract key insights,
-identify patterns, evaluate the quality of information, highlight limitations,
-and suggest areas for further investigation.
-Be critical but constructive, and always strive for objectivity.
-"""
+        system_prompt=SYNTHESIZER_PROMPT,
+        cache=cache,
+        context_window=make_context_window(args),
+        replay=make_replay(args),
+        cascade=args.synthesizer_cascade or (),
+        routing=make_routing(args)
     )
 
-    # Set up orchestrator
-    orchestrator = Orchestrator([researcher, synthesizer])
+
+def parse_branch(args: argparse.Namespace, index: int):
+    """(provider, model) of fan-out branch index from the cycled --branch specs"""
+    branches = args.branch or [args.researcher]
+    provider, _, model = branches[index % len(branches)].partition(":")
+    provider = provider.lower() or args.researcher
+    if provider not in DEFAULT_MODELS:
+        raise ValueError(f"Unsupported agent type: {provider}")
+    if not model:
+        model = args.researcher_model if provider == args.researcher else DEFAULT_MODELS[provider]
+    return provider, model
+
+
+def build_fanout_agents(args: argparse.Namespace, cache: Optional[ResponseCache] = None) -> List[BaseAgent]:
+    """One researcher per sub-query (cycling over --branch specs), then the synthesizer"""
+    agents = []
+    for index in range(len(args.sub_query)):
+        provider, model = parse_branch(args, index)
+        agents.append(create_agent(
+            agent_type=provider,
+            agent_id=f"researcher_{index + 1}",
+            name=f"ResearchBot {index + 1}",
+            role="information_gatherer",
+            model=model,
+            system_prompt=RESEARCHER_PROMPT,
+            cache=cache,
+            context_window=make_context_window(args),
+            replay=make_replay(args)
+        ))
+    agents.append(build_synthesizer(args, cache))
+    return agents
+
+
+def build_graph(args: argparse.Namespace) -> WorkflowGraph:
+    """The --workflow graph, or the built-in researcher/synthesizer loop"""
+    if args.workflow:
+        return load_workflow(args.workflow)
+    researcher = {"provider": args.researcher, "model": args.researcher_model}
+    synthesizer = {"provider": args.synthesizer, "model": args.synthesizer_model}
+    # Only set when used, since agent settings are part of the workflow state's node hashes
+    if args.researcher_cascade:
+        researcher["cascade"] = args.researcher_cascade
+    if args.synthesizer_cascade:
+        synthesizer["cascade"] = args.synthesizer_cascade
+    return default_workflow(args.turns, researcher=researcher, synthesizer=synthesizer)
+
+
+def build_graph_agents(graph: WorkflowGraph, args: argparse.Namespace,
+                       cache: Optional[ResponseCache] = None) -> List[BaseAgent]:
+    """Create the agents a workflow graph declares; missing providers and models default to --researcher"""
+    agents = []
+    for agent_id, spec in graph.agents.items():
+        provider = spec.get("provider") or args.researcher
+        agents.append(create_agent(
+            agent_type=provider,
+            agent_id=agent_id,
+            name=spec.get("name", agent_id),
+            role=spec.get("role", "assistant"),
+            model=spec.get("model") or (args.researcher_model if provider == args.researcher
+                                        else DEFAULT_MODELS[provider]),
+            system_prompt=spec.get("system_prompt"),
+            cache=cache,
+            context_window=make_context_window(args),
+            replay=make_replay(args),
+            cascade=spec.get("cascade") or (),
+            routing=make_routing(args)
+        ))
+    return agents
+
+
+def main():
+    """Main function to run the MCP multi-agent system"""
+    # Load environment variables
+    load_dotenv()
+
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description="Run MCP Multi-Agent System")
+    parser.add_argument("--query", type=str, action="append",
+                        help="Initial research query (repeat to run several queries concurrently)")
+    parser.add_argument("--sub-query", type=str, action="append",
+                        help="Sub-question of --query for a parallel researcher (repeat for each; enables "
+                             "the fan-out workflow)")
+    parser.add_argument("--branch", type=str, action="append", metavar="PROVIDER[:MODEL]",
+                        help="Provider and model of a fan-out researcher, e.g. openai:gpt-4o "
+                             "(repeat; cycled over the sub-queries, default: --researcher)")
+    parser.add_argument("--workflow", type=str,
+                        help="JSON or YAML workflow graph to run instead of the built-in "
+                             "researcher/synthesizer loop")
+    parser.add_argument("--workflow-state", type=str,
+                        help="File of workflow node results; nodes whose inputs are unchanged since a "
+                             "previous run reuse their result instead of calling the model")
+    parser.add_argument("--batch", type=str, metavar="FILE",
+                        help="Research every query in a JSONL or CSV file (with 'id' and 'query' fields), "
+                             "--concurrency at a time; queries already completed in --batch-output are skipped")
+    parser.add_argument("--batch-output", type=str, default="batch_results",
+                        help="Prefix of the sharded JSONL result files of --batch (default: batch_results)")
+    parser.add_argument("--batch-shard-size", type=int, default=1000,
+                        help="Results per --batch-output shard (default: 1000)")
+    parser.add_argument("--batch-transcripts", type=str, metavar="DIR",
+                        help="With --batch, write one JSONL transcript per query to DIR instead of keeping the "
+                             "messages in the result records")
+    parser.add_argument("--serve", type=str, metavar="[HOST:]PORT",
+                        help="Run as a long-lived HTTP service that researches submitted queries with warm agents "
+                             "and shared connections, --concurrency at a time")
+    parser.add_argument("--tenant-concurrency", type=int, default=2,
+                        help="With --serve, maximum queries of one tenant (X-Tenant header) researched at once")
+    parser.add_argument("--tenant-queue", type=int, default=100,
+                        help="With --serve, queued queries per tenant before further ones are refused with 429")
+    parser.add_argument("--api-keys", type=str, metavar="FILE",
+                        help="With --serve, JSON file mapping API keys to tenant names; /jobs requests then need a "
+                             "key, which decides their tenant")
+    parser.add_argument("--max-tenants", type=int, default=1000,
+                        help="With --serve, tenants that may have jobs queued or running at once (default: 1000)")
+    parser.add_argument("--warm-agents", type=int, default=4,
+                        help="With --serve, agent sets kept built ahead of time (default: 4)")
+    parser.add_argument("--concurrency", type=int, default=4,
+                        help="Maximum number of queries researched at the same time")
+    parser.add_argument("--stream", action="store_true",
+                        help="Print agent responses token by token as they are generated")
+    parser.add_argument("--cache", dest="cache", action="store_true",
+                        help="Reuse stored responses for identical requests instead of calling the API")
+    parser.add_argument("--no-cache", dest="cache", action="store_false",
+                        help="Always call the API (default)")
+    parser.add_argument("--cache-path", type=str, default=".mcp_cache.sqlite",
+                        help="SQLite file backing the response cache")
+    parser.add_argument("--cache-ttl", type=float, default=7 * 24 * 3600,
+                        help="Seconds before a cached response expires")
+    parser.set_defaults(cache=False)
+    parser.add_argument("--context-strategy", type=str, default="truncate", choices=("none",) + STRATEGIES,
+                        help="How to shrink agent history that no longer fits the model's context window")
+    parser.add_argument("--context-tokens", type=int,
+                        help="Override the context window size (tokens) used for budgeting")
+    parser.add_argument("--context-low-watermark", type=float, default=0.8,
+                        help="Fraction of the budget history is shrunk to once it overflows (1.0 = shrink every call)")
+    parser.add_argument("--max-connections", type=int, default=100,
+                        help="Size of the HTTP connection pool shared by all agents of a provider")
+    parser.add_argument("--keepalive-expiry", type=float, default=30.0,
+                        help="Seconds an idle pooled connection is kept open")
+    parser.add_argument("--max-retries", type=int, default=3,
+                        help="Retries of a failed API call (429s, timeouts, 5xx) before the workflow stops")
+    parser.add_argument("--request-timeout", type=float, default=60.0,
+                        help="Seconds before a single API call times out")
+    parser.add_argument("--rate-limit", type=float,
+                        help="Maximum requests per second per provider and model (default: follow the "
+                             "provider's rate-limit headers only)")
+    parser.add_argument("--turns", type=int, help="Number of conversation turns (default: 3)")
+    parser.add_argument("--converge", action="store_true",
+                        help="Stop before --turns when a synthesis mostly repeats the previous one or reports "
+                             "no further gaps")
+    parser.add_argument("--convergence-threshold", type=float, default=0.6,
+                        help="Word-shingle Jaccard similarity between successive syntheses that counts as "
+                             "converged (default: 0.6)")
+    parser.add_argument("--pipeline", action="store_true",
+                        help="Start the researcher's next turn while the synthesizer is still writing, keeping it "
+                             "if it covers the gaps the synthesis raises")
+    parser.add_argument("--speculation-coverage", type=float, default=0.3,
+                        help="With --pipeline, share of the synthesis's gap terms speculative research must cover "
+                             "to be kept (default: 0.3)")
+    parser.add_argument("--checkpoint", type=str,
+                        help="Save workflow state to this file after every step so the run can be resumed")
+    parser.add_argument("--resume", type=str, metavar="CHECKPOINT",
+                        help="Continue an interrupted run from its checkpoint without repeating API calls")
+    parser.add_argument("--replay", type=str, metavar="TRANSCRIPT",
+                        help="Re-run the workflow with every agent answering from this transcript instead of "
+                             "the API, flagging prompts that differ from the recorded ones")
+    parser.add_argument("--replay-from", type=str, metavar="MESSAGE_ID",
+                        help="With --replay, replay up to and including this message and call the live "
+                             "models for every step after it")
+    parser.add_argument("--index", type=str, metavar="PATH",
+                        help="SQLite index of past transcripts: reuse or build on the synthesis of a similar earlier "
+                             "query, and add this run's transcript when it completes")
+    parser.add_argument("--index-add", type=str, action="append", metavar="PATH",
+                        help="Add transcript files, or directories of them, to --index (repeat; unchanged files are "
+                             "skipped)")
+    parser.add_argument("--index-search", type=str, metavar="TEXT",
+                        help="Full-text search of the queries and syntheses in --index")
+    parser.add_argument("--reuse-threshold", type=float, default=0.9,
+                        help="With --index, query similarity at which an earlier synthesis is returned instead of "
+                             "researching again (default: 0.9)")
+    parser.add_argument("--seed-threshold", type=float, default=0.7,
+                        help="With --index, query similarity at which the agents start from an earlier synthesis "
+                             "(default: 0.7)")
+    parser.add_argument("--output", type=str, default="mcp_transcript.json",
+                        help="Output file for transcript. Names ending in .jsonl, .jsonl.gz or .jsonl.zst "
+                             "are written incrementally, one message per line, as the workflow runs")
+    parser.add_argument("--fsync-every", type=int,
+                        help="With a JSONL transcript, fsync it every N messages")
+    parser.add_argument("--metrics-file", type=str,
+                        help="Write per-agent call, token, latency and cost metrics to this file in the "
+                             "Prometheus text format")
+    parser.add_argument("--trace", type=str, metavar="PATH",
+                        help="Record a trace of the workflow, its turns and every agent call and write it to "
+                             "PATH as Chrome trace JSON (open it in chrome://tracing or ui.perfetto.dev)")
+    parser.add_argument("--researcher", type=str, default="groq", choices=list(PROVIDERS),
+                        help="Researcher agent type")
+    parser.add_argument("--researcher-model", type=str, help="Model for researcher agent")
+    parser.add_argument("--synthesizer", type=str, default="groq", choices=list(PROVIDERS),
+                        help="Synthesizer agent type")
+    parser.add_argument("--synthesizer-model", type=str, help="Model for synthesizer agent")
+    parser.add_argument("--researcher-cascade", type=str, action="append", metavar="PROVIDER[:MODEL]",
+                        help="Cheaper model to try before the researcher's model, escalating when its reply fails "
+                             "the quality checks (repeat, cheapest first)")
+    parser.add_argument("--synthesizer-cascade", type=str, action="append", metavar="PROVIDER[:MODEL]",
+                        help="Cheaper model to try before the synthesizer's model (repeat, cheapest first)")
+    parser.add_argument("--route", type=str, action="append", metavar="STEP=INDEX",
+                        help="Cascade model a step starts on, 0 for the cheapest and -1 for the role's own model; "
+                             "steps are first, followup and final (default: first=0, followup=0, final=-1)")
+    parser.add_argument("--escalate-min-words", type=int, default=40,
+                        help="Replies of cascade models shorter than this are escalated (default: 40)")
+    args = parser.parse_args()
+
+    if args.index_add or args.index_search:
+        if not args.index:
+            parser.error("--index-add and --index-search need --index")
+        run_index_commands(args)
+        if not (args.query or args.batch or args.serve or args.resume or args.replay):
+            return
+
+    resume_state = None
+    if args.resume:
+        resume_state = WorkflowCheckpoint.load(args.resume)
+        args.query = [resume_state.query]
+        args.checkpoint = args.resume
+        if args.turns is None:
+            args.turns = resume_state.max_turns
+    elif args.serve:
+        if args.query or args.checkpoint or args.sub_query or args.batch or args.replay:
+            parser.error("--serve can't be combined with --query, --checkpoint, --sub-query, --batch or --replay")
+        args.query = []
+        if args.api_keys:
+            try:
+                args.api_keys = load_api_keys(args.api_keys)
+            except (OSError, ValueError) as e:
+                parser.error(f"--api-keys: {e}")
+    elif args.replay and not args.query:
+        # Replays default to the recorded query and number of turns
+        replay = make_replay(args)
+        args.query = [next(msg.content for msg in replay.messages if msg.role == "user")]
+        if args.turns is None:
+            args.turns = sum(1 for msg in replay.messages if msg.role == "assistant"
+                             and msg.agent_id in ("synthesizer_1", "SynthBot")) or None
+    elif args.batch:
+        if args.query or args.checkpoint or args.sub_query or args.replay:
+            parser.error("--batch can't be combined with --query, --checkpoint, --sub-query or --replay")
+        args.query = []
+    elif not args.query:
+        parser.error("--query is required unless resuming with --resume, replaying with --replay, "
+                     "running a --batch or serving with --serve")
+    if args.replay_from and not args.replay:
+        parser.error("--replay-from needs --replay")
+    for spec in args.route or ():
+        step, _, index = spec.partition("=")
+        if step not in STEPS or not index.lstrip("-").isdigit():
+            parser.error(f"--route takes STEP=INDEX with STEP one of {', '.join(STEPS)}, not {spec!r}")
+    if args.turns is None:
+        args.turns = 3
+
+    # All agents borrow clients from one registry with a shared connection pool
+    configure_pool(PoolConfig(max_connections=args.max_connections, keepalive_expiry=args.keepalive_expiry))
+    # ... and share rate limiters and circuit breakers per provider and model
+    configure_policy(CallPolicy(max_retries=args.max_retries, timeout=args.request_timeout,
+                                requests_per_second=args.rate_limit))
+    if args.checkpoint and len(args.query) > 1:
+        parser.error("--checkpoint/--resume work with a single --query")
+
+    if args.replay and len(args.query) > 1:
+        parser.error("--replay works with a single --query")
+
+    if args.sub_query and len(args.query) > 1:
+        parser.error("--sub-query works with a single --query")
+
+    if args.pipeline and (len(args.query) != 1 or args.sub_query or args.workflow or args.replay):
+        parser.error("--pipeline works with a single --query, without --sub-query, --workflow or --replay")
+
+    # Set default models based on agent types if not specified
+    if args.researcher_model is None:
+        args.researcher_model = DEFAULT_MODELS[args.researcher.lower()]
+
+    if args.synthesizer_model is None:
+        args.synthesizer_model = DEFAULT_MODELS[args.synthesizer.lower()]
 
     # Print configuration
-    print(f"Starting research on: {args.query}")
-    print(f"Researcher: {args.researcher} ({args.researcher_model})")
+    if args.serve:
+        print("Starting the research service")
+    elif args.batch:
+        print(f"Starting batch research on the queries in {args.batch}")
+    else:
+        print(f"Starting research on: {', '.join(args.query)}")
+    if args.replay:
+        live = f", calling the live models after {args.replay_from}" if args.replay_from else ""
+        print(f"Replaying responses from {args.replay}{live}")
+    if args.sub_query:
+        for index, sub_query in enumerate(args.sub_query):
+            provider, model = parse_branch(args, index)
+            print(f"Researcher {index + 1}: {provider} ({model}) on: {sub_query}")
+    else:
+        print(f"Researcher: {args.researcher} ({args.researcher_model})")
 
     # Check if using LiteLLM for OpenAI
     if args.researcher.lower() == "openai" and os.environ.get("LITELLM_BASE_URL"):
@@ -125,25 +463,294 @@ Be critical but constructive, and always strive for objectivity.
     if args.synthesizer.lower() == "openai" and os.environ.get("LITELLM_BASE_URL"):
         print(f"Using LiteLLM as proxy for synthesizer")
 
+    cache = ResponseCache(args.cache_path, ttl=args.cache_ttl) if args.cache else None
+    tracer = enable_tracing() if args.trace else None
+    try:
+        run_queries(args, cache, resume_state)
+    finally:
+        if cache is not None:
+            stats = cache.stats()
+            print(f"Response cache: {stats['hits']} hits, {stats['misses']} misses "
+                  f"({stats['stored_entries']} entries in {args.cache_path})")
+            cache.close()
+        if tracer is not None:
+            tracer.export(args.trace)
+            print(f"Trace of {len(tracer.spans)} spans written to {args.trace}")
+
+
+def run_queries(args: argparse.Namespace, cache: Optional[ResponseCache] = None,
+                resume_state: Optional[CheckpointState] = None):
+    """Run the research workflow for the parsed command line"""
+    if args.serve:
+        serve(args, cache)
+        return
+    if args.batch:
+        run_batch_file(args, cache)
+        return
+    if len(args.query) > 1:
+        run_batch(args, cache)
+        return
+
+    # Look for earlier research on a similar query
+    index = TranscriptIndex(args.index) if args.index else None
+    seed = None
+    if index is not None and resume_state is None and not args.replay:
+        match = index.best_match(args.query[0], min(args.seed_threshold, args.reuse_threshold))
+        if match is not None and match.similarity >= args.reuse_threshold:
+            print(f"Reusing the synthesis of {match.path} (query similarity {match.similarity:.2f}): {match.query}")
+            print_final_synthesis([{"agent": "SynthBot", "content": match.synthesis}])
+            index.close()
+            return
+        if match is not None:
+            print(f"Starting from the synthesis of {match.path} (query similarity {match.similarity:.2f})")
+            seed = seed_message(match)
+
+    # Set up orchestrator
+    # A resumed run continues the transcript the interrupted one wrote
+    transcript = open_transcript(args.output, args, append=resume_state is not None)
+    checkpoint = WorkflowCheckpoint(args.checkpoint) if args.checkpoint else None
+    if args.sub_query:
+        orchestrator = Orchestrator(build_fanout_agents(args, cache), transcript=transcript, checkpoint=checkpoint,
+                                    convergence=make_convergence(args), seed=seed)
+        runner = None
+    elif args.pipeline:
+        orchestrator = Orchestrator(build_agents(args, cache), transcript=transcript, checkpoint=checkpoint,
+                                    convergence=make_convergence(args), seed=seed,
+                                    speculation=SpeculationPolicy(min_coverage=args.speculation_coverage))
+        runner = None
+    elif args.workflow or args.workflow_state:
+        graph = build_graph(args)
+        orchestrator = Orchestrator(build_graph_agents(graph, args, cache), transcript=transcript,
+                                    checkpoint=checkpoint, seed=seed)
+        node_cache = NodeCache(args.workflow_state) if args.workflow_state else None
+        runner = WorkflowRunner(orchestrator, graph, node_cache, convergence=make_convergence(args))
+    else:
+        # The same loop the server and --batch run, so a query behaves alike from every entry point
+        orchestrator = Orchestrator(build_agents(args, cache), transcript=transcript, checkpoint=checkpoint,
+                                    convergence=make_convergence(args), seed=seed)
+        runner = None
+    if resume_state is not None:
+        orchestrator.restore(resume_state)
+
     # Run workflow
-    results = orchestrator.run_workflow(args.query, max_turns=args.turns)
+    on_chunk = print_chunk if args.stream else None
+    try:
+        if args.sub_query:
+            results = asyncio.run(orchestrator.arun_fanout_workflow(
+                args.query[0], args.sub_query, max_turns=args.turns, on_chunk=on_chunk
+            ))
+        elif args.pipeline:
+            results = asyncio.run(orchestrator.arun_pipelined_workflow(
+                args.query[0], max_turns=args.turns, on_chunk=on_chunk
+            ))
+        elif runner is not None:
+            results = runner.run(args.query[0], on_chunk=on_chunk)
+        else:
+            results = asyncio.run(orchestrator.arun_workflow(args.query[0], max_turns=args.turns, on_chunk=on_chunk))
+    finally:
+        if transcript is not None:
+            orchestrator.write_metrics_summary()
+            transcript.close()
+        if checkpoint is not None:
+            checkpoint.close()
+    if runner is not None and args.workflow:
+        print_final_synthesis(results, runner.output_message)
+    else:
+        print_final_synthesis(results)
+    if args.replay:
+        report_replay(orchestrator, args.replay)
+    if runner is not None and runner.reused:
+        print(f"Reused {runner.reused} unchanged workflow node(s) from {args.workflow_state}")
+    if orchestrator.last_error is not None:
+        print(f"Run incomplete: {orchestrator.last_error}")
+        if args.checkpoint:
+            print(f"Continue it later with --resume {args.checkpoint}")
+
+    report_metrics(orchestrator.metrics, args)
+    if orchestrator.speculation.launched:
+        report_speculation(orchestrator.speculation)
+
+    # Save transcript
+    if transcript is None:
+        orchestrator.save_transcript(args.output)
+    print(f"Research complete! Transcript saved to {args.output}")
+    if index is not None:
+        if orchestrator.last_error is None:
+            copy = index.add_run(args.output)
+            index.commit()
+            print(f"Transcript added to the index {args.index} as {copy}")
+        index.close()
+
+
+def run_index_commands(args: argparse.Namespace):
+    """Handle --index-add and --index-search"""
+    index = TranscriptIndex(args.index)
+    try:
+        if args.index_add:
+            added, skipped = index.add_paths(args.index_add)
+            print(f"Indexed {added} transcript(s), {skipped} unchanged or unreadable; {len(index)} in {args.index}")
+        if args.index_search:
+            for path, query, score in index.search(args.index_search):
+                print(f"{-score:8.3f}  {path}: {query[:100]}")
+    finally:
+        index.close()
+
+
+def report_metrics(metrics: MetricsCollector, args: argparse.Namespace):
+    """Print the metrics summary table and write the Prometheus file if requested"""
+    if not metrics.records:
+        return
+    print("\nCall metrics:")
+    print(metrics.format_table())
+    routes = metrics.format_routes()
+    if routes:
+        print("\nCalls per route:")
+        print(routes)
+    if args.metrics_file:
+        metrics.write_prometheus(args.metrics_file)
+        print(f"Metrics written to {args.metrics_file}")
+
+
+def report_speculation(speculation: SpeculationPolicy):
+    """Print how much speculative research was kept and what it saved and cost"""
+    summary = speculation.summary()
+    hit_rate = "n/a" if summary["hit_rate"] is None else f"{summary['hit_rate']:.0%}"
+    print(f"Speculative research: {summary['hits']} kept, {summary['misses']} discarded, "
+          f"{summary['cancelled']} cancelled (hit rate {hit_rate}); saved {summary['time_saved']:.2f}s, "
+          f"wasted ${summary['wasted_cost']:.4f}")
+
+
+def report_replay(orchestrator: Orchestrator, transcript: str):
+    """Print how much of the run came from the transcript and every prompt that diverged from it"""
+    agents = [agent for agent in orchestrator.agents.values() if isinstance(agent, ReplayAgent)]
+    divergences = [divergence for agent in agents for divergence in agent.divergences]
+    replayed, live = sum(agent.replayed for agent in agents), sum(agent.live_calls for agent in agents)
+    print(f"Replayed {replayed} response(s) from {transcript}, {live} live call(s), "
+          f"{len(divergences)} prompt divergence(s)")
+    for divergence in divergences:
+        print(f"  {divergence['agent_id']} at recorded {divergence['recorded_id']}:")
+        print(f"    recorded: {(divergence['expected_prompt'] or '(none)')[:120]!r}")
+        print(f"    now:      {(divergence['actual_prompt'] or '(none)')[:120]!r}")
+
+
+def make_convergence(args: argparse.Namespace) -> ConvergencePolicy:
+    """Convergence policy for one workflow; without --converge it only records its scores"""
+    return ConvergencePolicy(similarity_threshold=args.convergence_threshold, stop=args.converge)
+
+
+def open_transcript(filename: str, args: argparse.Namespace, append: bool = False) -> Optional[TranscriptWriter]:
+    """Streaming transcript writer for JSONL output names, None for the JSON format"""
+    if not filename.endswith(JSONL_SUFFIXES):
+        return None
+    return TranscriptWriter(filename, fsync_every=args.fsync_every, append=append)
+
+
+def numbered_path(filename: str, index: int) -> str:
+    """Insert a query number before the file's extension(s)"""
+    for suffix in JSONL_SUFFIXES[::-1] + (".json",):
+        if filename.endswith(suffix):
+            return f"{filename[:-len(suffix)]}_{index}{suffix}"
+    root, ext = os.path.splitext(filename)
+    return f"{root}_{index}{ext}"
+
+
+def print_chunk(agent: BaseAgent, chunk: str):
+    """Print a streamed response chunk as soon as it arrives"""
+    print(chunk, end="", flush=True)
+
+
+def print_final_synthesis(results: List[dict], output: Optional[MCPMessage] = None):
+    """Print the last synthesizer message of a finished workflow, or its output message if given"""
     print("\n" + "=" * 50)
     print("FINAL RESEARCH RESULTS")
     print("=" * 50)
-    final_synth_message = None
-    for message in reversed(results):
-        if message['agent'] == 'SynthBot':
-            final_synth_message = message
-            break
+    final_synth_message = {"content": output.content} if output is not None else None
+    if final_synth_message is None:
+        for message in reversed(results):
+            if message['agent'] == 'SynthBot':
+                final_synth_message = message
+                break
 
     if final_synth_message:
         print(f"\nFINAL SYNTHESIS:\n{final_synth_message['content']}\n")
     else:
         print("\nNo synthesis found in results.\n")
 
-    # Save transcript
-    orchestrator.save_transcript(args.output)
-    print(f"Research complete! Transcript saved to {args.output}")
+
+def run_batch(args: argparse.Namespace, cache: Optional[ResponseCache] = None):
+    """Research several queries concurrently, writing one transcript per query"""
+    print(f"Running {len(args.query)} queries with concurrency {args.concurrency}")
+    orchestrators = asyncio.run(run_workflows_concurrently(
+        args.query,
+        agent_factory=lambda: build_agents(args, cache),
+        max_turns=args.turns,
+        max_concurrency=args.concurrency,
+        transcript_factory=lambda index: open_transcript(numbered_path(args.output, index + 1), args),
+        convergence_factory=lambda: make_convergence(args)
+    ))
+
+    metrics = MetricsCollector()
+    for index, orchestrator in enumerate(orchestrators, start=1):
+        metrics.merge(orchestrator.metrics)
+        filename = numbered_path(args.output, index)
+        if orchestrator.transcript is None:
+            orchestrator.save_transcript(filename)
+        if orchestrator.last_error is not None:
+            print(f"Query {index} failed: {orchestrator.last_error}. Partial transcript saved to {filename}")
+        else:
+            print(f"Query {index} complete! Transcript saved to {filename}")
+    report_metrics(metrics, args)
+
+
+def run_batch_file(args: argparse.Namespace, cache: Optional[ResponseCache] = None):
+    """Research the queries of a --batch file, streaming results to sharded JSONL"""
+    jobs = load_jobs(args.batch)
+    results = ResultShards(args.batch_output, shard_size=args.batch_shard_size, fsync_every=args.fsync_every)
+    print(f"{len(jobs)} queries in {args.batch}, concurrency {args.concurrency}, "
+          f"results in {args.batch_output}-*.jsonl")
+    report = asyncio.run(run_batch_jobs(
+        jobs,
+        agent_factory=lambda: build_agents(args, cache),
+        results=results,
+        max_turns=args.turns,
+        max_concurrency=args.concurrency,
+        transcript_dir=args.batch_transcripts,
+        convergence_factory=lambda: make_convergence(args)
+    ))
+    print(report.summary())
+    if args.metrics_file and report.metrics.records:
+        report.metrics.write_prometheus(args.metrics_file)
+        print(f"Metrics written to {args.metrics_file}")
+
+
+def load_api_keys(path: str) -> Dict[str, str]:
+    """{API key: tenant} from a JSON object file"""
+    with open(path, "r", encoding="utf-8") as f:
+        keys = json.load(f)
+    if not isinstance(keys, dict) or not all(isinstance(value, str) for value in keys.values()):
+        raise ValueError(f"{path} must hold a JSON object mapping API keys to tenant names")
+    return keys
+
+
+def serve(args: argparse.Namespace, cache: Optional[ResponseCache] = None):
+    """Research queries submitted over HTTP until interrupted"""
+    host, _, port = args.serve.rpartition(":")
+    server = ResearchServer(
+        agent_factory=lambda: build_agents(args, cache),
+        max_concurrency=args.concurrency,
+        tenant_concurrency=args.tenant_concurrency,
+        tenant_queue=args.tenant_queue,
+        max_turns=args.turns,
+        warm_agents=args.warm_agents,
+        convergence_factory=lambda: make_convergence(args),
+        api_keys=args.api_keys,
+        max_tenants=args.max_tenants
+    )
+    try:
+        asyncio.run(server.serve_forever(host or "127.0.0.1", int(port)))
+    except KeyboardInterrupt:
+        print("\nShutting down")
+    report_metrics(server.metrics, args)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,569 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: server.py
+@time: 10/17/26 20:50
+"""
+# server.py
+import asyncio
+import collections
+import json
+import math
+import time
+import uuid
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+from mcp.protocol import MCPMessage
+from agents.base import BaseAgent
+from agents.clients import get_registry
+from batch import final_synthesis
+from convergence import ConvergencePolicy
+from metrics import MetricsCollector, prometheus_label
+from orchestrator import Orchestrator
+
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 401: "Unauthorized", 404: "Not Found",
+           405: "Method Not Allowed",
+           413: "Payload Too Large", 429: "Too Many Requests", 503: "Service Unavailable"}
+
+
+class HTTPError(Exception):
+    """Request the server answers with an error status and a JSON {"error": ...} body"""
+
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class AgentPool:
+    """Agent sets built ahead of time, so a job starts without constructing its agents.
+
+    Agents keep per-conversation state, so a set is never reused: acquire
+    hands one out and the server refills the pool in the background.
+    """
+
+    def __init__(self, factory: Callable[[], List[BaseAgent]], size: int = 4):
+        self.factory = factory
+        self.size = size
+        self._ready: Deque[List[BaseAgent]] = collections.deque()
+        self.hits = 0
+        self.misses = 0
+
+    def fill(self):
+        while len(self._ready) < self.size:
+            self._ready.append(self.factory())
+
+    def acquire(self) -> List[BaseAgent]:
+        if self._ready:
+            self.hits += 1
+            return self._ready.popleft()
+        self.misses += 1
+        return self.factory()
+
+    def warm(self):
+        """Fill the pool and create the agents' async clients (and connection pools) on the running loop"""
+        self.fill()
+        for agents in list(self._ready)[:1]:
+            for agent in agents:
+                getattr(agent, "async_client", None)
+
+    def stats(self) -> Dict[str, int]:
+        return {"ready": len(self._ready), "size": self.size, "hits": self.hits, "misses": self.misses}
+
+
+class Job:
+    """One research request and its progress events"""
+
+    def __init__(self, query: str, tenant: str, max_turns: int, stream_chunks: bool = False):
+        self.id = uuid.uuid4().hex[:12]
+        self.query = query
+        self.tenant = tenant
+        self.max_turns = max_turns
+        self.stream_chunks = stream_chunks
+        self.status = "queued"
+        self.error: Optional[str] = None
+        self.synthesis: Optional[str] = None
+        self.metrics: Optional[Dict[str, Any]] = None
+        self.messages = 0
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        # Every event but token chunks, so a late subscriber can catch up
+        self.events: List[Tuple[str, Dict[str, Any]]] = []
+        self._subscribers: List[asyncio.Queue] = []
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        return self.status in ("ok", "failed", "cancelled")
+
+    def emit(self, event: str, data: Dict[str, Any], keep: bool = True):
+        if keep:
+            self.events.append((event, data))
+        for queue in self._subscribers:
+            queue.put_nowait((event, data))
+
+    def subscribe(self) -> asyncio.Queue:
+        """Queue of this job's events, starting with the ones already emitted"""
+        queue: asyncio.Queue = asyncio.Queue()
+        for event in self.events:
+            queue.put_nowait(event)
+        if not self.done:
+            self._subscribers.append(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        if queue in self._subscribers:
+            self._subscribers.remove(queue)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id, "tenant": self.tenant, "query": self.query, "status": self.status,
+            "error": self.error, "synthesis": self.synthesis, "messages": self.messages, "metrics": self.metrics,
+            "queue_wait": round(self.started - self.created, 3) if self.started else None,
+            "run_time": round(self.finished - self.started, 3) if self.finished and self.started else None,
+        }
+
+
+def _percentiles(values: Deque[float]) -> Dict[str, Optional[float]]:
+    ordered = sorted(values)
+    if not ordered:
+        return {"p50": None, "p95": None, "max": None}
+    return {"p50": round(ordered[math.ceil(len(ordered) * 0.5) - 1], 4),
+            "p95": round(ordered[math.ceil(len(ordered) * 0.95) - 1], 4), "max": round(ordered[-1], 4)}
+
+
+class ResearchServer:
+    """Long-running HTTP service that researches queries with pooled agents.
+
+    Jobs are queued per tenant and started round-robin over tenants, at most
+    max_concurrency at a time overall and tenant_concurrency per tenant; a
+    tenant with tenant_queue jobs waiting gets 429s. All jobs share the
+    process-wide client registry, so connections stay open between jobs.
+
+    Endpoints:
+      POST   /jobs               {"query", "tenant"?, "turns"?, "stream"?, "chunks"?} -> 202 job, or
+                                 with "stream" the job's events as server-sent events
+      GET    /jobs/<id>          job status and result
+      GET    /jobs/<id>/events   server-sent events: queued, started, message, chunk, done
+      DELETE /jobs/<id>          cancel a queued or running job
+      GET    /stats              queue depth, per-tenant load, latency percentiles, pool and call totals
+      GET    /metrics            call metrics and queue gauges in the Prometheus text format
+      GET    /health
+    With api_keys (key -> tenant), every /jobs request needs one of the keys
+    (Authorization: Bearer <key> or X-API-Key), the key decides the tenant
+    and a tenant only sees its own jobs. Without them the tenant is the
+    X-Tenant header or the "tenant" field ("default" if neither is set),
+    which clients can pick freely, so only use that for trusted clients. At
+    most max_tenants tenants may have jobs queued or running at once, and
+    finished-job counters are kept for the max_tenants most recent ones.
+    """
+
+    def __init__(
+            self,
+            agent_factory: Callable[[], List[BaseAgent]],
+            max_concurrency: int = 8,
+            tenant_concurrency: int = 2,
+            tenant_queue: int = 100,
+            max_turns: int = 3,
+            turn_limit: int = 10,
+            warm_agents: int = 4,
+            convergence_factory: Optional[Callable[[], Optional[ConvergencePolicy]]] = None,
+            keep_finished: int = 1000,
+            stats_window: int = 1000,
+            api_keys: Optional[Dict[str, str]] = None,
+            max_tenants: int = 1000
+    ):
+        self.pool = AgentPool(agent_factory, warm_agents)
+        self.max_concurrency = max(1, max_concurrency)
+        self.tenant_concurrency = max(1, tenant_concurrency)
+        self.tenant_queue = tenant_queue
+        self.max_turns = max_turns
+        self.turn_limit = max(turn_limit, max_turns)
+        self.convergence_factory = convergence_factory
+        self.keep_finished = keep_finished
+        self.api_keys = dict(api_keys) if api_keys else None
+        self.max_tenants = max(1, max_tenants)
+        self.jobs: "collections.OrderedDict[str, Job]" = collections.OrderedDict()
+        # Tenants with jobs queued or running; one is dropped as soon as it has neither
+        self._queues: Dict[str, Deque[Job]] = {}
+        self._running: Dict[str, int] = collections.Counter()
+        # Finished-job counters of the max_tenants most recently active tenants
+        self._tenant_counts: "collections.OrderedDict[str, Dict[str, int]]" = collections.OrderedDict()
+        self._next_tenant = 0
+        self._wakeup = asyncio.Event()
+        # Latencies and call metrics of recently finished jobs
+        self._queue_waits: Deque[float] = collections.deque(maxlen=stats_window)
+        self._run_times: Deque[float] = collections.deque(maxlen=stats_window)
+        self._finish_times: Deque[float] = collections.deque(maxlen=stats_window)
+        self.metrics = MetricsCollector()
+        self._metrics_window = 20 * stats_window
+        self.started = time.time()
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._dispatcher: Optional[asyncio.Task] = None
+        self._closing = False
+
+    # Scheduling
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues.values())
+
+    @property
+    def running(self) -> int:
+        return sum(self._running.values())
+
+    def submit(self, query: str, tenant: str = "default", max_turns: Optional[int] = None,
+               stream_chunks: bool = False) -> Job:
+        """Queue a job, or raise HTTPError(429) if the tenant's queue or the tenant table is full"""
+        if self._closing:
+            raise HTTPError(503, "Server is shutting down")
+        if tenant not in self._queues and len(self._queues) >= self.max_tenants:
+            raise HTTPError(429, f"{len(self._queues)} tenants have jobs already", {"Retry-After": "1"})
+        queue = self._queues.setdefault(tenant, collections.deque())
+        if len(queue) >= self.tenant_queue:
+            self._count(tenant, "rejected")
+            self._forget_idle(tenant)
+            raise HTTPError(429, f"Tenant {tenant} has {len(queue)} jobs queued", {"Retry-After": "1"})
+        job = Job(query, tenant, max_turns or self.max_turns, stream_chunks)
+        queue.append(job)
+        self.jobs[job.id] = job
+        self._count(tenant, "submitted")
+        job.emit("queued", {"id": job.id, "position": len(queue)})
+        self._wakeup.set()
+        return job
+
+    def _count(self, tenant: str, status: str):
+        """Count a job of tenant under status, dropping the counters of the least recently active tenants"""
+        counts = self._tenant_counts.get(tenant)
+        if counts is None:
+            counts = self._tenant_counts[tenant] = collections.Counter()
+        self._tenant_counts.move_to_end(tenant)
+        counts[status] += 1
+        while len(self._tenant_counts) > self.max_tenants:
+            self._tenant_counts.popitem(last=False)
+
+    def _forget_idle(self, tenant: str):
+        """Drop a tenant's scheduling state once it has no jobs queued or running"""
+        if not self._queues.get(tenant) and not self._running[tenant]:
+            self._queues.pop(tenant, None)
+            self._running.pop(tenant, None)
+
+    def _next_job(self) -> Optional[Job]:
+        """Next job of the first tenant, in round-robin order, that has one queued and is under its quota"""
+        tenants = list(self._queues)
+        for offset in range(len(tenants)):
+            tenant = tenants[(self._next_tenant + offset) % len(tenants)]
+            if self._queues[tenant] and self._running[tenant] < self.tenant_concurrency:
+                self._next_tenant = (self._next_tenant + offset + 1) % len(tenants)
+                return self._queues[tenant].popleft()
+        return None
+
+    async def _dispatch(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+            started = False
+            while self.running < self.max_concurrency:
+                job = self._next_job()
+                if job is None:
+                    break
+                self._start_job(job)
+                started = True
+            if started:
+                # Replace the agent sets just handed out once the new jobs are under way
+                asyncio.get_running_loop().call_soon(self.pool.fill)
+
+    def _start_job(self, job: Job):
+        self._running[job.tenant] += 1
+        job.task = asyncio.create_task(self._run(job))
+        # A task cancelled before its first step never enters _run, so its finally can't do the bookkeeping
+        job.task.add_done_callback(lambda task: self._finish(job) if job.finished is None else None)
+
+    async def _run(self, job: Job):
+        orchestrator = None
+        try:
+            job.status, job.started = "running", time.time()
+            job.emit("started", {"id": job.id, "queue_wait": round(job.started - job.created, 3)})
+            if job.stream_chunks:
+                def on_chunk(agent: BaseAgent, chunk: str):
+                    job.emit("chunk", {"agent": agent.name, "text": chunk}, keep=False)
+            else:
+                on_chunk = None
+
+            def on_message(message: MCPMessage, agent_name: str):
+                job.messages += 1
+                job.emit("message", {"agent": agent_name, **message.to_dict()})
+
+            orchestrator = Orchestrator(self.pool.acquire(), verbose=False, on_message=on_message,
+                                        convergence=self.convergence_factory() if self.convergence_factory else None)
+            await orchestrator.arun_workflow(job.query, max_turns=job.max_turns, on_chunk=on_chunk)
+            job.error = str(orchestrator.last_error) if orchestrator.last_error else None
+            job.status = "failed" if job.error else "ok"
+        except asyncio.CancelledError:
+            job.status, job.error = "cancelled", "Cancelled"
+        except Exception as e:  # one broken job must not take the server down
+            job.status, job.error = "failed", f"{type(e).__name__}: {e}"
+        finally:
+            self._finish(job, orchestrator)
+
+    def _finish(self, job: Job, orchestrator: Optional[Orchestrator] = None):
+        """Release a started job's slot, record its outcome and let the dispatcher start the next one"""
+        job.finished = time.time()
+        if job.status in ("queued", "running"):
+            job.status, job.error = "cancelled", "Cancelled"
+        if orchestrator is not None:
+            job.synthesis = final_synthesis(orchestrator)
+            job.metrics = orchestrator.metrics.totals()
+            self.metrics.merge(orchestrator.metrics)
+            del self.metrics.records[:-self._metrics_window]
+        self._running[job.tenant] -= 1
+        self._forget_idle(job.tenant)
+        self._count(job.tenant, job.status)
+        if job.started is not None:
+            self._queue_waits.append(job.started - job.created)
+            self._run_times.append(job.finished - job.started)
+        self._finish_times.append(job.finished)
+        job.emit("done", job.to_dict())
+        job._subscribers.clear()
+        self._forget_finished()
+        self._wakeup.set()
+
+    def cancel(self, job: Job):
+        if job.status == "queued":
+            self._queues[job.tenant].remove(job)
+            job.status, job.error, job.finished = "cancelled", "Cancelled", time.time()
+            self._forget_idle(job.tenant)
+            self._count(job.tenant, "cancelled")
+            job.emit("done", job.to_dict())
+            job._subscribers.clear()
+        elif job.task is not None and not job.done:
+            job.task.cancel()
+
+    def _forget_finished(self):
+        """Drop the oldest finished jobs beyond keep_finished"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.done]
+        for job_id in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self.jobs[job_id]
+
+    # Stats
+
+    def stats(self) -> Dict[str, Any]:
+        now = time.time()
+        tenants = {}
+        for tenant in set(self._queues) | set(self._tenant_counts):
+            tenants[tenant] = {"queued": len(self._queues.get(tenant, ())), "running": self._running[tenant],
+                               **self._tenant_counts.get(tenant, {})}
+        totals = self.metrics.totals()
+        return {
+            "uptime": round(now - self.started, 1),
+            "queued": self.queued,
+            "running": self.running,
+            "max_concurrency": self.max_concurrency,
+            "tenant_concurrency": self.tenant_concurrency,
+            "tenants": tenants,
+            "jobs_per_second_1m": round(sum(1 for t in self._finish_times if now - t <= 60) / 60, 3),
+            "latency": {"queue_wait": _percentiles(self._queue_waits), "run": _percentiles(self._run_times)},
+            "agent_pool": self.pool.stats(),
+            "clients": get_registry().stats(),
+            "calls": {key: totals[key] for key in ("calls", "prompt_tokens", "cached_tokens", "completion_tokens",
+                                                   "latency_mean", "latency_p95", "cost")},
+        }
+
+    def to_prometheus(self) -> str:
+        lines = ["# HELP mcp_server_jobs_queued Jobs waiting to start", "# TYPE mcp_server_jobs_queued gauge",
+                 "# HELP mcp_server_jobs_running Jobs being researched", "# TYPE mcp_server_jobs_running gauge"]
+        for tenant in self._queues:
+            label = prometheus_label(tenant)
+            lines.append(f'mcp_server_jobs_queued{{tenant="{label}"}} {len(self._queues[tenant])}')
+            lines.append(f'mcp_server_jobs_running{{tenant="{label}"}} {self._running[tenant]}')
+        lines += ["# HELP mcp_server_jobs_total Finished jobs by status", "# TYPE mcp_server_jobs_total counter"]
+        for tenant, counts in self._tenant_counts.items():
+            label = prometheus_label(tenant)
+            for status in ("ok", "failed", "cancelled", "rejected"):
+                lines.append(f'mcp_server_jobs_total{{tenant="{label}",status="{status}"}} {counts[status]}')
+        return "\n".join(lines) + "\n" + self.metrics.to_prometheus()
+
+    # HTTP
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        """(method, path, query, headers, body) of the next request, or None at end of connection"""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(413, "Request headers too large")
+        request_line, *header_lines = head.decode("latin-1").split("\r\n")
+        try:
+            method, target, _ = request_line.split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+        headers = {}
+        for line in header_lines:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        length = headers.get("content-length") or "0"
+        if not (length.isascii() and length.isdigit()):
+            raise HTTPError(400, "Content-Length must be a non-negative integer")
+        length = int(length)
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        url = urlsplit(target)
+        return method.upper(), url.path.rstrip("/") or "/", parse_qs(url.query), headers, body
+
+    @staticmethod
+    async def _respond(writer: asyncio.StreamWriter, status: int, body: bytes,
+                       content_type: str = "application/json", headers: Optional[Dict[str, str]] = None):
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Type: {content_type}",
+                 f"Content-Length: {len(body)}"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+    async def _respond_json(self, writer: asyncio.StreamWriter, status: int, payload: Any,
+                            headers: Optional[Dict[str, str]] = None):
+        await self._respond(writer, status, json.dumps(payload).encode("utf-8"), headers=headers)
+
+    @staticmethod
+    async def _stream_events(writer: asyncio.StreamWriter, job: Job):
+        """Send the job's events as server-sent events until it is done, then close the connection"""
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nCache-Control: no-cache\r\n"
+                     b"Connection: close\r\n\r\n")
+        queue = job.subscribe()
+        try:
+            while True:
+                event, data = await queue.get()
+                writer.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+                await writer.drain()
+                if event == "done":
+                    return
+        finally:
+            job.unsubscribe(queue)
+
+    def _authenticate(self, headers: Dict[str, str]) -> Optional[str]:
+        """Tenant of the request's API key; None when the server has no keys"""
+        if self.api_keys is None:
+            return None
+        key = headers.get("x-api-key")
+        scheme, _, token = headers.get("authorization", "").partition(" ")
+        if scheme.lower() == "bearer":
+            key = token.strip()
+        tenant = self.api_keys.get(key) if key else None
+        if tenant is None:
+            raise HTTPError(401, "Missing or unknown API key", {"WWW-Authenticate": "Bearer"})
+        return tenant
+
+    def _job(self, job_id: str, tenant: Optional[str] = None) -> Job:
+        """Job by id; with API keys, only the tenant's own jobs are found"""
+        job = self.jobs.get(job_id)
+        if job is None or (tenant is not None and job.tenant != tenant):
+            raise HTTPError(404, f"No job {job_id}")
+        return job
+
+    def _parse_submission(self, headers: Dict[str, str], body: bytes, tenant: Optional[str] = None
+                          ) -> Dict[str, Any]:
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Body is not valid JSON")
+        if not isinstance(request, dict) or not isinstance(request.get("query"), str) or not request["query"]:
+            raise HTTPError(400, "Body needs a non-empty \"query\" string")
+        turns = request.get("turns", self.max_turns)
+        if not isinstance(turns, int) or not 1 <= turns <= self.turn_limit:
+            raise HTTPError(400, f"\"turns\" must be an integer from 1 to {self.turn_limit}")
+        if tenant is None:
+            tenant = headers.get("x-tenant") or request.get("tenant") or "default"
+        return {"query": request["query"], "tenant": str(tenant), "max_turns": turns,
+                "stream_chunks": bool(request.get("chunks")), "stream": bool(request.get("stream"))}
+
+    async def _route(self, method: str, path: str, query: Dict[str, List[str]], headers: Dict[str, str],
+                     body: bytes, writer: asyncio.StreamWriter) -> bool:
+        """Answer one request; returns False if the connection must be closed afterwards"""
+        parts = path.strip("/").split("/")
+        tenant = self._authenticate(headers) if parts[0] == "jobs" else None
+        if path == "/jobs":
+            if method != "POST":
+                raise HTTPError(405, "Use POST to submit a job")
+            submission = self._parse_submission(headers, body, tenant)
+            stream = submission.pop("stream")
+            job = self.submit(**submission)
+            if stream or "text/event-stream" in headers.get("accept", ""):
+                await self._stream_events(writer, job)
+                return False
+            await self._respond_json(writer, 202, {**job.to_dict(), "events": f"/jobs/{job.id}/events"})
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self._job(parts[1], tenant)
+            if method == "DELETE":
+                self.cancel(job)
+            elif method != "GET":
+                raise HTTPError(405, "Use GET or DELETE")
+            await self._respond_json(writer, 200, job.to_dict())
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "events" and method == "GET":
+            await self._stream_events(writer, self._job(parts[1], tenant))
+            return False
+        elif path == "/stats" and method == "GET":
+            await self._respond_json(writer, 200, self.stats())
+        elif path == "/metrics" and method == "GET":
+            await self._respond(writer, 200, self.to_prometheus().encode("utf-8"), "text/plain; version=0.0.4")
+        elif path == "/health" and method == "GET":
+            await self._respond_json(writer, 200, {"status": "closing" if self._closing else "ok"})
+        else:
+            raise HTTPError(404, f"No route for {method} {path}")
+        return headers.get("connection", "").lower() != "close"
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Serve the requests of one keep-alive connection"""
+        try:
+            keep_alive = True
+            while keep_alive:
+                request = None
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    keep_alive = await self._route(*request, writer)
+                except HTTPError as e:
+                    await self._respond_json(writer, e.status, {"error": str(e)}, e.headers)
+                    # After a request that could not be read, the connection is out of step
+                    keep_alive = request is not None and request[3].get("connection", "").lower() != "close"
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080) -> Tuple[str, int]:
+        """Warm the agent pool, start the dispatcher and listen; returns the bound (host, port)"""
+        self.pool.warm()
+        self._dispatcher = asyncio.create_task(self._dispatch())
+        self._server = await asyncio.start_server(self._handle, host, port, limit=MAX_HEADER_BYTES)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def close(self, drain: bool = True):
+        """Stop accepting jobs; let running ones finish (or cancel them) and stop listening"""
+        self._closing = True
+        if self._server is not None:
+            self._server.close()
+        # cancel() drops a tenant's queue once it empties, so walk a snapshot
+        for job in [job for queue in list(self._queues.values()) for job in queue]:
+            self.cancel(job)
+        tasks = [job.task for job in self.jobs.values() if job.task is not None and not job.done]
+        if not drain:
+            for task in tasks:
+                task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+
+    async def serve_forever(self, host: str = "127.0.0.1", port: int = 8080):
+        bound_host, bound_port = await self.start(host, port)
+        print(f"Serving research jobs on http://{bound_host}:{bound_port} "
+              f"(concurrency {self.max_concurrency}, {self.tenant_concurrency} per tenant)", flush=True)
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await self.close(drain=False)
@@ -0,0 +1,101 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: speculation.py
+@time: 10/17/26 22:30
+"""
+# speculation.py
+import re
+from typing import Any, Dict, FrozenSet, Optional
+from mcp.protocol import MCPMessage
+
+# Sentences of a synthesis that point at something still to investigate
+GAP_PATTERN = re.compile(
+    r"\b(?:gaps?|further|unclear|unknown|uncertain\w*|limitations?|lack\w*|missing|open questions?|"
+    r"investigat\w*|explor\w*|needs? (?:more|further)|more (?:research|detail|evidence))\b",
+    re.IGNORECASE
+)
+_SENTENCE = re.compile(r"(?<=[.!?:\n])\s+")
+_WORD = re.compile(r"\w+")
+
+
+class SpeculationPolicy:
+    """Decides whether research started speculatively can stand in for the next turn's research.
+
+    In the pipelined workflow the researcher starts its next turn from the
+    gaps it sees in its own research while the synthesizer is still writing.
+    When the synthesis arrives, the speculative research is accepted if it
+    covers at least min_coverage of the synthesis's gap terms: the longer
+    words (min_word_length and up) of the sentences that mention gaps, open
+    questions or further work, or of the whole synthesis if none do.
+    Otherwise it is discarded and the researcher answers the synthesis as
+    usual. Scores go in the research message's metadata["speculation"];
+    counts, time saved and the cost of discarded research accumulate here.
+    """
+
+    def __init__(self, min_coverage: float = 0.3, min_word_length: int = 5):
+        self.min_coverage = min_coverage
+        self.min_word_length = min_word_length
+        self.launched = 0
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0
+        # Wall-clock of accepted speculative research that overlapped the synthesis
+        self.time_saved = 0.0
+        self.wasted_cost = 0.0
+
+    def _terms(self, text: str) -> FrozenSet[str]:
+        return frozenset(word for word in _WORD.findall(text.lower()) if len(word) >= self.min_word_length)
+
+    def gap_terms(self, synthesis: str) -> FrozenSet[str]:
+        gap_sentences = [sentence for sentence in _SENTENCE.split(synthesis) if GAP_PATTERN.search(sentence)]
+        return self._terms(" ".join(gap_sentences) if gap_sentences else synthesis)
+
+    def check(self, speculative: MCPMessage, synthesis: MCPMessage, overlap: float) -> bool:
+        """Score speculative research against the synthesis it ran alongside; True to keep it.
+
+        overlap is how long the speculative call ran while the synthesis was
+        still being written, i.e. the wall-clock a kept speculation saves.
+        """
+        gaps = self.gap_terms(synthesis.content)
+        coverage = len(gaps & self._terms(speculative.content)) / len(gaps) if gaps else 1.0
+        hit = coverage >= self.min_coverage
+        self.record(speculative, hit, overlap, coverage)
+        return hit
+
+    def record(self, speculative: MCPMessage, hit: bool, overlap: float = 0.0, coverage: float = None):
+        """Count a kept or discarded speculation"""
+        if hit:
+            self.hits += 1
+            self.time_saved += overlap
+        else:
+            self.misses += 1
+            self.wasted_cost += self._cost(speculative)
+        speculative.metadata["speculation"] = {
+            "coverage": None if coverage is None else round(coverage, 4),
+            "kept": hit,
+            "time_saved": round(overlap, 4) if hit else 0.0
+        }
+
+    def cancel(self, speculative: Optional[MCPMessage] = None):
+        """Count a speculation the workflow no longer needs (it ended), with its cost if it already finished"""
+        self.cancelled += 1
+        if speculative is not None:
+            self.wasted_cost += self._cost(speculative)
+            speculative.metadata["speculation"] = {"coverage": None, "kept": False, "time_saved": 0.0}
+
+    @staticmethod
+    def _cost(speculative: MCPMessage) -> float:
+        return (speculative.metadata.get("metrics") or {}).get("cost") or 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        decided = self.hits + self.misses
+        return {
+            "launched": self.launched,
+            "hits": self.hits,
+            "misses": self.misses,
+            "cancelled": self.cancelled,
+            "hit_rate": round(self.hits / decided, 4) if decided else None,
+            "time_saved": round(self.time_saved, 4),
+            "wasted_cost": round(self.wasted_cost, 6)
+        }
@@ -0,0 +1,80 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: test_cache.py
+@time: 10/18/26 00:25
+"""
+# tests/test_cache.py
+from agents.cache import ResponseCache
+from agents.mock_agent import MockAgent
+
+MESSAGES = [{"role": "user", "content": "hello"}]
+
+
+def test_key_covers_every_request_parameter():
+    key = ResponseCache.make_key(MESSAGES, "gpt-4o", 0.7, 100, "OpenAI")
+    assert key == ResponseCache.make_key(list(MESSAGES), "gpt-4o", 0.7, 100, "OpenAI")
+    assert key != ResponseCache.make_key(MESSAGES, "gpt-4o-mini", 0.7, 100, "OpenAI")
+    assert key != ResponseCache.make_key(MESSAGES, "gpt-4o", 0.2, 100, "OpenAI")
+    assert key != ResponseCache.make_key(MESSAGES, "gpt-4o", 0.7, 200, "OpenAI")
+    assert key != ResponseCache.make_key(MESSAGES, "gpt-4o", 0.7, 100, "Groq")
+    assert key != ResponseCache.make_key([{"role": "user", "content": "hi"}], "gpt-4o", 0.7, 100, "OpenAI")
+
+
+def test_entries_survive_a_restart(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path)
+    assert cache.get("key") is None
+    cache.set("key", "content")
+    assert cache.get("key") == "content"
+    cache.close()
+
+    reopened = ResponseCache(path)
+    assert reopened.get("key") == "content"
+    assert reopened.stats()["hits"] == 1
+    reopened.close()
+
+
+def test_expired_entries_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), ttl=-1)
+    cache.set("key", "content")
+    assert cache.get("key") is None
+    assert cache.stats()["stored_entries"] == 0
+    cache.close()
+
+
+def test_disk_store_is_trimmed_by_recent_access(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_entries=2, memory_entries=1)
+    for key in ("a", "b", "c"):
+        cache.set(key, key)
+    cache.get("a")
+    cache.close()
+
+    reopened = ResponseCache(str(tmp_path / "cache.sqlite"))
+    assert reopened.stats()["stored_entries"] == 2
+    assert reopened.get("a") == "a" and reopened.get("c") == "c"
+    assert reopened.get("b") is None
+    reopened.close()
+
+
+def test_agent_answers_repeated_prompt_from_cache(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    replies = iter(["first", "second"])
+
+    def make_agent():
+        return MockAgent("agent", "Agent", "tester", responses=lambda messages: next(replies), cache=cache)
+
+    for _ in range(2):
+        agent = make_agent()
+        agent.add_message(agent.create_message("question", role="user"))
+        assert agent.generate_response().content == "first"
+    assert cache.stats()["hits"] == 1
+    cache.close()
+
+
+def test_response_without_content_is_not_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"))
+    cache.set("key", None)
+    assert cache.get("key") is None
+    assert cache.stats()["stored_entries"] == 0
+    cache.close()
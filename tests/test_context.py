@@ -0,0 +1,90 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: test_context.py
+@time: 10/18/26 00:30
+"""
+# tests/test_context.py
+import pytest
+from agents.context import ContextWindow, TRUNCATION_MARKER, message_tokens
+from mcp.protocol import MCPMessage
+
+WORDS = " ".join(f"word{index}" for index in range(200))
+
+
+def conversation(turns: int = 10):
+    messages = [MCPMessage(role="system", content="You are a tester.", agent_id="agent")]
+    for index in range(turns):
+        role = "user" if index % 2 == 0 else "assistant"
+        messages.append(MCPMessage(role=role, content=f"turn {index}: {WORDS}", agent_id=role))
+    return messages
+
+
+def total(messages) -> int:
+    return sum(message_tokens(message) for message in messages)
+
+
+def test_fitting_history_is_returned_unchanged():
+    messages = conversation(2)
+    assert ContextWindow(max_context_tokens=100000).fit(messages, "gpt-4o") is messages
+
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        ContextWindow(strategy="compress")
+
+
+@pytest.mark.parametrize("strategy", ["drop", "truncate", "summarize"])
+def test_strategies_fit_the_budget_and_keep_pinned_messages(strategy):
+    messages = conversation()
+    window = ContextWindow(strategy=strategy, max_context_tokens=total(messages) // 2, keep_recent=2,
+                           truncate_tokens=32, summary_tokens=64)
+    fitted = window.fit(messages, "gpt-4o")
+
+    assert total(fitted) <= window.budget("gpt-4o", 0)
+    assert fitted[0] is messages[0]
+    assert fitted[-2:] == messages[-2:]
+    if strategy == "truncate":
+        assert any(message.content.endswith(TRUNCATION_MARKER) for message in fitted)
+    if strategy == "summarize":
+        summary = fitted[1]
+        assert summary.get_metadata("type") == "context_summary"
+        assert messages[1].message_id in summary.references
+
+
+def test_referenced_messages_are_pinned():
+    messages = conversation()
+    messages.append(MCPMessage(role="user", content="follow up", agent_id="user",
+                               references=[messages[1].message_id]))
+    window = ContextWindow(strategy="drop", max_context_tokens=total(messages) // 3, keep_recent=1)
+    fitted = window.fit(messages, "gpt-4o")
+    assert messages[1] in fitted
+    assert messages[2] not in fitted
+
+
+def test_reductions_stick_between_calls():
+    messages = conversation()
+    window = ContextWindow(strategy="drop", max_context_tokens=total(messages) // 2, keep_recent=2)
+    first = window.fit(messages, "gpt-4o")
+    messages.append(MCPMessage(role="user", content="short", agent_id="user"))
+    second = window.fit(messages, "gpt-4o")
+    # The prompt prefix is unchanged, so providers can keep serving it from their cache
+    assert second[:len(first)] == first
+
+
+def test_summary_is_extended_incrementally():
+    calls = []
+
+    def summarizer(messages, previous):
+        calls.append((len(messages), previous))
+        return (previous or "") + f" {len(messages)} more"
+
+    messages = conversation()
+    window = ContextWindow(strategy="summarize", max_context_tokens=total(messages) // 2, keep_recent=2,
+                           summarizer=summarizer, low_watermark=1.0)
+    window.fit(messages, "gpt-4o")
+    window.fit(messages, "gpt-4o")
+    assert len(calls) == 1
+    messages.extend(conversation(4)[1:])
+    window.fit(messages, "gpt-4o")
+    assert len(calls) == 2 and calls[1][1] is not None
@@ -0,0 +1,151 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: test_policy.py
+@time: 10/18/26 00:20
+"""
+# tests/test_policy.py
+import asyncio
+from types import SimpleNamespace
+import pytest
+from agents.context import count_tokens
+from agents.mock_agent import MockAgent
+from agents.policy import (CallPolicy, CallTimeoutError, CircuitBreaker, CircuitOpenError, ProviderError,
+                           RateLimitError, classify_error, parse_reset)
+
+AGENT = SimpleNamespace(agent_id="agent", provider_name="Test", model="model")
+
+
+class StatusError(Exception):
+    def __init__(self, status_code: int):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def failing(status_code: int):
+    def fn(timeout):
+        raise StatusError(status_code)
+    return fn
+
+
+def half_open_policy() -> CallPolicy:
+    """Policy whose breaker for AGENT has just opened and already allows its trial call"""
+    policy = CallPolicy(max_retries=0, base_delay=0.0, failure_threshold=1, reset_timeout=0.0)
+    with pytest.raises(ProviderError):
+        policy.call(AGENT, failing(503))
+    assert policy.breaker("Test", "model").state == "half_open"
+    return policy
+
+
+def test_classify_and_parse_reset():
+    assert classify_error(StatusError(429)) == (RateLimitError, True)
+    assert classify_error(StatusError(503)) == (ProviderError, True)
+    assert classify_error(StatusError(400)) == (ProviderError, False)
+    assert parse_reset("6m0s") == 360.0
+    assert parse_reset("250ms") == 0.25
+    assert parse_reset("soon") is None
+
+
+def test_breaker_opens_and_allows_one_trial():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.admit() is True
+    assert breaker.admit() is None
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.admit() is False
+
+
+def test_open_breaker_fails_fast():
+    policy = CallPolicy(max_retries=0, failure_threshold=1, reset_timeout=60.0)
+    with pytest.raises(ProviderError):
+        policy.call(AGENT, failing(503))
+    with pytest.raises(CircuitOpenError):
+        policy.call(AGENT, lambda timeout: ("never", {}))
+
+
+def test_non_retryable_trial_releases_the_breaker():
+    policy = half_open_policy()
+    with pytest.raises(ProviderError):
+        policy.call(AGENT, failing(400))
+    # Another trial may run, and its success closes the breaker
+    assert policy.call(AGENT, lambda timeout: ("ok", {})) == "ok"
+    assert policy.breaker("Test", "model").state == "closed"
+
+
+def test_interrupted_trial_releases_the_breaker():
+    policy = half_open_policy()
+
+    def interrupted(timeout):
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        policy.call(AGENT, interrupted)
+    assert policy.call(AGENT, lambda timeout: ("ok", {})) == "ok"
+
+
+def test_cancelled_async_trial_releases_the_breaker():
+    policy = half_open_policy()
+
+    async def hang(timeout):
+        await asyncio.sleep(60)
+
+    async def ok(timeout):
+        return "ok", {}
+
+    async def main():
+        task = asyncio.ensure_future(policy.acall(AGENT, hang))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return await policy.acall(AGENT, ok)
+
+    assert asyncio.run(main()) == "ok"
+
+
+def test_retryable_errors_are_retried():
+    policy = CallPolicy(max_retries=2, base_delay=0.0)
+    attempts = []
+
+    def flaky(timeout):
+        attempts.append(timeout)
+        if len(attempts) < 3:
+            raise StatusError(503)
+        return "ok", {}
+
+    assert policy.call(AGENT, flaky) == "ok"
+    assert len(attempts) == 3
+
+
+def test_steady_stream_may_outlast_the_timeout():
+    policy = CallPolicy(max_retries=0, timeout=0.05)
+    content = " ".join(f"word{i}" for i in range(30))
+    agent = MockAgent("agent", "Agent", "assistant", responses=[content], call_policy=policy,
+                      tokens_per_second=count_tokens(content) / 0.2)
+    chunks = []
+
+    async def main():
+        return await agent.agenerate_response("q", on_chunk=chunks.append)
+
+    response = asyncio.run(main())
+    assert response.content == content and "".join(chunks) == content
+    assert agent.calls == 1 and response.get_metadata("metrics")["latency"] > 0.1
+
+
+def test_stalled_stream_times_out():
+    class StalledAgent(MockAgent):
+        async def _acreate_completion(self, messages, stream=False, timeout=None):
+            async def chunks():
+                await asyncio.sleep(60)
+                yield None
+            return chunks()
+
+    agent = StalledAgent("agent", "Agent", "assistant", call_policy=CallPolicy(max_retries=0, timeout=0.02))
+
+    async def main():
+        return await agent.agenerate_response("q", on_chunk=lambda text: None)
+
+    with pytest.raises(CallTimeoutError):
+        asyncio.run(asyncio.wait_for(main(), 5))
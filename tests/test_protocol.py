@@ -0,0 +1,51 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: test_protocol.py
+@time: 10/18/26 00:05
+"""
+# tests/test_protocol.py
+import json
+from agents.mock_agent import MockAgent
+from mcp.protocol import MCPMessage
+from orchestrator import Orchestrator
+
+
+def test_get_metadata_does_not_allocate():
+    message = MCPMessage(role="user", content="hi", agent_id="human")
+    assert message.get_metadata("metrics") is None
+    assert message.get_metadata("metrics", {}) == {}
+    assert message._metadata is None
+    message.metadata["node"] = "research"
+    assert message.get_metadata("node") == "research"
+
+
+def test_round_trip_keeps_metadata():
+    message = MCPMessage(role="assistant", content="notes", agent_id="a", references=["msg_1"],
+                         metadata={"final": True})
+    copy = MCPMessage.from_dict(message.to_dict())
+    assert copy.message_id == message.message_id
+    assert copy.references == ("msg_1",)
+    assert copy.get_metadata("final") is True
+
+
+def test_save_transcript_includes_metrics(tmp_path):
+    agents = [MockAgent("researcher_1", "ResearchBot", "information_gatherer", responses=["research"]),
+              MockAgent("synthesizer_1", "SynthBot", "critic_summarizer", responses=["synthesis"])]
+    orchestrator = Orchestrator(agents, verbose=False)
+    orchestrator.run_workflow("query", max_turns=1)
+    path = tmp_path / "transcript.json"
+    orchestrator.save_transcript(str(path))
+
+    saved = json.loads(path.read_text())
+    assert saved[0]["role"] == "user" and "metrics" not in saved[0]
+    replies = [entry for entry in saved if entry["role"] == "assistant"]
+    assert [entry["content"] for entry in replies] == ["research", "synthesis"]
+    assert all(entry["metrics"]["model"] == "mock" for entry in replies)
+
+
+def test_message_ids_are_64_bit():
+    ids = {MCPMessage(role="user", content="", agent_id="human").message_id for _ in range(1000)}
+    assert len(ids) == 1000
+    assert all(len(message_id) == len("msg_") + 16 for message_id in ids)
+    int(next(iter(ids))[len("msg_"):], 16)
@@ -0,0 +1,90 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: test_routing.py
+@time: 10/18/26 00:50
+"""
+# tests/test_routing.py
+import asyncio
+from typing import Any, Dict, List
+import pytest
+from agents.context import ContextWindow, count_tokens
+from agents.mock_agent import MockAgent
+from agents.policy import CallPolicy, ProviderError
+from agents.routing import QualityCheck, RoutedAgent, RoutingPolicy
+from mcp.protocol import MCPMessage
+
+SMALL, LARGE = "llama3-8b-8192", "gpt-4o"
+GOOD = " ".join(f"finding{index}" for index in range(60))
+
+
+def route(model: str, reply: str = GOOD, prompts: List[List[Dict[str, Any]]] = None, **options) -> MockAgent:
+    def respond(messages):
+        if prompts is not None:
+            prompts.append(list(messages))
+        return reply
+    return MockAgent("route", model, "route", model=model, responses=respond,
+                     call_policy=CallPolicy(max_retries=0, base_delay=0.0), **options)
+
+
+def routed(*routes: MockAgent, **options) -> RoutedAgent:
+    agent = RoutedAgent("researcher_1", "ResearchBot", "researcher", list(routes), policy=RoutingPolicy(), **options)
+    agent.add_message(MCPMessage(role="user", content="question", agent_id="human"))
+    return agent
+
+
+def test_quality_check():
+    check = QualityCheck(min_words=5)
+    assert check("too short") == "only 2 words"
+    assert check("I'm sorry, I can't help with that request today") == "refusal"
+    assert check("again " * 20) == "repetitive"
+    assert check(GOOD) is None
+
+
+def test_accepted_small_reply_is_kept():
+    response = routed(route(SMALL), route(LARGE, "large")).generate_response()
+    assert response.content == GOOD
+    assert response.metadata["metrics"]["route"] == f"Mock:{SMALL}"
+
+
+def test_rejected_small_reply_escalates():
+    response = routed(route(SMALL, "I'm sorry, I can't help."), route(LARGE, "large")).generate_response()
+    metrics = response.metadata["metrics"]
+    assert response.content == "large" and metrics["route"] == f"Mock:{LARGE}"
+    assert [attempt["escalation_reason"] for attempt in metrics["escalations"]] == ["only 7 words"]
+
+
+@pytest.mark.parametrize("status", [400, 503])
+def test_failing_small_route_escalates(status):
+    agent = routed(route(SMALL, error_rate=1.0, error_status=status), route(LARGE, "large"))
+    response = agent.generate_response()
+    assert response.content == "large"
+    [attempt] = response.metadata["metrics"]["escalations"]
+    assert attempt["escalation_reason"] == "error" and "ProviderError" in attempt["error"]
+
+    agent = routed(route(SMALL, error_rate=1.0, error_status=status), route(LARGE, "large"))
+    assert asyncio.run(agent.agenerate_response()).content == "large"
+
+
+def test_failing_last_route_raises():
+    agent = routed(route(SMALL, "no"), route(LARGE, error_rate=1.0, error_status=400))
+    with pytest.raises(ProviderError):
+        agent.generate_response()
+    assert agent.messages[-1].role == "user"
+
+
+def test_context_is_fitted_to_each_route():
+    small_prompts, large_prompts = [], []
+    agent = routed(route(SMALL, "no", small_prompts, max_tokens=512), route(LARGE, "large", large_prompts),
+                   context_window=ContextWindow(strategy="drop", keep_recent=2))
+    filler = "evidence " * 2000
+    for index in range(12):
+        agent.add_message(MCPMessage(role="user" if index % 2 else "assistant", content=f"{index} {filler}",
+                                     agent_id="researcher_1" if index % 2 == 0 else "human"))
+    agent.add_message(MCPMessage(role="user", content="next question", agent_id="human"))
+    agent.generate_response()
+
+    small_tokens = sum(count_tokens(message["content"]) for message in small_prompts[0])
+    assert small_tokens <= 8192 - 512
+    assert large_prompts[0][-1]["content"] == "next question"
+    assert len(large_prompts[0]) > len(small_prompts[0])
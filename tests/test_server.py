@@ -0,0 +1,153 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: test_server.py
+@time: 10/18/26 00:40
+"""
+# tests/test_server.py
+import asyncio
+import json
+import re
+from typing import Any, List, Tuple
+import pytest
+from agents.mock_agent import MockAgent
+from server import HTTPError, ResearchServer
+
+
+def make_agents():
+    return [MockAgent("researcher_1", "ResearchBot", "information_gatherer"),
+            MockAgent("synthesizer_1", "SynthBot", "critic_summarizer")]
+
+
+def test_prometheus_tenant_labels_are_escaped():
+    server = ResearchServer(make_agents, warm_agents=0)
+    server.submit("query", tenant='evil"} 1\nmcp_injected{a="\\')
+    text = server.to_prometheus()
+    assert "\nmcp_injected" not in text
+    assert 'tenant="evil\\"} 1\\nmcp_injected{a=\\"\\\\"' in text
+    sample = re.compile(r'^[a-z_]+\{(?:[a-z_]+="(?:[^"\\\n]|\\.)*",?)*\} \S+$')
+    assert all(line.startswith("#") or sample.match(line) for line in text.splitlines() if line)
+
+
+def exchange(server: ResearchServer, *raw_requests: bytes) -> List[Tuple[str, Any]]:
+    """Status line and JSON body of the server's answer to each raw HTTP request, one connection each"""
+    async def send(host: str, port: int, raw: bytes) -> bytes:
+        reader, writer = await asyncio.open_connection(host, port)
+        writer.write(raw)
+        await writer.drain()
+        response = await asyncio.wait_for(reader.read(), 5)
+        writer.close()
+        return response
+
+    async def main():
+        host, port = await server.start("127.0.0.1", 0)
+        try:
+            return [await send(host, port, raw) for raw in raw_requests]
+        finally:
+            await server.close(drain=False)
+
+    answers = []
+    for response in asyncio.run(main()):
+        head, _, body = response.partition(b"\r\n\r\n")
+        answers.append((head.split(b"\r\n")[0].decode(), json.loads(body or b"null")))
+    return answers
+
+
+def http(method: str, path: str, headers: str = "", body: bytes = b"") -> bytes:
+    return (f"{method} {path} HTTP/1.1\r\nConnection: close\r\n{headers}Content-Length: {len(body)}\r\n\r\n"
+            .encode("latin-1") + body)
+
+
+@pytest.mark.parametrize("length", [b"abc", b"-5", b"1_0", b"\xb2"])
+def test_malformed_content_length_is_a_bad_request(length):
+    [(status, body)] = exchange(ResearchServer(make_agents, warm_agents=0),
+                                b"POST /jobs HTTP/1.1\r\nContent-Length: " + length + b"\r\n\r\n{}")
+    assert status == "HTTP/1.1 400 Bad Request"
+    assert "Content-Length" in body["error"]
+
+
+def test_job_cancelled_before_it_starts_releases_its_slot():
+    async def main():
+        server = ResearchServer(make_agents, warm_agents=0, tenant_concurrency=1)
+        job = server.submit("query", tenant="team")
+        server._start_job(server._next_job())
+        assert server.running == 1
+        job.task.cancel()
+        await asyncio.gather(job.task, return_exceptions=True)
+        await asyncio.sleep(0)
+        return server, job
+
+    server, job = asyncio.run(main())
+    assert server.running == 0
+    assert job.status == "cancelled" and job.done
+    assert server.stats()["tenants"]["team"]["cancelled"] == 1
+    assert job.events[-1][0] == "done"
+
+
+def test_finished_job_is_recorded_once():
+    async def main():
+        server = ResearchServer(make_agents, warm_agents=0)
+        job = server.submit("query")
+        server._start_job(server._next_job())
+        await job.task
+        await asyncio.sleep(0)
+        return server, job
+
+    server, job = asyncio.run(main())
+    assert job.status == "ok" and job.synthesis
+    assert server.running == 0 and not server._queues
+    assert server.stats()["tenants"]["default"]["ok"] == 1
+
+
+def test_api_keys_decide_the_tenant():
+    server = ResearchServer(make_agents, warm_agents=0, api_keys={"key-a": "team-a", "key-b": "team-b"})
+    query = json.dumps({"query": "q", "tenant": "someone-else"}).encode()
+    (missing, _), (unknown, _), (accepted, job) = exchange(
+        server, http("POST", "/jobs", body=query), http("POST", "/jobs", "Authorization: Bearer nope\r\n", query),
+        http("POST", "/jobs", "X-Tenant: someone-else\r\nAuthorization: Bearer key-a\r\n", query))
+    assert missing == unknown == "HTTP/1.1 401 Unauthorized"
+    assert accepted == "HTTP/1.1 202 Accepted" and job["tenant"] == "team-a"
+
+    server = ResearchServer(make_agents, warm_agents=0, api_keys={"key-a": "team-a", "key-b": "team-b"})
+    job = server.submit("q", tenant="team-a")
+    (own, _), (other, _), (stats, _) = exchange(
+        server, http("GET", f"/jobs/{job.id}", "X-API-Key: key-a\r\n"),
+        http("DELETE", f"/jobs/{job.id}", "X-API-Key: key-b\r\n"), http("GET", "/stats"))
+    assert own == "HTTP/1.1 200 OK"
+    assert other == "HTTP/1.1 404 Not Found"
+    assert stats == "HTTP/1.1 200 OK"
+
+
+def test_tenant_tables_are_bounded():
+    server = ResearchServer(make_agents, warm_agents=0, max_tenants=2)
+    first = server.submit("q", tenant="a")
+    server.submit("q", tenant="b")
+    with pytest.raises(HTTPError) as rejected:
+        server.submit("q", tenant="c")
+    assert rejected.value.status == 429
+
+    # A tenant with nothing queued or running frees its place
+    server.cancel(first)
+    server.submit("q", tenant="c")
+    assert set(server._queues) == {"b", "c"}
+    for tenant in ("d", "e", "f"):
+        server._count(tenant, "ok")
+    assert len(server._tenant_counts) == 2
+
+
+@pytest.mark.parametrize("drain", [True, False])
+def test_close_with_jobs_queued_for_several_tenants(drain):
+    async def main():
+        server = ResearchServer(make_agents, warm_agents=0, max_concurrency=1)
+        await server.start("127.0.0.1", 0)
+        jobs = [server.submit("q", tenant=tenant) for tenant in ("a", "b", "b", "c")]
+        await asyncio.sleep(0)
+        assert server.running == 1 and server.queued == 3
+        await asyncio.wait_for(server.close(drain=drain), 5)
+        return server, jobs
+
+    server, jobs = asyncio.run(main())
+    assert server.running == server.queued == 0 and not server._queues
+    assert all(job.done for job in jobs)
+    assert [job.status for job in jobs[1:]] == ["cancelled"] * 3
+    assert jobs[0].status == ("ok" if drain else "cancelled")
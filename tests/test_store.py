@@ -0,0 +1,63 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: test_store.py
+@time: 10/18/26 00:10
+"""
+# tests/test_store.py
+import pytest
+from mcp.protocol import MCPMessage
+from mcp.store import MessageStore, MessageView
+
+
+def message(content: str, agent_id: str = "a", references=None, message_id=None) -> MCPMessage:
+    return MCPMessage(role="assistant", content=content, agent_id=agent_id, references=references,
+                      message_id=message_id)
+
+
+def test_add_is_idempotent_per_message():
+    store = MessageStore()
+    first = message("one")
+    assert store.add(first) == 0
+    assert store.add(first) == 0
+    # A copy of the same message, e.g. restored from a checkpoint, maps to the stored one
+    assert store.add(MCPMessage.from_dict(first.to_dict())) == 0
+    assert len(store) == 1
+
+
+def test_add_rejects_a_different_message_under_a_stored_id():
+    store = MessageStore()
+    store.add(message("one", message_id="msg_1"))
+    with pytest.raises(ValueError, match="msg_1"):
+        store.add(message("two", message_id="msg_1"))
+    assert store.get("msg_1").content == "one"
+
+
+def test_indexes_by_agent_and_reference():
+    store = MessageStore()
+    query = message("query", agent_id="human")
+    research = message("research", agent_id="researcher", references=[query.message_id])
+    synthesis = message("synthesis", agent_id="synthesizer", references=[research.message_id, "msg_unknown"])
+    for item in (query, research, synthesis):
+        store.add(item)
+
+    assert store.by_agent("researcher") == [research]
+    assert store.references(synthesis) == [research]
+    assert store.referenced_by(query.message_id) == [research]
+    assert store.reference_chain(synthesis.message_id) == [research, query]
+    assert store.get("msg_unknown") is None and "msg_unknown" not in store
+
+
+def test_views_share_stored_messages():
+    store = MessageStore()
+    history, context = store.view(), store.view()
+    shared = message("shared")
+    history.append(shared)
+    history.append(message("history only"))
+    context.append(shared)
+
+    assert len(store) == 2
+    assert context[0] is history[0]
+    assert [item.content for item in history[-1:]] == ["history only"]
+    assert list(MessageView.from_slots(store, history.slots)) == list(history)
+    assert not store.view() and context
@@ -0,0 +1,52 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: test_transcript.py
+@time: 10/18/26 00:15
+"""
+# tests/test_transcript.py
+import argparse
+import pytest
+from agents.mock_agent import MockAgent
+from mcp.protocol import MCPMessage
+from mcp.transcript import TranscriptWriter, read_transcript
+from orchestrator import Orchestrator
+from run import open_transcript
+
+
+def run_once(path: str, query: str, append: bool = False):
+    agents = [MockAgent("researcher_1", "ResearchBot", "information_gatherer"),
+              MockAgent("synthesizer_1", "SynthBot", "critic_summarizer")]
+    with TranscriptWriter(path, append=append) as transcript:
+        Orchestrator(agents, verbose=False, transcript=transcript).run_workflow(query, max_turns=1)
+
+
+@pytest.mark.parametrize("name", ["transcript.jsonl", "transcript.jsonl.gz"])
+def test_new_run_replaces_existing_transcript(tmp_path, name):
+    path = str(tmp_path / name)
+    run_once(path, "first query")
+    run_once(path, "second query")
+    messages = list(read_transcript(path))
+    assert messages[0].content == "second query"
+    assert [message.content for message in messages].count("first query") == 0
+    assert len({message.message_id for message in messages}) == len(messages)
+
+
+def test_append_continues_transcript(tmp_path):
+    path = str(tmp_path / "transcript.jsonl")
+    with TranscriptWriter(path) as transcript:
+        transcript.write(MCPMessage(role="user", content="query", agent_id="human"), "Human")
+    with TranscriptWriter(path, append=True) as transcript:
+        transcript.write(MCPMessage(role="assistant", content="reply", agent_id="a"), "Bot")
+    assert [message.content for message in read_transcript(path)] == ["query", "reply"]
+
+
+def test_open_transcript_appends_only_when_asked(tmp_path):
+    path = tmp_path / "transcript.jsonl"
+    path.write_text('{"role":"user","content":"old","mcp":{}}\n')
+    args = argparse.Namespace(fsync_every=None)
+    open_transcript(str(path), args, append=True).close()
+    assert path.read_text().startswith('{"role":"user","content":"old"')
+    open_transcript(str(path), args).close()
+    assert path.read_text() == ""
+    assert open_transcript(str(tmp_path / "transcript.json"), args) is None
@@ -0,0 +1,78 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: test_transcript_index.py
+@time: 10/18/26 00:45
+"""
+# tests/test_transcript_index.py
+import os
+import pytest
+from agents.mock_agent import MockAgent
+from mcp.transcript import TranscriptWriter
+from orchestrator import Orchestrator
+from transcript_index import TranscriptIndex, jaccard, query_shingles, seed_message
+
+QUERY = "Impact of quantum computing on banking encryption"
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = TranscriptIndex(str(tmp_path / "index.sqlite"))
+    yield index
+    index.close()
+
+
+def write_run(path: str, query: str, synthesis: str):
+    """Transcript of a one-turn workflow whose synthesizer answers synthesis"""
+    agents = [MockAgent("researcher_1", "ResearchBot", "information_gatherer", responses=["research notes"]),
+              MockAgent("synthesizer_1", "SynthBot", "critic_summarizer", responses=[synthesis])]
+    with TranscriptWriter(path) as transcript:
+        Orchestrator(agents, verbose=False, transcript=transcript).run_workflow(query, max_turns=1)
+
+
+def test_similar_queries_are_found(index):
+    index.add_entry("a", QUERY, "Banks should migrate to post-quantum schemes.")
+    index.add_entry("b", "History of the printing press", "Gutenberg changed everything.")
+    index.add_entry("c", "Impact of quantum computing", None)
+    index.commit()
+
+    assert len(index) == 2
+    match = index.best_match("Impact of quantum computing on banking encryption standards", threshold=0.6)
+    assert match.path == "a" and match.synthesis.startswith("Banks")
+    assert match.similarity == pytest.approx(jaccard(query_shingles(QUERY), query_shingles(
+        "Impact of quantum computing on banking encryption standards")))
+    assert index.best_match("Recipes for sourdough bread") is None
+    assert "Banks should migrate" in seed_message(match).content
+
+
+def test_unchanged_files_are_skipped(tmp_path, index):
+    path = str(tmp_path / "run.jsonl")
+    write_run(path, QUERY, "first synthesis")
+    assert index.add_paths([str(tmp_path)]) == (1, 0)
+    assert index.add_paths([str(tmp_path)]) == (0, 1)
+    assert index.best_match(QUERY).synthesis == "first synthesis"
+
+
+def test_runs_sharing_an_output_file_keep_their_own_entries(tmp_path, index):
+    path = str(tmp_path / "mcp_transcript.jsonl")
+    write_run(path, QUERY, "first synthesis")
+    first = index.add_run(path)
+    write_run(path, "History of the printing press", "second synthesis")
+    second = index.add_run(path)
+    index.commit()
+
+    assert first != second and first.endswith(".jsonl") and os.path.dirname(first) == index.runs_dir
+    assert len(index) == 2
+    match = index.best_match(QUERY)
+    assert match.path == first and match.synthesis == "first synthesis"
+
+
+def test_search_accepts_fts5_syntax_and_plain_text(index):
+    index.add_entry("a", QUERY, "Lattice cryptography and hash-based signatures resist quantum attacks.")
+    index.add_entry("b", "History of the printing press", "Movable type spread literacy.")
+    index.commit()
+
+    assert [row[0] for row in index.search("lattice AND cryptography")] == ["a"]
+    assert [row[0] for row in index.search("hash-based")] == ["a"]
+    assert [row[0] for row in index.search('movable "type')] == ["b"]
+    assert index.search("   ") == []
@@ -0,0 +1,85 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: test_workflow.py
+@time: 10/18/26 00:35
+"""
+# tests/test_workflow.py
+import asyncio
+from typing import Any, Dict, List, Optional
+from agents.mock_agent import MockAgent
+from mcp.protocol import MCPMessage
+from orchestrator import Orchestrator
+from workflow import NodeCache, WorkflowRunner, default_workflow
+
+QUERY = "Research the impact of quantum computing on encryption standards"
+
+
+def seed(synthesis: str = "Earlier synthesis") -> MCPMessage:
+    return MCPMessage(role="user", content=f"Prior research: {synthesis}", agent_id="orchestrator",
+                      metadata={"type": "prior_research"})
+
+
+def make_agents(prompts: Dict[str, List[List[Dict[str, Any]]]],
+                agent_ids=("researcher_1", "synthesizer_1")) -> List[MockAgent]:
+    """Agents recording the messages of each of their calls"""
+    def responder(agent_id: str):
+        def respond(messages):
+            prompts.setdefault(agent_id, []).append(list(messages))
+            return f"{agent_id} reply {len(prompts[agent_id])}"
+        return respond
+    return [MockAgent(agent_id, agent_id, "tester", responses=responder(agent_id)) for agent_id in agent_ids]
+
+
+def run_graph(node_cache: Optional[NodeCache] = None, seed_message: Optional[MCPMessage] = None):
+    prompts: Dict[str, List[List[Dict[str, Any]]]] = {}
+    orchestrator = Orchestrator(make_agents(prompts), verbose=False, seed=seed_message)
+    runner = WorkflowRunner(orchestrator, default_workflow(max_turns=2), node_cache)
+    runner.run(QUERY)
+    return orchestrator, runner, prompts
+
+
+def contents(messages: List[Dict[str, Any]]) -> List[str]:
+    return [message["content"] for message in messages if message["role"] != "system"]
+
+
+def test_graph_seeds_each_agent_after_its_query():
+    orchestrator, _, prompts = run_graph(seed_message=seed())
+    assert contents(prompts["researcher_1"][0]) == [QUERY, "Prior research: Earlier synthesis"]
+    synthesizer_first = contents(prompts["synthesizer_1"][0])
+    assert synthesizer_first[0] == "researcher_1 reply 1"
+    assert synthesizer_first[-1] == "Prior research: Earlier synthesis"
+    history = [message.content for message in orchestrator.conversation_history]
+    assert history[:2] == [QUERY, "Prior research: Earlier synthesis"]
+
+
+def test_sequential_and_graph_workflows_send_the_same_first_prompt():
+    prompts: Dict[str, List[List[Dict[str, Any]]]] = {}
+    orchestrator = Orchestrator(make_agents(prompts), verbose=False, seed=seed())
+    orchestrator.run_workflow(QUERY, max_turns=1)
+    _, _, graph_prompts = run_graph(seed_message=seed())
+    assert contents(prompts["researcher_1"][0]) == contents(graph_prompts["researcher_1"][0])
+
+
+def test_node_hash_depends_on_the_seed(tmp_path):
+    node_cache = NodeCache(str(tmp_path / "nodes.json"))
+    _, first, _ = run_graph(node_cache, seed("Earlier synthesis"))
+    _, same, prompts = run_graph(node_cache, seed("Earlier synthesis"))
+    assert same.reused == 4 and not prompts
+    _, changed, prompts = run_graph(node_cache, seed("A different synthesis"))
+    assert changed.reused == 0 and len(prompts["researcher_1"]) == 2
+    _, unseeded, _ = run_graph(node_cache)
+    assert unseeded.reused == 0
+
+
+def test_fanout_hands_out_questions_before_the_seed():
+    prompts: Dict[str, List[List[Dict[str, Any]]]] = {}
+    agents = make_agents(prompts, ("researcher_1", "researcher_2", "synthesizer_1"))
+    orchestrator = Orchestrator(agents, verbose=False, seed=seed())
+    asyncio.run(orchestrator.arun_fanout_workflow(QUERY, [QUERY, "What about symmetric keys?"], max_turns=1))
+    assert contents(prompts["researcher_1"][0]) == [QUERY, "Prior research: Earlier synthesis"]
+    second = contents(prompts["researcher_2"][0])
+    assert "What about symmetric keys?" in second[0]
+    assert second[1] == "Prior research: Earlier synthesis"
+    history = [message.content for message in orchestrator.conversation_history]
+    assert history[0] == QUERY
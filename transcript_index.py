@@ -0,0 +1,253 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: transcript_index.py
+@time: 10/17/26 21:45
+"""
+# transcript_index.py
+import glob
+import os
+import random
+import re
+import shutil
+import sqlite3
+import struct
+import time
+import uuid
+import zlib
+from typing import Iterable, List, Optional, Set, Tuple
+from mcp.protocol import MCPMessage
+from mcp.transcript import JSONL_SUFFIXES, read_transcript
+
+_WORD = re.compile(r"\w+")
+_MERSENNE_PRIME = (1 << 61) - 1
+TRANSCRIPT_SUFFIXES = (".json",) + JSONL_SUFFIXES
+
+PRIOR_RESEARCH_PROMPT = """Earlier research on a similar question ("{query}") reached this synthesis:
+{synthesis}
+Build on it rather than starting over: confirm what still holds, correct what does not, and focus on what it left open."""
+
+
+def query_shingles(text: str) -> Set[str]:
+    """Words and word pairs of text, lower-cased; short queries need both to compare well"""
+    words = _WORD.findall(text.lower())
+    return set(words) | {f"{a} {b}" for a, b in zip(words, words[1:])}
+
+
+def fts5_terms(text: str) -> str:
+    """text as an FTS5 query matching all of its whitespace-separated terms literally"""
+    return " ".join('"' + term.replace('"', '""') + '"' for term in text.split())
+
+
+def jaccard(a: Set[str], b: Set[str]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class IndexMatch:
+    """A past transcript whose query resembles the one looked up"""
+
+    def __init__(self, path: str, query: str, synthesis: str, similarity: float):
+        self.path = path
+        self.query = query
+        self.synthesis = synthesis
+        self.similarity = similarity
+
+    def __repr__(self) -> str:
+        return f"IndexMatch({self.path!r}, similarity={self.similarity:.3f})"
+
+
+def seed_message(match: IndexMatch) -> MCPMessage:
+    """Message handing a past synthesis to the agents of a new workflow, see Orchestrator's seed"""
+    return MCPMessage(
+        role="user",
+        content=PRIOR_RESEARCH_PROMPT.format(query=match.query, synthesis=match.synthesis),
+        agent_id="orchestrator",
+        metadata={"type": "prior_research", "source": match.path, "similarity": round(match.similarity, 4)}
+    )
+
+
+class TranscriptIndex:
+    """SQLite index of past transcripts for finding earlier research on a similar query.
+
+    Each transcript contributes its query (the first human message) and its
+    synthesis (the last assistant message). Queries and syntheses go into an
+    FTS5 full-text index, and each query also gets a MinHash signature split
+    into bands for locality-sensitive hashing: similar queries share a band
+    with high probability, so a lookup reads a few indexed rows instead of
+    scanning every transcript. Candidates are then scored by the exact
+    Jaccard similarity of their word and word-pair sets. Adding the same
+    unchanged file again is a no-op, so add_paths can be rerun over a
+    growing directory. Entries are keyed by file path, so add_run files each
+    finished run under a copy of its own in runs_dir (default: next to the
+    index) instead. add, add_run and add_entry leave their transaction open
+    for bulk loading; call commit afterwards (add_paths commits by itself).
+    """
+
+    def __init__(self, path: str = ".mcp_index.sqlite", num_perm: int = 64, bands: int = 16, seed: int = 1,
+                 runs_dir: Optional[str] = None):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.path = path
+        self.runs_dir = runs_dir or f"{os.path.splitext(path)[0]}_runs"
+        self.num_perm = num_perm
+        self.bands = bands
+        generator = random.Random(seed)
+        self._permutations = [(generator.randrange(1, _MERSENNE_PRIME), generator.randrange(_MERSENNE_PRIME))
+                              for _ in range(num_perm)]
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS transcripts ("
+            "id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, mtime REAL, size INTEGER, "
+            "query TEXT, synthesis TEXT, indexed REAL NOT NULL);"
+            "CREATE VIRTUAL TABLE IF NOT EXISTS transcripts_fts USING fts5(query, synthesis);"
+            "CREATE TABLE IF NOT EXISTS bands (band INTEGER NOT NULL, hash INTEGER NOT NULL, id INTEGER NOT NULL);"
+            "CREATE INDEX IF NOT EXISTS bands_lookup ON bands (band, hash);"
+            "CREATE INDEX IF NOT EXISTS bands_id ON bands (id);"
+        )
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM transcripts WHERE synthesis IS NOT NULL").fetchone()[0]
+
+    # Signatures
+
+    def signature(self, shingles: Set[str]) -> List[int]:
+        """MinHash of a shingle set: per permutation, the minimum hash over its shingles"""
+        hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles] or [0]
+        return [min((a * h + b) % _MERSENNE_PRIME for h in hashes) for a, b in self._permutations]
+
+    def _band_hashes(self, signature: List[int]) -> List[int]:
+        rows = self.num_perm // self.bands
+        return [zlib.crc32(struct.pack(f"<{rows}Q", *signature[band * rows:(band + 1) * rows]))
+                for band in range(self.bands)]
+
+    # Ingestion
+
+    def add_entry(self, path: str, query: str, synthesis: Optional[str], mtime: float = 0.0, size: int = 0):
+        """Index one transcript's query and synthesis, replacing what was indexed for path before"""
+        row = self._conn.execute("SELECT id FROM transcripts WHERE path = ?", (path,)).fetchone()
+        if row is not None:
+            self._remove(row[0])
+        cursor = self._conn.execute(
+            "INSERT INTO transcripts (path, mtime, size, query, synthesis, indexed) VALUES (?, ?, ?, ?, ?, ?)",
+            (path, mtime, size, query, synthesis, time.time())
+        )
+        if synthesis is None:
+            return
+        transcript_id = cursor.lastrowid
+        self._conn.execute("INSERT INTO transcripts_fts (rowid, query, synthesis) VALUES (?, ?, ?)",
+                           (transcript_id, query, synthesis))
+        self._conn.executemany("INSERT INTO bands (band, hash, id) VALUES (?, ?, ?)",
+                               [(band, band_hash, transcript_id) for band, band_hash
+                                in enumerate(self._band_hashes(self.signature(query_shingles(query))))])
+
+    def _remove(self, transcript_id: int):
+        self._conn.execute("DELETE FROM transcripts WHERE id = ?", (transcript_id,))
+        self._conn.execute("DELETE FROM transcripts_fts WHERE rowid = ?", (transcript_id,))
+        self._conn.execute("DELETE FROM bands WHERE id = ?", (transcript_id,))
+
+    def add(self, path: str) -> bool:
+        """Index a transcript file unless it is indexed and unchanged; returns whether it was (re)indexed"""
+        stat = os.stat(path)
+        path = os.path.abspath(path)
+        row = self._conn.execute("SELECT mtime, size FROM transcripts WHERE path = ?", (path,)).fetchone()
+        if row is not None and row[0] == stat.st_mtime and row[1] == stat.st_size:
+            return False
+        query, human_query, synthesis = None, None, None
+        for message in read_transcript(path):
+            if message.role == "user":
+                query = query or message.content
+                if message.agent_id == "human" and human_query is None:
+                    human_query = message.content
+            elif message.role == "assistant":
+                synthesis = message.content
+        query = human_query or query
+        self.add_entry(path, query or "", synthesis, stat.st_mtime, stat.st_size)
+        return True
+
+    def add_run(self, path: str) -> str:
+        """Index a finished run's transcript under a unique copy in runs_dir; returns the copy's path.
+
+        Runs usually write the same output file, which a plain add would
+        re-index in place of the previous run's entry.
+        """
+        suffix = next((suffix for suffix in TRANSCRIPT_SUFFIXES if path.endswith(suffix)), "")
+        os.makedirs(self.runs_dir, exist_ok=True)
+        copy = os.path.join(self.runs_dir, f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}{suffix}")
+        shutil.copyfile(path, copy)
+        self.add(copy)
+        return copy
+
+    def add_paths(self, paths: Iterable[str]) -> Tuple[int, int]:
+        """Index transcript files and the transcripts in directories (recursively); returns (added, skipped)"""
+        added = skipped = 0
+        files = []
+        for path in paths:
+            if os.path.isdir(path):
+                files += sorted(name for name in glob.glob(os.path.join(glob.escape(path), "**", "*"), recursive=True)
+                                if name.endswith(TRANSCRIPT_SUFFIXES))
+            else:
+                files.append(path)
+        with self._conn:
+            for path in files:
+                try:
+                    if self.add(path):
+                        added += 1
+                    else:
+                        skipped += 1
+                except (OSError, ValueError, KeyError, TypeError):  # not a transcript, or unreadable
+                    skipped += 1
+        return added, skipped
+
+    # Lookup
+
+    def find_similar(self, query: str, threshold: float = 0.7, limit: int = 5) -> List[IndexMatch]:
+        """Indexed transcripts whose query has a Jaccard similarity of at least threshold, best first.
+
+        Only transcripts sharing a MinHash band are scored. With the default
+        16 bands of 4 rows, a query with similarity 0.7 shares one with
+        probability 0.99, one with similarity 0.5 only with 0.64; keep
+        thresholds at 0.6 or above, or use more bands of fewer rows.
+        """
+        shingles = query_shingles(query)
+        clauses = " OR ".join(["(band = ? AND hash = ?)"] * self.bands)
+        params = [value for pair in enumerate(self._band_hashes(self.signature(shingles))) for value in pair]
+        candidates = list({row[0] for row in self._conn.execute(f"SELECT id FROM bands WHERE {clauses}", params)})
+        matches = []
+        for chunk_start in range(0, len(candidates), 500):
+            chunk = candidates[chunk_start:chunk_start + 500]
+            for path, past_query, synthesis in self._conn.execute(
+                    f"SELECT path, query, synthesis FROM transcripts WHERE id IN ({','.join('?' * len(chunk))})",
+                    chunk):
+                similarity = jaccard(shingles, query_shingles(past_query))
+                if similarity >= threshold:
+                    matches.append(IndexMatch(path, past_query, synthesis, similarity))
+        matches.sort(key=lambda match: match.similarity, reverse=True)
+        return matches[:limit]
+
+    def best_match(self, query: str, threshold: float = 0.7) -> Optional[IndexMatch]:
+        matches = self.find_similar(query, threshold, limit=1)
+        return matches[0] if matches else None
+
+    def search(self, text: str, limit: int = 10) -> List[Tuple[str, str, float]]:
+        """Full-text search over queries and syntheses; (path, query, bm25 score) best first.
+
+        text may use the FTS5 query syntax (AND, OR, NOT, "phrases", prefix*).
+        If FTS5 rejects it, e.g. "foo-bar" parses as a column filter, its
+        terms are searched for literally instead.
+        """
+        sql = ("SELECT t.path, t.query, bm25(transcripts_fts) FROM transcripts_fts JOIN transcripts t "
+               "ON t.id = transcripts_fts.rowid WHERE transcripts_fts MATCH ? ORDER BY rank LIMIT ?")
+        try:
+            return self._conn.execute(sql, (text, limit)).fetchall()
+        except sqlite3.OperationalError:
+            terms = fts5_terms(text)
+            return self._conn.execute(sql, (terms, limit)).fetchall() if terms else []
+
+    def commit(self):
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,430 @@
+"""
+@author: bfx
+@version: 1.0.0
+@file: workflow.py
+@time: 10/17/26 16:20
+"""
+# workflow.py
+import asyncio
+import hashlib
+import json
+import os
+import string
+from typing import Any, Dict, List, Optional, Set
+from mcp.protocol import MCPMessage
+from mcp.tracing import span
+from agents.base import BaseAgent
+from agents.policy import AgentCallError
+from convergence import ConvergencePolicy
+from orchestrator import (Orchestrator, RESEARCHER_PROMPT, SYNTHESIZER_PROMPT, SYNTH_PROMPT,
+                          FOLLOWUP_PROMPT)
+
+# Name of the implicit input holding the user's query
+QUERY_INPUT = "query"
+
+
+class WorkflowNode:
+    """One step of a workflow graph.
+
+    Agent nodes hand their inputs to the agent, add the rendered prompt (if
+    any) and let the agent respond. Template nodes (no agent) only render
+    their template into an orchestrator message, e.g. to combine results.
+    Prompts and templates are str.format templates over {query} and the ids
+    of the node's inputs. Outputs of nodes marked converges are compared
+    with the previous such output by the runner's convergence policy.
+    """
+
+    def __init__(self, node_id: str, agent: Optional[str] = None, prompt: Optional[str] = None,
+                 template: Optional[str] = None, inputs: Optional[List[str]] = None, converges: bool = False,
+                 turn: Optional[int] = None):
+        self.id = node_id
+        self.agent = agent
+        self.prompt = prompt
+        self.template = template
+        self.inputs = list(inputs or [])
+        self.converges = converges
+        # Turn the node's metrics are reported under (default: its wave number)
+        self.turn = turn
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "WorkflowNode":
+        return cls(data["id"], data.get("agent"), data.get("prompt"), data.get("template"), data.get("inputs"),
+                   data.get("converges", False), data.get("turn"))
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {"id": self.id, "inputs": self.inputs}
+        for key in ("agent", "prompt", "template"):
+            if getattr(self, key) is not None:
+                data[key] = getattr(self, key)
+        if self.converges:
+            data["converges"] = True
+        if self.turn is not None:
+            data["turn"] = self.turn
+        return data
+
+    def fields(self) -> Set[str]:
+        """Placeholder names used by the prompt or template"""
+        text = self.prompt if self.agent else self.template
+        return {name for _, name, _, _ in string.Formatter().parse(text or "") if name}
+
+
+class WorkflowGraph:
+    """A workflow as a DAG of nodes whose edges carry MCPMessages.
+
+    agents maps agent ids to their settings (provider, model, name, role,
+    system_prompt), used by run.py to build the agents. output names the
+    node whose message is the workflow's result (default: the last node).
+    """
+
+    def __init__(self, name: str, nodes: List[WorkflowNode], agents: Optional[Dict[str, Dict[str, Any]]] = None,
+                 output: Optional[str] = None, turns: int = 1):
+        self.name = name
+        self.nodes = nodes
+        self.agents = agents or {}
+        self.output = output or (nodes[-1].id if nodes else None)
+        self.turns = turns
+        self._waves = self._validate()
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "WorkflowGraph":
+        nodes = [WorkflowNode.from_dict(node) for node in data.get("nodes", [])]
+        return cls(data.get("name", "workflow"), nodes, data.get("agents"), data.get("output"), data.get("turns", 1))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "agents": self.agents,
+            "nodes": [node.to_dict() for node in self.nodes],
+            "output": self.output,
+            "turns": self.turns
+        }
+
+    def _validate(self) -> List[List[WorkflowNode]]:
+        """Check the graph and split it into waves of nodes whose inputs are all in earlier waves"""
+        by_id: Dict[str, WorkflowNode] = {}
+        for node in self.nodes:
+            if node.id in by_id or node.id == QUERY_INPUT:
+                raise ValueError(f"Duplicate or reserved node id: {node.id}")
+            if (node.agent is None) == (node.template is None):
+                raise ValueError(f"Node {node.id} needs either an agent or a template")
+            if self.agents and node.agent is not None and node.agent not in self.agents:
+                raise ValueError(f"Node {node.id} uses unknown agent {node.agent}")
+            by_id[node.id] = node
+        for node in self.nodes:
+            for name in node.inputs:
+                if name != QUERY_INPUT and name not in by_id:
+                    raise ValueError(f"Node {node.id} has unknown input {name}")
+            unknown = node.fields() - set(node.inputs) - {QUERY_INPUT}
+            if unknown:
+                raise ValueError(f"Node {node.id} uses placeholders that are not inputs: {sorted(unknown)}")
+        if self.output is not None and self.output not in by_id:
+            raise ValueError(f"Unknown output node: {self.output}")
+
+        waves = []
+        done = {QUERY_INPUT}
+        remaining = list(self.nodes)
+        while remaining:
+            wave = [node for node in remaining if all(name in done for name in node.inputs)]
+            if not wave:
+                raise ValueError(f"Workflow {self.name} has a cycle among {[node.id for node in remaining]}")
+            waves.append(wave)
+            done.update(node.id for node in wave)
+            remaining = [node for node in remaining if node.id not in done]
+        return waves
+
+    def waves(self) -> List[List[WorkflowNode]]:
+        """Nodes grouped into waves; nodes in the same wave are independent"""
+        return self._waves
+
+    def dependents(self, node_id: str) -> Set[str]:
+        """Ids of all nodes that depend on node_id, directly or indirectly"""
+        found: Set[str] = set()
+        frontier = {node_id}
+        while frontier:
+            frontier = {node.id for node in self.nodes
+                        if node.id not in found and frontier.intersection(node.inputs)}
+            found |= frontier
+        return found
+
+
+def load_workflow(path: str) -> WorkflowGraph:
+    """Load a workflow graph from a .json, .yaml or .yml file"""
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml  # optional dependency, imported here since most runs never read YAML
+            except ImportError:
+                raise ImportError("YAML workflows need the pyyaml package; use a .json workflow instead")
+            data = yaml.safe_load(f)
+        else:
+            data = json.load(f)
+    return WorkflowGraph.from_dict(data)
+
+
+def default_workflow(max_turns: int = 3, researcher: Optional[Dict[str, Any]] = None,
+                     synthesizer: Optional[Dict[str, Any]] = None) -> WorkflowGraph:
+    """The built-in researcher → synthesizer → researcher loop as a graph.
+
+    researcher/synthesizer override the agents' settings (e.g. provider and
+    model). Step numbers match Orchestrator.run_workflow.
+    """
+    agents = {
+        "researcher_1": {"name": "ResearchBot", "role": "information_gatherer", "system_prompt": RESEARCHER_PROMPT,
+                         **(researcher or {})},
+        "synthesizer_1": {"name": "SynthBot", "role": "critic_summarizer", "system_prompt": SYNTHESIZER_PROMPT,
+                          **(synthesizer or {})}
+    }
+    nodes = []
+    previous = QUERY_INPUT
+    for turn in range(1, max_turns + 1):
+        nodes.append(WorkflowNode(f"research_{turn}", agent="researcher_1", inputs=[previous],
+                                  prompt=FOLLOWUP_PROMPT if turn > 1 else None, turn=turn))
+        nodes.append(WorkflowNode(f"synthesis_{turn}", agent="synthesizer_1", inputs=[f"research_{turn}"],
+                                  prompt=SYNTH_PROMPT, converges=True, turn=turn))
+        previous = f"synthesis_{turn}"
+    return WorkflowGraph("research_synthesis", nodes, agents, turns=max_turns)
+
+
+class NodeCache:
+    """JSON file of node results keyed by a hash of everything the node's output depends on"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._results: Dict[str, Dict[str, str]] = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self._results = json.load(f)
+
+    def get(self, node_hash: str) -> Optional[str]:
+        result = self._results.get(node_hash)
+        return result["content"] if result else None
+
+    def set(self, node_hash: str, node_id: str, content: str):
+        self._results[node_hash] = {"node": node_id, "content": content}
+        self.save()
+
+    def save(self):
+        """Write atomically, so an interrupted run never leaves a corrupt file"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._results, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+class WorkflowRunner:
+    """Runs a WorkflowGraph on an orchestrator's agents.
+
+    Waves run one after another; within a wave, nodes of different agents
+    run concurrently and nodes of the same agent run in definition order,
+    since each agent has one conversation. Every node gets a hash of its
+    prompt, its inputs' hashes, its agent's settings and the agent's previous
+    node; with a NodeCache, nodes whose hash is unchanged reuse the stored
+    output instead of calling the model, so re-runs only pay for what
+    changed. When the convergence policy finds that a converges node added
+    nothing new, every node depending on it is skipped. The orchestrator's
+    checkpoint is written after each wave.
+    """
+
+    def __init__(self, orchestrator: Orchestrator, graph: WorkflowGraph, node_cache: Optional[NodeCache] = None,
+                 convergence: Optional[ConvergencePolicy] = None):
+        missing = {node.agent for node in graph.nodes if node.agent} - set(orchestrator.agents)
+        if missing:
+            raise ValueError(f"Workflow {graph.name} needs agents {sorted(missing)}")
+        self.orchestrator = orchestrator
+        self.graph = graph
+        self.node_cache = node_cache
+        self.convergence = convergence
+        # Nodes whose outputs the convergence policy compares, in order
+        self._converging = [node for node in graph.nodes if node.converges]
+        # Nodes not run because something they depend on converged
+        self.skipped: Set[str] = set()
+        # Output message and hash of every finished node (and of the query)
+        self.outputs: Dict[str, MCPMessage] = {}
+        self.hashes: Dict[str, str] = {}
+        # Hash of the last node each agent ran, chaining the agent's conversation
+        self._agent_hashes: Dict[str, str] = {}
+        # Agents already handed the orchestrator's seed message
+        self._seeded: Set[str] = set()
+        self.reused = 0
+
+    @property
+    def output_message(self) -> Optional[MCPMessage]:
+        """Message of the graph's output node, once it has run"""
+        return self.outputs.get(self.graph.output)
+
+    @staticmethod
+    def _hash(payload: Any) -> str:
+        return hashlib.sha256(json.dumps(payload, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    def _render(self, node: WorkflowNode, text: Optional[str], query: str) -> Optional[str]:
+        if text is None:
+            return None
+        fields = {name: self.outputs[name].content for name in node.inputs}
+        fields[QUERY_INPUT] = query
+        return text.format(**fields)
+
+    def _node_hash(self, node: WorkflowNode, rendered: Optional[str]) -> str:
+        payload = {"node": node.id, "text": rendered, "inputs": [self.hashes[name] for name in node.inputs]}
+        if node.agent is not None:
+            agent = self.orchestrator.agents[node.agent]
+            payload["agent"] = [agent.provider_name, agent.model, agent.temperature, agent.max_tokens,
+                                agent.system_prompt]
+            payload["previous"] = self._agent_hashes.get(node.agent)
+            # Every agent's conversation includes the seed (e.g. prior research), if there is one
+            seed = self.orchestrator.seed
+            payload["seed"] = seed.content if seed is not None else None
+        return self._hash(payload)
+
+    def _finish(self, node: WorkflowNode, output: MCPMessage, node_hash: str):
+        self.outputs[node.id] = output
+        self.hashes[node.id] = node_hash
+        if node.agent is not None:
+            self._agent_hashes[node.agent] = node_hash
+
+    def _check_convergence(self, node: WorkflowNode, output: MCPMessage) -> bool:
+        """Score a converges node's output; on convergence, skip everything downstream of it"""
+        if self.convergence is None or not node.converges:
+            return False
+        turn = self._converging.index(node)
+        previous = next((self.outputs[earlier.id] for earlier in reversed(self._converging[:turn])
+                         if earlier.id in self.outputs), None)
+        if not self.convergence.check(output, previous, turn):
+            return False
+        self._skip_after(node)
+        scores = output.metadata["convergence"]
+        self.orchestrator._log(f"\n[Converged at {node.id}: similarity {scores['similarity']}, "
+                               f"no-gaps signal {scores['no_gaps_signal']}; skipping {len(self.skipped)} node(s)]")
+        return True
+
+    def _skip_after(self, node: WorkflowNode):
+        self.skipped |= self.graph.dependents(node.id)
+
+    def _start(self, query: str):
+        """Record the query, or pick up node outputs restored from a checkpoint"""
+        orchestrator = self.orchestrator
+        if orchestrator._step < 1:
+            orchestrator._log(f"Starting workflow {self.graph.name} with query: {query}")
+            query_msg = MCPMessage(role="user", content=query, agent_id="human")
+            orchestrator._record_message(query_msg)
+            # Recorded after the query; each agent gets it after its first prompt, see _run_agent_node
+            orchestrator._seed_agents(agents=[])
+            orchestrator._complete_step(1, query, self.graph.turns)
+        self.outputs[QUERY_INPUT] = orchestrator.conversation_history[0]
+        self.hashes[QUERY_INPUT] = self._hash(query)
+
+        restored = {msg.get_metadata("node"): msg for msg in orchestrator.conversation_history
+                    if msg.get_metadata("node") is not None}
+        for wave in self.graph.waves():
+            for node in wave:
+                if node.id in restored:
+                    text = node.prompt if node.agent else node.template
+                    self._finish(node, restored[node.id], self._node_hash(node, self._render(node, text, query)))
+                    if ConvergencePolicy.stopped_after(restored[node.id]):
+                        self._skip_after(node)
+
+    def _run_template(self, node: WorkflowNode, query: str):
+        content = self._render(node, node.template, query)
+        message = MCPMessage(
+            role="user",
+            content=content,
+            agent_id="orchestrator",
+            references=[self.outputs[name].message_id for name in node.inputs],
+            metadata={"type": "template", "node": node.id}
+        )
+        self.orchestrator._record_message(message)
+        self._finish(node, message, self._node_hash(node, content))
+
+    async def _run_agent_node(self, node: WorkflowNode, query: str, stream: bool):
+        orchestrator = self.orchestrator
+        agent: BaseAgent = orchestrator.agents[node.agent]
+        # An agent's own earlier outputs are already in its context
+        for name in node.inputs:
+            if self.outputs[name].agent_id != agent.agent_id:
+                agent.add_message(self.outputs[name])
+
+        prompt = self._render(node, node.prompt, query)
+        if prompt is not None:
+            prompt_msg = MCPMessage(
+                role="user",
+                content=prompt,
+                agent_id="orchestrator",
+                references=[self.outputs[name].message_id for name in node.inputs],
+                metadata={"type": "instruction", "for_node": node.id}
+            )
+            if node.id == self.graph.output:
+                # Lets routed agents send the final step to their largest model
+                prompt_msg.metadata["final"] = True
+            agent.add_message(prompt_msg)
+            orchestrator._record_message(prompt_msg)
+        if orchestrator.seed is not None and agent.agent_id not in self._seeded:
+            agent.add_message(orchestrator.seed)
+            self._seeded.add(agent.agent_id)
+
+        node_hash = self._node_hash(node, prompt)
+        content = self.node_cache.get(node_hash) if self.node_cache is not None else None
+        if content is not None:
+            response = agent._record_response(content)
+            response.metadata["reused"] = True
+            self.reused += 1
+            orchestrator._log(f"\n[{agent.name}: {node.id} unchanged, reusing its previous output]")
+        else:
+            orchestrator._log(f"\n[{agent.name} thinking on {node.id}...]")
+            response = await agent.agenerate_response(on_chunk=orchestrator._chunk_handler(agent) if stream else None)
+            if self.node_cache is not None:
+                self.node_cache.set(node_hash, node.id, response.content)
+        response.metadata["node"] = node.id
+        if node.turn is not None and "metrics" in response.metadata:
+            response.metadata["metrics"]["turn"] = node.turn
+        self._check_convergence(node, response)
+        if not stream or content is not None:
+            orchestrator._log(f"[{agent.name}]: {response.content[:150]}...")
+        orchestrator._record_message(response)
+        self._finish(node, response, node_hash)
+
+    async def _run_agent_nodes(self, nodes: List[WorkflowNode], query: str, stream: bool):
+        """Nodes of one agent, in order"""
+        for node in nodes:
+            agent_id = self.orchestrator.agents[node.agent].agent_id
+            with span("workflow.node", node=node.id, turn=node.turn, agent_id=agent_id):
+                await self._run_agent_node(node, query, stream)
+
+    async def _run_wave(self, wave: List[WorkflowNode], query: str):
+        for node in wave:
+            if node.agent is None:
+                self._run_template(node, query)
+        by_agent: Dict[str, List[WorkflowNode]] = {}
+        for node in wave:
+            if node.agent is not None:
+                by_agent.setdefault(node.agent, []).append(node)
+        # Interleaved chunks of parallel agents would be unreadable, so only a lone agent streams
+        stream = self.orchestrator._on_chunk is not None and len(by_agent) == 1
+        results = await asyncio.gather(
+            *(self._run_agent_nodes(nodes, query, stream) for nodes in by_agent.values()), return_exceptions=True
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    async def arun(self, query: str, on_chunk=None) -> List[Dict[str, Any]]:
+        """Run every node not done yet; returns the conversation history"""
+        orchestrator = self.orchestrator
+        orchestrator._on_chunk = on_chunk
+        with span("workflow", mode="graph", graph=self.graph.name, query=query):
+            self._start(query)
+            try:
+                for wave_number, wave in enumerate(self.graph.waves(), start=1):
+                    pending = [node for node in wave if node.id not in self.outputs and node.id not in self.skipped]
+                    if not pending:
+                        continue
+                    orchestrator._turn = wave_number
+                    with span("workflow.wave", wave=wave_number, nodes=len(pending)):
+                        await self._run_wave(pending, query)
+                    # Step 1 is the query, then one step per finished node
+                    orchestrator._complete_step(len(self.outputs), query, self.graph.turns)
+            except AgentCallError as e:
+                orchestrator._stop_on_error(e)
+            return orchestrator.format_history()
+
+    def run(self, query: str, on_chunk=None) -> List[Dict[str, Any]]:
+        """Blocking wrapper around arun"""
+        return asyncio.run(self.arun(query, on_chunk))